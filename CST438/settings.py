@@ -1,5 +1,6 @@
 from pathlib import Path
 import os
+import sys
 from dotenv import load_dotenv
 
 # Load environment variables
@@ -50,6 +51,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'api.instrumentation.InstrumentationMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -60,6 +62,7 @@ MIDDLEWARE = [
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
     'corsheaders.middleware.CorsMiddleware', 
     'django.middleware.common.CommonMiddleware',
+    'api.replicas.ReplicaMiddleware',
 
 ]
 
@@ -81,10 +84,13 @@ TEMPLATES = [
     },
 ]
 
-# Database configuration
+# Database configuration. The engine is Django's MySQL backend with a
+# per-process connection pool (api/db_pool.py); keep CONN_MAX_AGE at 0 and
+# size the pool so WEB_CONCURRENCY x DB_POOL_MAX_SIZE fits the server's
+# connection limit.
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.mysql',
+        'ENGINE': 'api.db_backends.mysql',
         'NAME': os.environ.get('DB_NAME'),
         'USER': os.environ.get('DB_USER'),
         'PASSWORD': os.environ.get('DB_PASSWORD'),
@@ -93,10 +99,106 @@ DATABASES = {
         'OPTIONS': {
             'init_command': "SET sql_mode='STRICT_TRANS_TABLES'",
             'charset': 'utf8mb4',
-        }
+        },
+        'POOL': {
+            'MIN_SIZE': int(os.environ.get('DB_POOL_MIN_SIZE', 1)),
+            'MAX_SIZE': int(os.environ.get('DB_POOL_MAX_SIZE', 4)),
+            'MAX_LIFETIME': int(os.environ.get('DB_POOL_MAX_LIFETIME', 600)),
+            'TIMEOUT': int(os.environ.get('DB_POOL_TIMEOUT', 10)),
+            'HEALTH_CHECK_AFTER': int(os.environ.get('DB_POOL_HEALTH_CHECK_AFTER', 1)),
+        },
     }
 }
 
+# Read replicas: a comma-separated list of host[:port] that share the
+# primary's name and credentials. GET requests read from them; a client
+# that writes is pinned to the primary for REPLICA_STICKY_SECONDS
+# (api/replicas.py).
+DATABASE_REPLICAS = []
+for number, address in enumerate(filter(None, os.environ.get('DB_REPLICA_HOSTS', '').split(',')), 1):
+    host, _, port = address.strip().partition(':')
+    DATABASES[f'replica{number}'] = {
+        **DATABASES['default'],
+        'HOST': host,
+        'PORT': port or DATABASES['default']['PORT'],
+        'TEST': {'MIRROR': 'default'},
+    }
+    DATABASE_REPLICAS.append(f'replica{number}')
+
+DATABASE_ROUTERS = ['api.replicas.ReplicaRouter']
+REPLICA_STICKY_SECONDS = int(os.environ.get('DB_REPLICA_STICKY_SECONDS', 5))
+
+# `manage.py test` runs against SQLite so the suite needs no MySQL server.
+# The `replica` alias is a second, independent SQLite database; tests opt
+# in to routing with override_settings(DATABASE_REPLICAS=['replica']).
+if 'test' in sys.argv:
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': BASE_DIR / 'test_db.sqlite3',
+        },
+        'replica': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': BASE_DIR / 'test_replica.sqlite3',
+        },
+    }
+    DATABASE_REPLICAS = []
+
+# Cache for API responses (api/caching.py) and shelf summaries. Local
+# memory is per process and evicts least recently used entries; set
+# REDIS_URL (and install redis) to share one cache between workers.
+API_CACHE_TIMEOUT = int(os.environ.get('API_CACHE_TIMEOUT', 300))
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'bookhive',
+        'TIMEOUT': API_CACHE_TIMEOUT,
+        'OPTIONS': {
+            'MAX_ENTRIES': int(os.environ.get('API_CACHE_MAX_ENTRIES', 5000)),
+        },
+    }
+}
+
+if os.environ.get('REDIS_URL'):
+    CACHES['default'] = {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': os.environ['REDIS_URL'],
+        'TIMEOUT': API_CACHE_TIMEOUT,
+        'KEY_PREFIX': 'bookhive',
+    }
+
+# Per-request timings (api/instrumentation.py): Server-Timing headers and
+# one JSON line per request on the api.performance logger. A sample of
+# requests slower than PERF_SLOW_REQUEST_MS also logs their SQL.
+PERF_INSTRUMENTATION = os.environ.get('PERF_INSTRUMENTATION', 'True') == 'True'
+PERF_SLOW_REQUEST_MS = int(os.environ.get('PERF_SLOW_REQUEST_MS', 500))
+PERF_SLOW_SQL_SAMPLE_RATE = float(os.environ.get('PERF_SLOW_SQL_SAMPLE_RATE', 0.1))
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler'},
+    },
+    'loggers': {
+        'api.performance': {
+            'handlers': ['console'],
+            # Tests assert on these records with assertLogs instead
+            'level': 'ERROR' if 'test' in sys.argv else os.environ.get('PERF_LOG_LEVEL', 'INFO'),
+            'propagate': False,
+        },
+    },
+}
+
+# Threads each ASGI worker uses to run the async views' queries in parallel
+# (api/views/views_async.py), one pooled connection each. Defaults to the
+# pool's MAX_SIZE: more threads would only queue for a connection and could
+# hit the pool's TIMEOUT under load.
+ASYNC_QUERY_THREADS = int(
+    os.environ.get('ASYNC_QUERY_THREADS', os.environ.get('DB_POOL_MAX_SIZE', 4))
+)
+
 # Internationalization
 LANGUAGE_CODE = 'en-us'
 TIME_ZONE = 'UTC'
@@ -134,8 +236,11 @@ CORS_ALLOW_HEADERS = [
     "user-agent",
     "x-csrftoken",
     "x-requested-with",
+    "x-primary-until",  # read-your-writes pin, see api/replicas.py
 ]
 
+CORS_EXPOSE_HEADERS = ["x-primary-until"]
+
 # Allow credentials
 CORS_ALLOW_CREDENTIALS = True
 
@@ -2,4 +2,11 @@ from django.apps import AppConfig
 
 class ApiConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
-    name = 'api'
\ No newline at end of file
+    name = 'api'
+
+    def ready(self):
+        # Connect signal receivers
+        from . import signals  # noqa: F401
+        from django.db.backends.signals import connection_created
+        from .instrumentation import connection_created as time_queries_on
+        connection_created.connect(time_queries_on, dispatch_uid='api.instrumentation')
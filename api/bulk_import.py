@@ -0,0 +1,135 @@
+# bulk_import.py
+"""
+Streaming bulk import of books from CSV or JSON Lines.
+
+Rows are read one line at a time, validated with BookSerializer and
+written with bulk_create in chunks, each chunk in its own short
+transaction. Memory use depends on the chunk size, not the file size.
+Per-row errors are collected, up to `max_errors` of them. Input that
+cannot be read at all (bad encoding, malformed CSV) stops the import:
+rows before it stay imported and the report says where it stopped.
+"""
+import codecs
+import csv
+import json
+
+from django.db import DatabaseError, transaction
+
+from .models import Book
+from .serializers import BookSerializer
+from .signals import books_bulk_created
+
+CSV = 'csv'
+JSONL = 'jsonl'
+FORMATS = (CSV, JSONL)
+
+DEFAULT_CHUNK_SIZE = 500
+DEFAULT_MAX_ERRORS = 1000
+
+
+def _text_lines(stream):
+    """Decode a binary stream line by line without reading it all in"""
+    return codecs.iterdecode(iter(stream.readline, b''), 'utf-8-sig')
+
+
+def iter_rows(stream, fmt):
+    """Yield `(row_number, data)` for each record; data is None if unparsable"""
+    lines = _text_lines(stream)
+    if fmt == CSV:
+        for number, row in enumerate(csv.DictReader(lines), start=1):
+            # CSV cannot express null: treat empty cells as missing so
+            # optional columns such as cover_image fall back to None.
+            yield number, {
+                key: value for key, value in row.items()
+                if key is not None and value not in ('', None)
+            }
+    elif fmt == JSONL:
+        number = 0
+        for line in lines:
+            if not line.strip():
+                continue
+            number += 1
+            try:
+                data = json.loads(line)
+            except ValueError:
+                data = None
+            yield number, data if isinstance(data, dict) else None
+    else:
+        raise ValueError(f"Unsupported import format: {fmt}")
+
+
+class ImportReport:
+    def __init__(self, max_errors):
+        self.max_errors = max_errors
+        self.created = 0
+        self.failed = 0
+        self.errors = []
+        self.stopped = None
+
+    def add_error(self, row, errors):
+        self.failed += 1
+        if len(self.errors) < self.max_errors:
+            self.errors.append({'row': row, 'errors': errors})
+
+    def as_dict(self):
+        result = {
+            'created': self.created,
+            'failed': self.failed,
+            'errors': self.errors,
+            'errors_truncated': self.failed > len(self.errors),
+        }
+        if self.stopped:
+            result['error'] = self.stopped
+        return result
+
+
+def _flush(chunk, report):
+    row_numbers = [number for number, _ in chunk]
+    books = [book for _, book in chunk]
+    try:
+        with transaction.atomic():
+            created = Book.objects.bulk_create(books)
+    except DatabaseError as e:
+        for number in row_numbers:
+            report.add_error(number, {'database': [str(e)]})
+        return
+    report.created += len(created)
+    books_bulk_created.send(sender=Book, books=created)
+
+
+def import_books(stream, fmt, chunk_size=DEFAULT_CHUNK_SIZE, max_errors=DEFAULT_MAX_ERRORS):
+    """Import every row of `stream` and return the report as a dict"""
+    report = ImportReport(max_errors)
+    chunk = []
+    number = 0
+    try:
+        for number, data in iter_rows(stream, fmt):
+            if data is None:
+                report.add_error(number, {'non_field_errors': ['Row is not a valid record']})
+                continue
+            serializer = BookSerializer(data=data)
+            if not serializer.is_valid():
+                report.add_error(number, serializer.errors)
+                continue
+            chunk.append((number, Book(**serializer.validated_data)))
+            if len(chunk) >= chunk_size:
+                _flush(chunk, report)
+                chunk = []
+    except (UnicodeDecodeError, csv.Error) as e:
+        # Earlier chunks are committed, so report them rather than fail
+        report.add_error(number + 1, {'non_field_errors': [f'Unreadable input: {e}']})
+        report.stopped = f'Import stopped at row {number + 1}; the rows before it were imported'
+    if chunk:
+        _flush(chunk, report)
+    return report.as_dict()
+
+
+def detect_format(name='', content_type=''):
+    """Guess the import format from a file name or content type"""
+    name = (name or '').lower()
+    content_type = (content_type or '').lower()
+    if name.endswith(('.jsonl', '.ndjson')) or 'ndjson' in content_type or 'jsonl' in content_type:
+        return JSONL
+    if name.endswith('.csv') or 'csv' in content_type:
+        return CSV
+    return None
@@ -0,0 +1,200 @@
+# caching.py
+"""
+Response cache for the read endpoints.
+
+`@cached(BOOKS, REVIEWS)` stores a GET view's 200 responses in the Django
+cache (settings.CACHES: local-memory LRU by default, Redis when REDIS_URL
+is set). Keys combine the view name, the absolute request URL (scheme
+and host too, since paginated responses link to themselves) and the
+current version of each namespace the view reads. Writing a model bumps
+its namespace version (api/signals.py, and explicitly after bulk writes
+that send no signals), so every dependent entry is missed from then on
+and simply ages out. There is no key scanning or pattern delete.
+
+Versions are bumped immediately and again when the surrounding
+transaction commits, so a request that read the old rows before the
+commit cannot leave them cached under the new version. With read
+replicas (api/replicas.py) they are bumped once more after
+REPLICA_STICKY_SECONDS, when replicas have caught up, and responses read
+from a replica are cached apart from those read from the primary. Each
+namespace has at most one such delayed bump pending; writes made while
+it waits extend it rather than starting another timer.
+
+Hits and misses are counted per view in this process; see stats().
+"""
+import hashlib
+import threading
+import time
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection, transaction
+from rest_framework.response import Response
+
+from . import replicas
+
+BOOKS = 'books'
+REVIEWS = 'reviews'
+FAVORITES = 'favorites'
+USERS = 'users'
+RECOMMENDATIONS = 'recommendations'
+
+DEFAULT_TIMEOUT = 300
+
+_stats_lock = threading.Lock()
+_stats = {}
+
+_lag_lock = threading.Lock()
+# namespace -> monotonic time after which its pending delayed bump may stop
+_lag_deadlines = {}
+
+
+def _version_key(namespace):
+    return f'api_cache_version:{namespace}'
+
+
+def _versions(namespaces):
+    keys = [_version_key(namespace) for namespace in namespaces]
+    found = cache.get_many(keys)
+    for key in keys:
+        if key not in found:
+            # Never restart from a small number: an evicted version must not
+            # make old entries valid again
+            cache.add(key, time.time_ns(), timeout=None)
+            found[key] = cache.get(key)
+    return [str(found[key]) for key in keys]
+
+
+def _bump(namespaces):
+    for namespace in namespaces:
+        try:
+            cache.incr(_version_key(namespace))
+        except ValueError:
+            cache.set(_version_key(namespace), time.time_ns(), timeout=None)
+
+
+def _start_lag_timer(namespace, delay):
+    timer = threading.Timer(delay, _lag_timer_fired, [namespace])
+    timer.daemon = True
+    timer.start()
+
+
+def _lag_timer_fired(namespace):
+    _bump([namespace])
+    with _lag_lock:
+        remaining = _lag_deadlines[namespace] - time.monotonic()
+        if remaining <= 0:
+            del _lag_deadlines[namespace]
+    if remaining > 0:
+        # Written again since this timer started: bump once more later
+        _start_lag_timer(namespace, remaining)
+
+
+def _bump_after_replica_lag(namespaces):
+    if not replicas.replica_aliases():
+        return
+    delay = settings.REPLICA_STICKY_SECONDS
+    with _lag_lock:
+        idle = [namespace for namespace in namespaces if namespace not in _lag_deadlines]
+        for namespace in namespaces:
+            _lag_deadlines[namespace] = time.monotonic() + delay
+    for namespace in idle:
+        _start_lag_timer(namespace, delay)
+
+
+def invalidate(*namespaces):
+    """Drop every cached response that depends on any of `namespaces`"""
+    _bump(namespaces)
+    if connection.in_atomic_block:
+        transaction.on_commit(lambda: _bump(namespaces))
+        transaction.on_commit(lambda: _bump_after_replica_lag(namespaces))
+    else:
+        _bump_after_replica_lag(namespaces)
+
+
+def _count(view_name, outcome):
+    with _stats_lock:
+        counts = _stats.setdefault(view_name, {'hits': 0, 'misses': 0})
+        counts[outcome] += 1
+
+
+def stats():
+    """Hit/miss counts per view since this process started"""
+    with _stats_lock:
+        views = {name: dict(counts) for name, counts in _stats.items()}
+    totals = {'hits': 0, 'misses': 0}
+    for counts in views.values():
+        totals['hits'] += counts['hits']
+        totals['misses'] += counts['misses']
+    for counts in [*views.values(), totals]:
+        requests = counts['hits'] + counts['misses']
+        counts['hit_rate'] = round(counts['hits'] / requests, 4) if requests else None
+    return {'views': views, 'totals': totals}
+
+
+def reset_stats():
+    with _stats_lock:
+        _stats.clear()
+
+
+_MISSING = object()
+
+
+def cached_value(namespaces, key, compute, timeout=None):
+    """Return `compute()`, cached under `key` until `namespaces` change
+
+    For small derived values such as conditional GET validators, which
+    would otherwise cost a query even when the response is cached.
+    """
+    source = 'replica' if replicas.reading_from_replica() else 'primary'
+    full_key = ':'.join(['api_value', key, source, *_versions(namespaces)])
+    value = cache.get(full_key, _MISSING)
+    if value is _MISSING:
+        value = compute()
+        cache.set(
+            full_key, value,
+            timeout if timeout is not None
+            else getattr(settings, 'API_CACHE_TIMEOUT', DEFAULT_TIMEOUT)
+        )
+    return value
+
+
+def cached(*namespaces, timeout=None):
+    """Cache a GET view's successful responses until `namespaces` change
+
+    Apply below @api_view (and below @conditional, so 304s stay cheap).
+    Responses carry `X-Cache: HIT` or `MISS`.
+    """
+    def decorator(view):
+        view_name = view.__name__
+
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if request.method != 'GET':
+                return view(request, *args, **kwargs)
+
+            # next/previous links are absolute, so the host is part of the key
+            path = hashlib.md5(request.build_absolute_uri().encode()).hexdigest()
+            source = 'replica' if replicas.reading_from_replica() else 'primary'
+            key = ':'.join(['api_cache', view_name, source, *_versions(namespaces), path])
+            entry = cache.get(key)
+            if entry is not None:
+                _count(view_name, 'hits')
+                data, status_code = entry
+                response = Response(data, status=status_code)
+                response['X-Cache'] = 'HIT'
+                return response
+
+            _count(view_name, 'misses')
+            response = view(request, *args, **kwargs)
+            if response.status_code == 200 and isinstance(response, Response):
+                cache.set(
+                    key, (response.data, response.status_code),
+                    timeout if timeout is not None
+                    else getattr(settings, 'API_CACHE_TIMEOUT', DEFAULT_TIMEOUT)
+                )
+            response['X-Cache'] = 'MISS'
+            return response
+        return wrapper
+    return decorator
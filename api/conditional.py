@@ -0,0 +1,67 @@
+# conditional.py
+import hashlib
+import logging
+from functools import wraps
+
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+
+logger = logging.getLogger(__name__)
+
+
+def make_etag(request, last_modified, count):
+    """Build a strong ETag from the URL, a change timestamp and a row count"""
+    stamp = last_modified.isoformat() if last_modified else ''
+    source = f'{request.get_full_path()}:{stamp}:{count}'
+    digest = hashlib.md5(source.encode()).hexdigest()
+    return quote_etag(digest)
+
+
+def conditional(get_validators, send_last_modified=True):
+    """
+    Answer GET/HEAD requests with 304 Not Modified before the view runs.
+
+    `get_validators(request, *args, **kwargs)` is called with the view's
+    arguments and returns `(last_modified, count)` for everything the
+    response depends on, usually from a single aggregate query. It may
+    return None to skip the check, e.g. when the object does not exist.
+    Successful responses get matching ETag and Last-Modified headers.
+
+    Pass `send_last_modified=False` when deleting a row does not move
+    `last_modified` (e.g. MAX(updated_at) over a list): the ETag still
+    changes with the count, but If-Modified-Since alone would answer 304.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if request.method not in ('GET', 'HEAD'):
+                return view(request, *args, **kwargs)
+
+            try:
+                validators = get_validators(request, *args, **kwargs)
+            except Exception as e:
+                logger.error(f"Error computing validators for {view.__name__}: {str(e)}")
+                validators = None
+            if validators is None:
+                return view(request, *args, **kwargs)
+
+            last_modified, count = validators
+            etag = make_etag(request, last_modified, count)
+            timestamp = None
+            if send_last_modified and last_modified:
+                timestamp = int(last_modified.timestamp())
+
+            not_modified = get_conditional_response(
+                request, etag=etag, last_modified=timestamp
+            )
+            if not_modified is not None:
+                return not_modified
+
+            response = view(request, *args, **kwargs)
+            if response.status_code == 200:
+                response['ETag'] = etag
+                if timestamp is not None:
+                    response['Last-Modified'] = http_date(timestamp)
+            return response
+        return wrapper
+    return decorator
@@ -0,0 +1,412 @@
+# dataset.py
+"""
+Synthetic dataset generator for benchmarks and local development.
+
+Generates users, books, reviews and shelves with the skew of a real
+catalog:
+
+* book popularity follows a Zipf law, so a few books collect most of
+  the reviews and shelvings and most books get almost none;
+* the number of reviews and of shelved books per user follows a power
+  law: most users write none or one, a few write hundreds;
+* genres follow GENRE_MIX, publication years lean recent and activity
+  leans toward the end of the time window.
+
+The output depends only on the seed, the chunk size and the end date.
+Each chunk of rows draws from its own random stream, keyed by (seed,
+table, first row), and every row gets an explicit primary key, so the
+data is the same however many worker processes write it and in whatever
+order they finish. The time window
+ends at `end`, which defaults to today's midnight (UTC); pass it
+explicitly to reproduce a dataset on another day.
+
+Rows are written with executemany() multi-row INSERTs, one transaction
+per chunk, bypassing the model signals. rebuild_derived() then
+recomputes what those signals maintain: ratings, facets, leaderboard,
+search index and similar books.
+"""
+import multiprocessing
+from datetime import date, datetime, time, timedelta, timezone as dt_timezone
+
+import numpy as np
+from django.core.management.color import no_style
+from django.db import connection, connections, transaction
+
+from . import caching, db_pool, facets, leaderboard, ratings, recommendations, search
+from .models import (
+    Book, BookFacetCount, BookLeaderboard, BookSimilarity, FavoritePages, Review, User,
+)
+
+DEFAULT_USERS = 10000
+DEFAULT_BOOKS = 5000
+DEFAULT_SEED = 42
+DEFAULT_CHUNK_SIZE = 5000
+DEFAULT_BATCH_SIZE = 2000
+DEFAULT_DAYS = 365
+
+# Zipf exponent of book popularity; above 1 the head dominates
+DEFAULT_ZIPF_EXPONENT = 1.1
+# Power-law exponents of reviews and shelved books per user; lower means heavier users
+DEFAULT_REVIEW_EXPONENT = 2.2
+DEFAULT_FAVORITE_EXPONENT = 2.0
+DEFAULT_MAX_PER_USER = 1000
+
+# One librarian per this many users (user 1 is always one)
+LIBRARIAN_EVERY = 1000
+
+GENRE_MIX = {
+    'FICTION': 0.24,
+    'MYSTERY': 0.12,
+    'ROMANCE': 0.12,
+    'FANTASY': 0.10,
+    'SCIENCE_FICTION': 0.08,
+    'HISTORY': 0.07,
+    'BIOGRAPHY': 0.06,
+    'SCIENCE': 0.06,
+    'SELF_HELP': 0.06,
+    'CHILDREN': 0.06,
+    'POETRY': 0.03,
+}
+READING_STATUS_MIX = {
+    'WANT_TO_READ': 0.5,
+    'CURRENTLY_READING': 0.15,
+    'ALREADY_READ': 0.35,
+}
+
+FIRST_NAMES = (
+    'Ada', 'Alan', 'Amara', 'Ben', 'Chen', 'Clara', 'David', 'Elena', 'Farah', 'George',
+    'Hana', 'Ivan', 'Jane', 'Kofi', 'Lena', 'Marco', 'Nina', 'Omar', 'Priya', 'Rosa',
+    'Sam', 'Tomas', 'Uma', 'Victor', 'Wei', 'Yara',
+)
+LAST_NAMES = (
+    'Abbott', 'Baker', 'Castillo', 'Dubois', 'Eriksen', 'Fischer', 'Garcia', 'Hughes',
+    'Ito', 'Jensen', 'Kowalski', 'Larsen', 'Moreau', 'Nakamura', 'Okafor', 'Patel',
+    'Quinn', 'Rossi', 'Silva', 'Tanaka', 'Usman', 'Varga', 'Walsh', 'Young',
+)
+ADJECTIVES = (
+    'Silent', 'Hidden', 'Last', 'Burning', 'Golden', 'Broken', 'Distant', 'Winter',
+    'Crimson', 'Forgotten', 'Endless', 'Quiet', 'Wild', 'Secret', 'Northern', 'Glass',
+)
+NOUNS = (
+    'River', 'Garden', 'City', 'Letter', 'Kingdom', 'Orchard', 'Harbor', 'Mirror',
+    'Island', 'Lantern', 'Forest', 'Station', 'Empire', 'Library', 'Storm', 'Bridge',
+)
+REVIEW_TEXT = {
+    1: ('Could not finish it.', 'Not for me at all.'),
+    2: ('Slow and predictable.', 'A few good moments, mostly forgettable.'),
+    3: ('Decent, if uneven.', 'Enjoyable enough on a long trip.'),
+    4: ('Really well written.', 'Kept me up past midnight.'),
+    5: ('An instant favorite.', 'Everyone should read this.'),
+}
+
+USER_COLUMNS = (
+    'user_id', 'username', 'email', 'password', 'is_librarian', 'profile_image', 'created_at', 'updated_at'
+)
+BOOK_COLUMNS = (
+    'book_id', 'title', 'author', 'description', 'genre', 'published_date', 'cover_image',
+    'available_copies', 'created_at', 'updated_at', 'avg_rating', 'review_count',
+    'rating_1_count', 'rating_2_count', 'rating_3_count', 'rating_4_count', 'rating_5_count',
+)
+REVIEW_COLUMNS = ('review_id', 'user', 'book', 'rating', 'review_text', 'created_at', 'updated_at')
+FAVORITE_COLUMNS = ('favorite_id', 'user_id', 'book_id', 'reading_status', 'created_at')
+
+USERS, BOOKS, REVIEWS, FAVORITES = 'users', 'books', 'reviews', 'favorites'
+# Random stream number of each table's chunks; 0 is the plan
+STREAMS = {USERS: 1, BOOKS: 2, REVIEWS: 3, FAVORITES: 4}
+
+# Zipf draws before a user's distinct picks are cut short
+MAX_PICK_ROUNDS = 50
+
+# The plan being written, inherited by forked worker processes
+_plan = None
+
+
+def _stream(seed, stream, start=0):
+    return np.random.default_rng([seed, stream, start])
+
+
+def _power_law(rng, size, exponent, cap):
+    """Counts with P(count >= k) ~ (k + 1) ** -(exponent - 1), from 0 up to cap"""
+    counts = np.floor((1.0 - rng.random(size)) ** (-1.0 / (exponent - 1.0))) - 1
+    return np.minimum(counts, cap).astype(np.int64)
+
+
+class Plan:
+    """Everything chunks share: sizes, popularity, per-user counts and id offsets"""
+
+    def __init__(self, users=DEFAULT_USERS, books=DEFAULT_BOOKS, seed=DEFAULT_SEED,
+                 zipf_exponent=DEFAULT_ZIPF_EXPONENT, review_exponent=DEFAULT_REVIEW_EXPONENT,
+                 favorite_exponent=DEFAULT_FAVORITE_EXPONENT, max_per_user=DEFAULT_MAX_PER_USER,
+                 days=DEFAULT_DAYS, end=None):
+        if users < 1 or books < 1:
+            raise ValueError('users and books must be at least 1')
+        self.users, self.books, self.seed, self.days = users, books, seed, days
+        self.end = end or datetime.combine(
+            datetime.now(dt_timezone.utc).date(), time(), tzinfo=dt_timezone.utc
+        )
+        rng = _stream(seed, 0)
+
+        # Zipf rank r (0 = most popular) belongs to book index book_by_rank[r]
+        self.book_by_rank = rng.permutation(books)
+        weights = 1.0 / np.arange(1, books + 1) ** zipf_exponent
+        self.popularity_cdf = np.cumsum(weights) / weights.sum()
+        self.popularity_cdf[-1] = 1.0
+        # Mean rating of each book index
+        self.quality = np.clip(rng.normal(3.7, 0.6, books), 1.5, 4.8)
+        self.author_count = max(1, books // 4)
+
+        # Picks are distinct, so no user can hold more than half the catalog
+        cap = min(max_per_user, max(1, books // 2))
+        self.review_counts = _power_law(rng, users, review_exponent, cap)
+        self.favorite_counts = _power_law(rng, users, favorite_exponent, cap)
+        self.review_offsets = np.concatenate([[0], np.cumsum(self.review_counts)])
+        self.favorite_offsets = np.concatenate([[0], np.cumsum(self.favorite_counts)])
+
+    def chunks(self, table, chunk_size=DEFAULT_CHUNK_SIZE):
+        """(table, start, stop) tasks covering the table's users or books"""
+        total = self.books if table == BOOKS else self.users
+        return [(table, start, min(start + chunk_size, total)) for start in range(0, total, chunk_size)]
+
+    def totals(self):
+        """Upper bound of rows per table (users may get fewer distinct books than drawn)"""
+        return {
+            USERS: self.users,
+            BOOKS: self.books,
+            REVIEWS: int(self.review_offsets[-1]),
+            FAVORITES: int(self.favorite_offsets[-1]),
+        }
+
+    def timestamps(self, rng, size, span_days=None):
+        """Datetimes in the window, denser toward its end"""
+        seconds = (span_days or self.days) * 86400 * rng.random(size) ** 2
+        return [self.end - timedelta(seconds=float(s)) for s in seconds]
+
+    def pick_books(self, rng, count):
+        """`count` distinct book ids drawn by popularity (fewer if the tail is too thin)"""
+        picked = {}
+        for _ in range(MAX_PICK_ROUNDS):
+            if len(picked) >= count:
+                break
+            ranks = np.searchsorted(self.popularity_cdf, rng.random(2 * (count - len(picked)) + 4), side='right')
+            for rank in ranks.tolist():
+                picked.setdefault(rank, None)
+                if len(picked) == count:
+                    break
+        return (self.book_by_rank[list(picked)] + 1).tolist()
+
+    def author(self, index):
+        first = FIRST_NAMES[index % len(FIRST_NAMES)]
+        last = LAST_NAMES[(index // len(FIRST_NAMES) + index) % len(LAST_NAMES)]
+        generation = index // (len(FIRST_NAMES) * len(LAST_NAMES))
+        return f'{first} {last}' + (f' {generation + 1}' if generation else '')
+
+
+def user_rows(plan, start, stop):
+    rng = _stream(plan.seed, STREAMS[USERS], start)
+    # Accounts are spread over four windows, so some predate all activity
+    created = plan.timestamps(rng, stop - start, span_days=plan.days * 4)
+    return [
+        (user_id, f'reader{user_id}', f'reader{user_id}@example.com', 'password123',
+         user_id % LIBRARIAN_EVERY == 1, None, created_at, created_at)
+        for user_id, created_at in zip(range(start + 1, stop + 1), created)
+    ]
+
+
+def book_rows(plan, start, stop):
+    rng = _stream(plan.seed, STREAMS[BOOKS], start)
+    size = stop - start
+    genres = rng.choice(list(GENRE_MIX), size, p=list(GENRE_MIX.values()))
+    # Prolific authors: author index is Zipf-distributed too
+    author_ranks = np.searchsorted(
+        plan.popularity_cdf[:plan.author_count] / plan.popularity_cdf[plan.author_count - 1],
+        rng.random(size), side='right'
+    )
+    years = np.maximum(plan.end.year - np.floor(rng.exponential(25, size)), 1800).astype(int)
+    months, days = rng.integers(1, 13, size), rng.integers(1, 29, size)
+    copies = rng.poisson(3, size)
+    words = rng.integers(0, len(ADJECTIVES) * len(NOUNS) * (len(NOUNS) - 1), size)
+    created = plan.timestamps(rng, size, span_days=plan.days * 2)
+    rows = []
+    for i, book_id in enumerate(range(start + 1, stop + 1)):
+        adjective = ADJECTIVES[words[i] % len(ADJECTIVES)]
+        noun = words[i] // len(ADJECTIVES) % len(NOUNS)
+        other = NOUNS[(noun + 1 + words[i] // (len(ADJECTIVES) * len(NOUNS))) % len(NOUNS)]
+        noun = NOUNS[noun]
+        title = f'The {adjective} {noun}' if book_id % 3 else f'The {noun} of {other}'
+        genre = str(genres[i])
+        rows.append((
+            book_id, title, plan.author(int(author_ranks[i])),
+            f'A {genre.lower().replace("_", " ")} story of the {adjective.lower()} {other.lower()}.',
+            genre, date(int(years[i]), int(months[i]), int(days[i])), None,
+            int(copies[i]), created[i], created[i], 0, 0, 0, 0, 0, 0, 0,
+        ))
+    return rows
+
+
+def review_rows(plan, start, stop):
+    rng = _stream(plan.seed, STREAMS[REVIEWS], start)
+    rows = []
+    for user in range(start, stop):
+        review_id = int(plan.review_offsets[user])
+        book_ids = plan.pick_books(rng, int(plan.review_counts[user]))
+        if not book_ids:
+            continue
+        scores = plan.quality[np.array(book_ids) - 1] + rng.normal(0, 0.9, len(book_ids))
+        stars = np.clip(np.rint(scores), 1, 5).astype(int).tolist()
+        texts = rng.integers(0, 2, len(book_ids)).tolist()
+        for book_id, rating, text, created_at in zip(
+                book_ids, stars, texts, plan.timestamps(rng, len(book_ids))):
+            review_id += 1
+            rows.append((
+                review_id, user + 1, book_id, rating, REVIEW_TEXT[rating][text],
+                created_at, created_at,
+            ))
+    return rows
+
+
+def favorite_rows(plan, start, stop):
+    rng = _stream(plan.seed, STREAMS[FAVORITES], start)
+    statuses = list(READING_STATUS_MIX)
+    rows = []
+    for user in range(start, stop):
+        favorite_id = int(plan.favorite_offsets[user])
+        book_ids = plan.pick_books(rng, int(plan.favorite_counts[user]))
+        if not book_ids:
+            continue
+        picks = rng.choice(len(statuses), len(book_ids), p=list(READING_STATUS_MIX.values()))
+        for book_id, status, created_at in zip(
+                book_ids, picks.tolist(), plan.timestamps(rng, len(book_ids))):
+            favorite_id += 1
+            rows.append((favorite_id, user + 1, book_id, statuses[status], created_at))
+    return rows
+
+
+TABLES = {
+    USERS: (User, USER_COLUMNS, user_rows),
+    BOOKS: (Book, BOOK_COLUMNS, book_rows),
+    REVIEWS: (Review, REVIEW_COLUMNS, review_rows),
+    FAVORITES: (FavoritePages, FAVORITE_COLUMNS, favorite_rows),
+}
+
+
+def insert_rows(model, columns, rows, batch_size=DEFAULT_BATCH_SIZE):
+    """Multi-row INSERT of `rows` (tuples of `columns` field names) in one transaction"""
+    fields = [model._meta.get_field(name) for name in columns]
+    quote = connection.ops.quote_name
+    sql = 'INSERT INTO {} ({}) VALUES ({})'.format(
+        quote(model._meta.db_table),
+        ', '.join(quote(field.column) for field in fields),
+        ', '.join(['%s'] * len(fields)),
+    )
+    # Only dates and datetimes need the backend's adaptation
+    adapt = [
+        (i, field) for i, field in enumerate(fields)
+        if field.get_internal_type() in ('DateField', 'DateTimeField')
+    ]
+    with transaction.atomic(), connection.cursor() as cursor:
+        for start in range(0, len(rows), batch_size):
+            batch = rows[start:start + batch_size]
+            if adapt:
+                batch = [list(row) for row in batch]
+                for row in batch:
+                    for i, field in adapt:
+                        row[i] = field.get_db_prep_value(row[i], connection)
+            cursor.executemany(sql, batch)
+    return len(rows)
+
+
+def write_chunk(task):
+    """Generate and insert one (table, start, stop) chunk of `_plan`. Returns (table, rows)."""
+    table, start, stop = task
+    model, columns, generate_rows = TABLES[table]
+    return table, insert_rows(model, columns, generate_rows(_plan, start, stop))
+
+
+def _write_in_worker(task):
+    try:
+        return write_chunk(task)
+    finally:
+        connections.close_all()
+
+
+def run_chunks(tasks, workers=1):
+    """Write chunks, in forked worker processes if workers > 1. Returns rows per table."""
+    written = dict.fromkeys({table for table, _, _ in tasks}, 0)
+    if workers <= 1:
+        results = map(write_chunk, tasks)
+    else:
+        # Close the parent's sockets, pooled ones included, so the children
+        # inherit none and each opens its own connections
+        connections.close_all()
+        db_pool.close_all()
+        pool = multiprocessing.get_context('fork').Pool(workers)
+        results = pool.imap_unordered(_write_in_worker, tasks)
+    try:
+        for table, rows in results:
+            written[table] += rows
+    finally:
+        if workers > 1:
+            pool.close()
+            pool.join()
+    return written
+
+
+def clear():
+    """Empty the generated and derived tables and reset their id sequences"""
+    tables = [
+        model._meta.db_table for model in (
+            Review, FavoritePages, BookSimilarity, BookLeaderboard, BookFacetCount, Book, User,
+        )
+    ]
+    if connection.vendor == 'sqlite':
+        tables.append('book_fts')
+    connection.ops.execute_sql_flush(
+        connection.ops.sql_flush(no_style(), tables, reset_sequences=True, allow_cascade=True)
+    )
+
+
+def reindex_search(batch_size=DEFAULT_BATCH_SIZE):
+    books = Book.objects.only('title', 'author', 'description', 'genre').order_by('pk')
+    batch = []
+    for book in books.iterator(chunk_size=batch_size):
+        batch.append(book)
+        if len(batch) == batch_size:
+            search.index_books(batch)
+            batch = []
+    if batch:
+        search.index_books(batch)
+
+
+def rebuild_derived(recommendations_too=True):
+    """Recompute every table the model signals keep in sync with the generated rows"""
+    ratings.rebuild_ratings()
+    facets.rebuild_facets()
+    leaderboard.rebuild_leaderboard()
+    reindex_search()
+    if recommendations_too:
+        recommendations.rebuild_similarities()
+    caching.invalidate(
+        caching.BOOKS, caching.REVIEWS, caching.FAVORITES, caching.USERS,
+        caching.RECOMMENDATIONS,
+    )
+
+
+def generate(plan, workers=1, chunk_size=DEFAULT_CHUNK_SIZE, rebuild=True, recommendations_too=True):
+    """Replace the users, books, reviews and shelves with `plan`'s. Returns rows per table."""
+    global _plan
+    if connection.vendor == 'sqlite':
+        # SQLite allows one writer at a time; parallel chunks would only wait on the lock
+        workers = 1
+    _plan = plan
+    try:
+        clear()
+        # Reviews reference users and books, so those go in first
+        written = run_chunks(plan.chunks(USERS, chunk_size) + plan.chunks(BOOKS, chunk_size), workers)
+        written.update(run_chunks(
+            plan.chunks(REVIEWS, chunk_size) + plan.chunks(FAVORITES, chunk_size), workers
+        ))
+    finally:
+        _plan = None
+    if rebuild:
+        rebuild_derived(recommendations_too)
+    return written
@@ -0,0 +1,9 @@
+"""django.db.backends.mysql with pooled connections (see api/db_pool.py)"""
+from django.db.backends.mysql import base
+
+from api.db_pool import PooledDatabaseWrapperMixin
+
+
+class DatabaseWrapper(PooledDatabaseWrapperMixin, base.DatabaseWrapper):
+    def pool_check(self, conn):
+        conn.ping()
@@ -0,0 +1,8 @@
+"""django.db.backends.sqlite3 with pooled connections (see api/db_pool.py)"""
+from django.db.backends.sqlite3 import base
+
+from api.db_pool import PooledDatabaseWrapperMixin
+
+
+class DatabaseWrapper(PooledDatabaseWrapperMixin, base.DatabaseWrapper):
+    pass
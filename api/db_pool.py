@@ -0,0 +1,355 @@
+# db_pool.py
+"""
+Per-process database connection pool.
+
+Django opens a new database connection for every request (CONN_MAX_AGE
+is 0), and reaching the remote MySQL server costs a TCP connect, a TLS
+handshake and authentication each time, often more than the queries do.
+The backends in api/db_backends check raw connections out of a pool
+instead. Django still "closes" its connection at the end of every
+request, but that only hands the connection back to the pool.
+
+* MIN_SIZE connections are opened the first time the pool is used, and
+  at most MAX_SIZE are open at once. A checkout that finds none free
+  waits up to TIMEOUT seconds and then raises PoolTimeout.
+* A connection idle for more than HEALTH_CHECK_AFTER seconds is pinged
+  before it is handed out, and replaced if the ping fails.
+* Connections are closed after MAX_LIFETIME seconds, keeping them well
+  inside the server's idle timeout and picking up DNS/failover changes.
+* A connection returned in the middle of a transaction is rolled back.
+  A connection that raised a database error is discarded.
+
+Configure it with DATABASES[alias]['POOL'] (see CST438/settings.py).
+Pools are per process, so a gunicorn deployment holds up to
+WEB_CONCURRENCY x MAX_SIZE connections. A forked child (gunicorn
+--preload, multiprocessing) starts with empty pools and never touches the
+connections it inherited: closing one, or letting it be garbage
+collected, would send COM_QUIT on the socket the parent still uses. stats() reports use and
+saturation; GET /api/system/db-pool/ serves it.
+"""
+import logging
+import os
+import threading
+import time
+from collections import deque
+
+from django.db.utils import OperationalError
+
+logger = logging.getLogger(__name__)
+
+DEFAULTS = {
+    'MIN_SIZE': 1,
+    'MAX_SIZE': 4,
+    'MAX_LIFETIME': 600,
+    'TIMEOUT': 10,
+    'HEALTH_CHECK_AFTER': 1,
+}
+
+
+class PoolTimeout(OperationalError):
+    """No connection became free within the pool's TIMEOUT"""
+
+
+# Pools and connections inherited from the parent process. They are kept
+# referenced so they are never closed or deallocated in this process.
+_inherited = []
+
+
+def _close_quietly(conn):
+    try:
+        conn.close()
+    except Exception:
+        pass
+
+
+class ConnectionPool:
+    """A thread-safe pool of DB-API connections made by `connect()`
+
+    `check(conn)` should raise, or return False, when a connection is dead.
+    """
+
+    def __init__(self, connect, check=None, min_size=1, max_size=4,
+                 max_lifetime=600, timeout=10, health_check_after=1):
+        if max_size < 1 or min_size > max_size:
+            raise ValueError('Pool sizes must satisfy 0 <= MIN_SIZE <= MAX_SIZE, MAX_SIZE >= 1')
+        self.connect = connect
+        self.check = check
+        self.min_size = min_size
+        self.max_size = max_size
+        self.max_lifetime = max_lifetime
+        self.timeout = timeout
+        self.health_check_after = health_check_after
+        self._pid = os.getpid()
+
+        self._lock = threading.Condition()
+        # (conn, opened_at, returned_at), most recently returned on the right
+        self._idle = deque()
+        self._in_use = {}  # id(conn) -> (conn, opened_at)
+        self._size = 0  # idle + in use + being opened
+        self._waiting = 0
+        self._closed = False
+        self._counts = {
+            'checkouts': 0,
+            'waits': 0,
+            'timeouts': 0,
+            'opened': 0,
+            'closed': 0,
+            'failed_health_checks': 0,
+            'expired': 0,
+        }
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+        self._peak_in_use = 0
+
+    def fill(self):
+        """Open connections until MIN_SIZE are open"""
+        while True:
+            with self._lock:
+                if self._closed or self._size >= self.min_size:
+                    return
+                self._size += 1
+            try:
+                conn = self._open()
+            except Exception:
+                self._forget()
+                raise
+            with self._lock:
+                self._idle.appendleft((conn, time.monotonic(), time.monotonic()))
+                self._lock.notify()
+
+    def acquire(self):
+        """Check out a live connection, opening one if none is idle"""
+        entry = self._reserve()
+        if entry is not None:
+            conn, opened_at, returned_at = entry
+            now = time.monotonic()
+            if now - opened_at >= self.max_lifetime:
+                self._discard(conn, 'expired')
+            elif now - returned_at >= self.health_check_after and not self._healthy(conn):
+                self._discard(conn, 'failed_health_checks')
+            else:
+                return self._hand_out(conn, opened_at)
+        # The slot is reserved; fill it with a new connection
+        try:
+            conn = self._open()
+        except Exception:
+            self._forget()
+            raise
+        return self._hand_out(conn, time.monotonic())
+
+    def release(self, conn, discard=False):
+        """Return a connection; `discard` closes it instead of keeping it"""
+        if os.getpid() != self._pid:
+            # Checked out by the parent before a fork: the socket is shared
+            _inherited.append(conn)
+            return
+        with self._lock:
+            entry = self._in_use.pop(id(conn), None)
+        if entry is None:
+            # Released twice: it is already idle or closed
+            return
+        opened_at = entry[1]
+        expired = time.monotonic() - opened_at >= self.max_lifetime
+        if discard or expired or self._closed:
+            self._discard(conn, 'expired' if expired and not discard else None)
+            self._forget()
+        else:
+            with self._lock:
+                self._idle.append((conn, opened_at, time.monotonic()))
+                self._lock.notify()
+
+    def close(self):
+        """Close idle connections now and in-use ones when they come back"""
+        with self._lock:
+            self._closed = True
+            idle, self._idle = list(self._idle), deque()
+            self._size -= len(idle)
+            self._counts['closed'] += len(idle)
+            self._lock.notify_all()
+        for conn, _, _ in idle:
+            _close_quietly(conn)
+
+    def stats(self):
+        with self._lock:
+            in_use = len(self._in_use)
+            return {
+                'size': self._size,
+                'in_use': in_use,
+                'idle': len(self._idle),
+                'waiting': self._waiting,
+                'min_size': self.min_size,
+                'max_size': self.max_size,
+                'saturation': round(in_use / self.max_size, 4),
+                'peak_in_use': self._peak_in_use,
+                **self._counts,
+                'wait_ms': {
+                    'total': round(self._wait_total * 1000, 3),
+                    'max': round(self._wait_max * 1000, 3),
+                },
+            }
+
+    def _reserve(self):
+        """Take an idle connection, or reserve a slot for a new one (None)"""
+        started = time.monotonic()
+        waited = False
+        with self._lock:
+            self._waiting += 1
+            try:
+                while True:
+                    if self._closed:
+                        raise OperationalError('Connection pool is closed')
+                    if self._idle:
+                        entry = self._idle.pop()
+                        break
+                    if self._size < self.max_size:
+                        self._size += 1
+                        entry = None
+                        break
+                    remaining = self.timeout - (time.monotonic() - started)
+                    if remaining <= 0:
+                        self._counts['timeouts'] += 1
+                        raise PoolTimeout(
+                            f'No database connection free after {self.timeout}s '
+                            f'({self.max_size} in use)'
+                        )
+                    waited = True
+                    self._lock.wait(remaining)
+            finally:
+                self._waiting -= 1
+            if waited:
+                elapsed = time.monotonic() - started
+                self._counts['waits'] += 1
+                self._wait_total += elapsed
+                self._wait_max = max(self._wait_max, elapsed)
+        return entry
+
+    def _hand_out(self, conn, opened_at):
+        with self._lock:
+            self._in_use[id(conn)] = (conn, opened_at)
+            self._counts['checkouts'] += 1
+            self._peak_in_use = max(self._peak_in_use, len(self._in_use))
+        return conn
+
+    def _open(self):
+        conn = self.connect()
+        with self._lock:
+            self._counts['opened'] += 1
+        return conn
+
+    def _healthy(self, conn):
+        if self.check is None:
+            return True
+        try:
+            return self.check(conn) is not False
+        except Exception as e:
+            logger.warning(f"Discarding pooled connection that failed its health check: {str(e)}")
+            return False
+
+    def _discard(self, conn, reason):
+        """Close a connection but keep its slot (the caller refills it or forgets it)"""
+        _close_quietly(conn)
+        with self._lock:
+            self._counts['closed'] += 1
+            if reason:
+                self._counts[reason] += 1
+
+    def _forget(self):
+        with self._lock:
+            self._size -= 1
+            self._lock.notify()
+
+
+_registry_lock = threading.Lock()
+_pools = {}  # alias -> (key, pool)
+
+
+def _after_fork_in_child():
+    """Start the child with no pools, keeping the parent's ones referenced"""
+    global _registry_lock
+    # Another thread may have held the lock at the moment of the fork
+    _registry_lock = threading.Lock()
+    _inherited.extend(pool for _, pool in _pools.values())
+    _pools.clear()
+
+
+os.register_at_fork(after_in_child=_after_fork_in_child)
+
+
+def get_pool(alias, key, create):
+    """The process's pool for `alias`, made with `create()` on first use
+
+    When `key` (the database the alias points at) changes, as it does when
+    the test runner switches to the test database, the old pool is closed.
+    """
+    with _registry_lock:
+        current = _pools.get(alias)
+        if current is not None and current[0] == key:
+            return current[1]
+        if current is not None:
+            current[1].close()
+        pool = create()
+        _pools[alias] = (key, pool)
+    pool.fill()
+    return pool
+
+
+def stats():
+    """Pool statistics for every database alias used by this process"""
+    with _registry_lock:
+        pools = dict(_pools)
+    return {alias: pool.stats() for alias, (_, pool) in pools.items()}
+
+
+def close_all():
+    """Close every pool; call before forking so children inherit no sockets"""
+    with _registry_lock:
+        pools = dict(_pools)
+        _pools.clear()
+    for _, pool in pools.values():
+        pool.close()
+
+
+class PooledDatabaseWrapperMixin:
+    """Take raw connections from a ConnectionPool instead of opening them
+
+    Mix in before a Django backend's DatabaseWrapper.
+    """
+
+    def pool_check(self, conn):
+        cursor = conn.cursor()
+        try:
+            cursor.execute('SELECT 1')
+            cursor.fetchall()
+        finally:
+            cursor.close()
+
+    def get_pool(self, conn_params):
+        options = {**DEFAULTS, **(self.settings_dict.get('POOL') or {})}
+        key = tuple(self.settings_dict.get(name) for name in ('HOST', 'PORT', 'NAME', 'USER'))
+        parent = super()
+        return get_pool(self.alias, key, lambda: ConnectionPool(
+            connect=lambda: parent.get_new_connection(conn_params),
+            check=self.pool_check,
+            min_size=int(options['MIN_SIZE']),
+            max_size=int(options['MAX_SIZE']),
+            max_lifetime=float(options['MAX_LIFETIME']),
+            timeout=float(options['TIMEOUT']),
+            health_check_after=float(options['HEALTH_CHECK_AFTER']),
+        ))
+
+    def get_new_connection(self, conn_params):
+        self._pool = self.get_pool(conn_params)
+        return self._pool.acquire()
+
+    def _close(self):
+        if self.connection is None:
+            return
+        conn = self.connection
+        discard = self.errors_occurred
+        if not discard and not self.autocommit:
+            # Closed inside a transaction: don't hand its writes to the next user
+            try:
+                conn.rollback()
+            except Exception:
+                discard = True
+        self._pool.release(conn, discard=discard)
@@ -0,0 +1,143 @@
+# facets.py
+"""
+Precomputed facet counts for catalog browsing.
+
+The book_facet_count table holds one row per (facet, value) with the
+number of books carrying that value, for three facets: genre,
+publication decade and availability. Book signals apply +1/-1 deltas on
+every create, update and delete once the write commits, so a browse
+request reads the counts with one small query instead of running a
+GROUP BY per facet. rebuild_facets recomputes the table from scratch.
+"""
+from collections import Counter
+from datetime import date
+
+from django.db import IntegrityError, connection, transaction
+from django.db.models import F
+from django.utils.dateparse import parse_date
+
+from .models import Book, BookFacetCount
+from . import caching
+
+GENRE = 'genre'
+DECADE = 'decade'
+AVAILABLE = 'available'
+FACETS = (GENRE, DECADE, AVAILABLE)
+
+
+def _decade(published_date):
+    if isinstance(published_date, str):
+        published_date = parse_date(published_date)
+    if published_date is None:
+        return None
+    return str(published_date.year // 10 * 10)
+
+
+def facet_values(genre, published_date, available_copies):
+    """Return the (facet, value) pairs a book with these fields counts towards"""
+    values = [(GENRE, genre)]
+    decade = _decade(published_date)
+    if decade is not None:
+        values.append((DECADE, decade))
+    values.append((AVAILABLE, 'true' if (available_copies or 0) > 0 else 'false'))
+    return values
+
+
+def book_facet_values(book):
+    return facet_values(book.genre, book.published_date, book.available_copies)
+
+
+def stored_facet_values(book_id):
+    """Facet values of a book as currently stored, before it is saved
+
+    Inside a transaction the row is locked until it commits, so a
+    concurrent update cannot change the values between this read and the
+    save, and both deltas are computed from what each one replaced.
+    """
+    books = Book.objects.filter(pk=book_id)
+    if connection.in_atomic_block:
+        books = books.select_for_update()
+    row = books.values_list('genre', 'published_date', 'available_copies').first()
+    return facet_values(*row) if row else []
+
+
+def apply_deltas(deltas):
+    """Add each `{(facet, value): delta}` to the stored counts"""
+    for (facet, value), delta in deltas.items():
+        if not delta:
+            continue
+        updated = BookFacetCount.objects.filter(facet=facet, value=value).update(
+            book_count=F('book_count') + delta
+        )
+        if updated:
+            continue
+        try:
+            with transaction.atomic():
+                BookFacetCount.objects.create(facet=facet, value=value, book_count=delta)
+        except IntegrityError:
+            # Another request created the row first
+            BookFacetCount.objects.filter(facet=facet, value=value).update(
+                book_count=F('book_count') + delta
+            )
+
+
+def book_changed(old_values, new_values):
+    """Count a book write once its transaction commits"""
+    deltas = Counter(new_values)
+    deltas.subtract(Counter(old_values))
+    transaction.on_commit(lambda: apply_deltas(deltas))
+
+
+def books_added(books):
+    deltas = Counter()
+    for book in books:
+        deltas.update(book_facet_values(book))
+    transaction.on_commit(lambda: apply_deltas(deltas))
+
+
+def get_facet_counts():
+    """Return `{facet: [{'value', 'count'}, ...]}` for the browse endpoint"""
+    facets = {facet: [] for facet in FACETS}
+    rows = BookFacetCount.objects.filter(book_count__gt=0).values_list(
+        'facet', 'value', 'book_count'
+    )
+    for facet, value, count in rows:
+        if facet in facets:
+            facets[facet].append({'value': value, 'count': count})
+    facets[GENRE].sort(key=lambda item: (-item['count'], item['value']))
+    facets[DECADE].sort(key=lambda item: item['value'])
+    facets[AVAILABLE].sort(key=lambda item: item['value'], reverse=True)
+    return facets
+
+
+def filter_books(queryset, genre=None, decade=None, available=None):
+    """Narrow a Book queryset by facet values taken from query params"""
+    if genre:
+        queryset = queryset.filter(genre=genre)
+    if decade:
+        start = int(decade)
+        queryset = queryset.filter(
+            published_date__gte=date(start, 1, 1),
+            published_date__lt=date(start + 10, 1, 1)
+        )
+    if available == 'true':
+        queryset = queryset.filter(available_copies__gt=0)
+    elif available == 'false':
+        queryset = queryset.filter(available_copies__lte=0)
+    return queryset
+
+
+def rebuild_facets():
+    """Recount every facet from the book table. Returns the number of rows."""
+    counts = Counter()
+    rows = Book.objects.values_list('genre', 'published_date', 'available_copies')
+    for row in rows.iterator(chunk_size=2000):
+        counts.update(facet_values(*row))
+    with transaction.atomic():
+        BookFacetCount.objects.all().delete()
+        BookFacetCount.objects.bulk_create([
+            BookFacetCount(facet=facet, value=value, book_count=count)
+            for (facet, value), count in counts.items()
+        ])
+    caching.invalidate(caching.BOOKS)
+    return len(counts)
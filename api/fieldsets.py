@@ -0,0 +1,51 @@
+# fieldsets.py
+"""
+Sparse fieldsets: `?fields=title,author,cover_image`.
+
+The requested fields are checked against the serializer, pushed down
+into the query with `.only()` so unrequested columns are never fetched,
+and handed to a DynamicFieldsModelSerializer so the output matches.
+"""
+
+FIELDS_PARAM = 'fields'
+
+
+class InvalidFields(ValueError):
+    pass
+
+
+def requested_fields(request, serializer_class, default=None, deferred=(), hidden=()):
+    """
+    Return the field names to render for this request.
+
+    Without `?fields=` (or with no names in it, e.g. `?fields=,`) this is
+    `default`, or every field except `deferred` ones (large columns that
+    must be asked for explicitly). `hidden` fields can never be requested.
+    """
+    available = [
+        name for name in serializer_class().fields if name not in hidden
+    ]
+    fields = []
+    for name in request.query_params.get(FIELDS_PARAM, '').split(','):
+        name = name.strip()
+        if name and name not in fields:
+            fields.append(name)
+    if not fields:
+        if default is not None:
+            return list(default)
+        return [name for name in available if name not in deferred]
+
+    unknown = [name for name in fields if name not in available]
+    if unknown:
+        raise InvalidFields(
+            f"Unknown field(s): {', '.join(unknown)}. "
+            f"Available fields: {', '.join(available)}"
+        )
+    # Keep the serializer's field order regardless of the request order
+    return [name for name in available if name in fields]
+
+
+def project(queryset, fields):
+    """Only load the model columns behind `fields` (the pk is always loaded)"""
+    model_fields = {field.name for field in queryset.model._meta.concrete_fields}
+    return queryset.only(*[name for name in fields if name in model_fields])
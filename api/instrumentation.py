@@ -0,0 +1,182 @@
+# instrumentation.py
+"""
+Per-request performance instrumentation.
+
+InstrumentationMiddleware (outermost in settings.MIDDLEWARE) measures
+every request and reports:
+
+* a `Server-Timing` header: `db` (total query time, query count in its
+  description), `db-slowest`, `serialize` (time in serializers), `app`
+  (everything else) and `total`. Browser dev tools show it per request.
+* one JSON line per request on the `api.performance` logger, with the
+  same numbers plus the slowest statement.
+* for requests slower than PERF_SLOW_REQUEST_MS, a sample
+  (PERF_SLOW_SQL_SAMPLE_RATE) also logs every SQL statement the request
+  ran, with its duration. Parameters are never logged.
+
+Queries are timed by an execute wrapper installed on every connection;
+serializers report through span('serialize'). The state lives in a
+contextvar, so it follows ASGI requests and the async views' query
+threads. The cost is two perf_counter() calls per query and per
+serialized object, and one log line per request.
+"""
+import json
+import logging
+import random
+import threading
+import time
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.utils.decorators import sync_and_async_middleware
+
+logger = logging.getLogger('api.performance')
+
+MAX_CAPTURED_STATEMENTS = 200
+
+_current = ContextVar('request_metrics', default=None)
+
+
+class RequestMetrics:
+    __slots__ = ('queries', 'db_time', 'slowest', 'slowest_sql', 'statements',
+                 'spans', '_depth', '_lock')
+
+    def __init__(self):
+        self.queries = 0
+        self.db_time = 0.0
+        self.slowest = 0.0
+        self.slowest_sql = None
+        self.statements = []
+        self.spans = {}
+        self._depth = {}
+        self._lock = threading.Lock()
+
+    def add_query(self, sql, elapsed):
+        with self._lock:
+            self.queries += 1
+            self.db_time += elapsed
+            if elapsed > self.slowest:
+                self.slowest = elapsed
+                self.slowest_sql = sql
+            if len(self.statements) < MAX_CAPTURED_STATEMENTS:
+                self.statements.append((sql, elapsed))
+
+
+class span:
+    """Add the time spent in the block to the current request's `name` timing
+
+    Queries run inside the block count as `db`, not `name`. Nested spans of
+    the same name are counted once.
+    """
+    __slots__ = ('name', 'metrics', 'started', 'db_time')
+
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        self.metrics = metrics = _current.get()
+        if metrics is not None:
+            depth = metrics._depth.get(self.name, 0)
+            metrics._depth[self.name] = depth + 1
+            if depth == 0:
+                self.db_time = metrics.db_time
+                self.started = time.perf_counter()
+
+    def __exit__(self, *exc_info):
+        metrics = self.metrics
+        if metrics is not None:
+            depth = metrics._depth[self.name] - 1
+            metrics._depth[self.name] = depth
+            if depth == 0:
+                elapsed = time.perf_counter() - self.started - (metrics.db_time - self.db_time)
+                metrics.spans[self.name] = metrics.spans.get(self.name, 0.0) + elapsed
+
+
+def time_queries(execute, sql, params, many, context):
+    metrics = _current.get()
+    if metrics is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        metrics.add_query(sql, time.perf_counter() - started)
+
+
+def connection_created(sender, connection, **kwargs):
+    # Sent again on every reconnect (and pool checkout) of the same wrapper
+    if time_queries not in connection.execute_wrappers:
+        connection.execute_wrappers.append(time_queries)
+
+
+def _ms(seconds):
+    return round(seconds * 1000, 2)
+
+
+def _report(request, response, metrics, total):
+    serialize = metrics.spans.get('serialize', 0.0)
+    app = max(total - metrics.db_time - serialize, 0.0)
+    response['Server-Timing'] = ', '.join([
+        f'db;dur={_ms(metrics.db_time)};desc="{metrics.queries} queries"',
+        f'db-slowest;dur={_ms(metrics.slowest)}',
+        f'serialize;dur={_ms(serialize)}',
+        f'app;dur={_ms(app)}',
+        f'total;dur={_ms(total)}',
+    ])
+
+    if not logger.isEnabledFor(logging.INFO) and total * 1000 < settings.PERF_SLOW_REQUEST_MS:
+        return response
+
+    record = {
+        'method': request.method,
+        'path': request.path,
+        'status': response.status_code,
+        'total_ms': _ms(total),
+        'db_ms': _ms(metrics.db_time),
+        'queries': metrics.queries,
+        'slowest_query_ms': _ms(metrics.slowest),
+        'slowest_query': metrics.slowest_sql,
+        'serialize_ms': _ms(serialize),
+        'app_ms': _ms(app),
+    }
+    if logger.isEnabledFor(logging.INFO):
+        logger.info(json.dumps(record))
+
+    if (total * 1000 >= settings.PERF_SLOW_REQUEST_MS
+            and random.random() < settings.PERF_SLOW_SQL_SAMPLE_RATE):
+        record['statements'] = [
+            {'ms': _ms(elapsed), 'sql': sql} for sql, elapsed in metrics.statements
+        ]
+        logger.warning(json.dumps({'slow_request': record}))
+    return response
+
+
+@sync_and_async_middleware
+def InstrumentationMiddleware(get_response):
+    """Time each request's queries and serializers; see the module docstring"""
+    if not settings.PERF_INSTRUMENTATION:
+        raise MiddlewareNotUsed
+
+    if iscoroutinefunction(get_response):
+        async def middleware(request):
+            metrics = RequestMetrics()
+            token = _current.set(metrics)
+            started = time.perf_counter()
+            try:
+                response = await get_response(request)
+            finally:
+                _current.reset(token)
+            return _report(request, response, metrics, time.perf_counter() - started)
+    else:
+        def middleware(request):
+            metrics = RequestMetrics()
+            token = _current.set(metrics)
+            started = time.perf_counter()
+            try:
+                response = get_response(request)
+            finally:
+                _current.reset(token)
+            return _report(request, response, metrics, time.perf_counter() - started)
+    return middleware
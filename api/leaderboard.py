@@ -0,0 +1,174 @@
+# leaderboard.py
+"""
+Trending and popular books.
+
+Every review and shelf add counts towards two scores in book_leaderboard:
+
+* popular_score: all-time number of reviews plus favorites.
+* trending_score: the same events, each worth less as it ages, halving
+  every TRENDING_HALF_LIFE_DAYS. It uses forward decay: an event at time t
+  is stored as weight * exp(lambda * (t - EPOCH)). Every stored score is
+  scaled by the same factor exp(-lambda * (now - EPOCH)), so the ranking
+  never changes as time passes and nothing has to be re-decayed. Writes
+  are single-row F() increments.
+
+Both columns are indexed, so top-N is an index range scan (O(log n + N)).
+The write views call the *_added / *_removed hooks inside their
+transactions. rebuild_leaderboard recomputes everything from the review
+and favorite_pages tables.
+
+Adding and then subtracting the same forward-decayed values does not
+always return exactly to zero at this magnitude, so a book whose every
+event was removed can keep a small positive trending_score. popular_score
+is an exact count, and top() only lists books where it is above zero.
+
+Stored trending values grow by 2x per half-life, so they stay well inside
+float range for about 15 years after EPOCH. Move EPOCH forward and run
+rebuild_leaderboard before then.
+"""
+import math
+from collections import defaultdict
+from datetime import datetime, timezone as dt_timezone
+
+from django.db import IntegrityError, transaction
+from django.db.models import Case, F, FloatField, IntegerField, Value, When
+from django.utils import timezone
+
+from .models import Book, BookLeaderboard, FavoritePages, Review
+from . import caching
+
+EPOCH = datetime(2024, 1, 1, tzinfo=dt_timezone.utc)
+TRENDING_HALF_LIFE_DAYS = 7
+DECAY_RATE = math.log(2) / (TRENDING_HALF_LIFE_DAYS * 86400)  # per second
+
+REVIEW_WEIGHT = 2.0
+FAVORITE_WEIGHT = 1.0
+
+TRENDING = 'trending_score'
+POPULAR = 'popular_score'
+
+
+def _forward(weight, when):
+    return weight * math.exp(DECAY_RATE * (when - EPOCH).total_seconds())
+
+
+def current_score(stored, now=None):
+    """Convert a stored trending_score into its decayed value at `now`"""
+    now = now or timezone.now()
+    return stored * math.exp(-DECAY_RATE * (now - EPOCH).total_seconds())
+
+
+def apply_deltas(deltas):
+    """Add each `{book_id: (trending_delta, popular_delta)}` to the stored scores"""
+    for book_id, (trending, popular) in deltas.items():
+        updated = BookLeaderboard.objects.filter(book_id=book_id).update(
+            trending_score=F('trending_score') + trending,
+            popular_score=F('popular_score') + popular,
+        )
+        if updated:
+            continue
+        try:
+            with transaction.atomic():
+                BookLeaderboard.objects.create(
+                    book_id=book_id, trending_score=trending, popular_score=popular
+                )
+        except IntegrityError:
+            # Another request created the row first
+            BookLeaderboard.objects.filter(book_id=book_id).update(
+                trending_score=F('trending_score') + trending,
+                popular_score=F('popular_score') + popular,
+            )
+
+
+def _event(book_id, weight, when, sign):
+    apply_deltas({book_id: (sign * _forward(weight, when), sign)})
+
+
+def review_added(book_id, created_at):
+    """Count a new review. Call inside the transaction that creates it."""
+    _event(book_id, REVIEW_WEIGHT, created_at, 1)
+
+
+def review_removed(book_id, created_at):
+    _event(book_id, REVIEW_WEIGHT, created_at, -1)
+
+
+def reviews_removed(rows, batch_size=500):
+    """Uncount many `(book_id, created_at)` reviews with one UPDATE per batch of books
+
+    Every counted review has a leaderboard row, so there is nothing to create.
+    """
+    deltas = defaultdict(lambda: [0.0, 0])
+    for book_id, created_at in rows:
+        deltas[book_id][0] += _forward(REVIEW_WEIGHT, created_at)
+        deltas[book_id][1] += 1
+    book_ids = sorted(deltas)
+    for start in range(0, len(book_ids), batch_size):
+        batch = book_ids[start:start + batch_size]
+        BookLeaderboard.objects.filter(book_id__in=batch).update(
+            trending_score=F('trending_score') - Case(
+                *[When(book_id=book_id, then=Value(deltas[book_id][0])) for book_id in batch],
+                default=Value(0.0), output_field=FloatField(),
+            ),
+            popular_score=F('popular_score') - Case(
+                *[When(book_id=book_id, then=Value(deltas[book_id][1])) for book_id in batch],
+                default=Value(0), output_field=IntegerField(),
+            ),
+        )
+
+
+def favorite_added(book_id, created_at):
+    """Count a new shelf add. Call inside the transaction that creates it."""
+    _event(book_id, FAVORITE_WEIGHT, created_at, 1)
+
+
+def favorite_removed(book_id, created_at):
+    _event(book_id, FAVORITE_WEIGHT, created_at, -1)
+
+
+def favorites_changed(added=(), removed=()):
+    """Count batches of `(book_id, created_at)` shelf adds and removals"""
+    deltas = defaultdict(lambda: [0.0, 0])
+    for rows, sign in ((added, 1), (removed, -1)):
+        for book_id, created_at in rows:
+            deltas[book_id][0] += sign * _forward(FAVORITE_WEIGHT, created_at)
+            deltas[book_id][1] += sign
+    apply_deltas(deltas)
+
+
+def top(score, limit):
+    """Return [(book, score), ...] for the best `limit` books by `score`"""
+    rows = (
+        BookLeaderboard.objects.select_related('book')
+        # popular_score > 0 drops float residue left once every event is removed
+        .filter(**{f'{score}__gt': 0, 'popular_score__gt': 0})
+        .order_by(f'-{score}', 'book_id')[:limit]
+    )
+    if score == TRENDING:
+        now = timezone.now()
+        return [(row.book, current_score(row.trending_score, now)) for row in rows]
+    return [(row.book, row.popular_score) for row in rows]
+
+
+def rebuild_leaderboard(batch_size=1000):
+    """Recompute every score from reviews and favorites. Returns the number of books."""
+    scores = defaultdict(lambda: [0.0, 0])
+    sources = (
+        (Review.objects.values_list('book_id', 'created_at'), REVIEW_WEIGHT),
+        (FavoritePages.objects.values_list('book_id', 'created_at'), FAVORITE_WEIGHT),
+    )
+    for rows, weight in sources:
+        for book_id, created_at in rows.iterator(chunk_size=5000):
+            scores[book_id][0] += _forward(weight, created_at)
+            scores[book_id][1] += 1
+
+    # favorite_pages has no foreign key, so skip rows for deleted books
+    book_ids = set(Book.objects.values_list('book_id', flat=True)) & set(scores)
+    with transaction.atomic():
+        BookLeaderboard.objects.all().delete()
+        BookLeaderboard.objects.bulk_create([
+            BookLeaderboard(book_id=book_id, trending_score=trending, popular_score=popular)
+            for book_id, (trending, popular) in scores.items() if book_id in book_ids
+        ], batch_size=batch_size)
+    caching.invalidate(caching.BOOKS)
+    return len(book_ids)
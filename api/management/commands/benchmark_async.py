@@ -0,0 +1,172 @@
+import asyncio
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+from wsgiref.util import setup_testing_defaults
+
+from django.core.asgi import get_asgi_application
+from django.core.management.base import BaseCommand, CommandError
+from django.core.wsgi import get_wsgi_application
+from django.db import connections
+from django.db.backends.signals import connection_created
+
+from api.models import Book
+
+# Requests are sent with a Host the project accepts
+HOST = 'localhost'
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+class Command(BaseCommand):
+    help = (
+        'Compare the sync book detail view behind a fixed pool of worker '
+        'threads with its async variant on one event loop, under concurrent '
+        'load and simulated database latency'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=200, help='Requests per run (default: 200)')
+        parser.add_argument('--concurrency', type=int, default=50, help='Clients sending at once (default: 50)')
+        parser.add_argument(
+            '--sync-workers', type=int, default=4,
+            help='Threads serving the sync view, like gunicorn sync workers (default: 4)'
+        )
+        parser.add_argument(
+            '--db-latency-ms', type=float, default=20.0,
+            help='Delay added to every query, like a remote MySQL round trip (default: 20)'
+        )
+        parser.add_argument('--book-id', type=int, help='Book to request (default: the first one)')
+
+    def handle(self, *args, **options):
+        if connections['default'].settings_dict['NAME'] in (':memory:', ''):
+            raise CommandError('Needs a file or server database; in-memory SQLite is per connection')
+        book_id = options['book_id'] or Book.objects.order_by('pk').values_list('pk', flat=True).first()
+        if book_id is None:
+            raise CommandError('No books in the database; run populate_db.py first')
+
+        delay = options['db_latency_ms'] / 1000
+
+        def slow_query(execute, sql, params, many, context):
+            time.sleep(delay)
+            return execute(sql, params, many, context)
+
+        def add_latency(sender, connection, **kwargs):
+            # Fired on every reconnect of the same per-thread wrapper
+            if slow_query not in connection.execute_wrappers:
+                connection.execute_wrappers.append(slow_query)
+
+        connection_created.connect(add_latency, weak=False)
+        try:
+            connections.close_all()
+            results = [
+                ('sync', self.run_sync(f'/api/books/{book_id}/', options)),
+                ('async', self.run_async(f'/api/async/books/{book_id}/', options)),
+            ]
+        finally:
+            connection_created.disconnect(add_latency)
+            connections.close_all()
+
+        self.stdout.write(
+            f"{'view':<8}{'requests':>10}{'p50 (ms)':>11}{'p99 (ms)':>11}{'req/s':>9}"
+        )
+        for name, (latencies, elapsed) in results:
+            self.stdout.write(
+                f'{name:<8}{len(latencies):>10}'
+                f'{statistics.median(latencies) * 1000:>11.1f}'
+                f'{percentile(latencies, 0.99) * 1000:>11.1f}'
+                f'{len(latencies) / elapsed:>9.1f}'
+            )
+
+    def check_status(self, status_code):
+        if status_code != 200:
+            raise CommandError(f'Request failed with status {status_code}')
+
+    def run_sync(self, path, options):
+        """WSGI requests on a fixed thread pool, so latency includes the wait for a worker"""
+        application = get_wsgi_application()
+
+        def serve(i):
+            environ = {
+                'PATH_INFO': path,
+                # A distinct query string skips the response cache
+                'QUERY_STRING': f'_={i}',
+                'HTTP_HOST': HOST,
+            }
+            setup_testing_defaults(environ)
+            statuses = []
+            body = application(environ, lambda status, headers: statuses.append(status))
+            b''.join(body)
+            body.close()
+            self.check_status(int(statuses[0].split()[0]))
+
+        async def load():
+            loop = asyncio.get_running_loop()
+            pool = ThreadPoolExecutor(max_workers=options['sync_workers'])
+            try:
+                return await self.fire(
+                    options, lambda i: loop.run_in_executor(pool, serve, i)
+                )
+            finally:
+                pool.shutdown()
+
+        return asyncio.run(load())
+
+    def run_async(self, path, options):
+        """ASGI requests, all served by the same event loop"""
+        application = get_asgi_application()
+
+        async def serve(i):
+            scope = {
+                'type': 'http',
+                'asgi': {'version': '3.0'},
+                'http_version': '1.1',
+                'method': 'GET',
+                'scheme': 'http',
+                'path': path,
+                'raw_path': path.encode(),
+                'query_string': f'_={i}'.encode(),
+                'root_path': '',
+                'headers': [(b'host', HOST.encode())],
+                'client': ('127.0.0.1', 0),
+                'server': (HOST, 80),
+            }
+            requested = False
+            messages = []
+
+            async def receive():
+                nonlocal requested
+                if not requested:
+                    requested = True
+                    return {'type': 'http.request', 'body': b'', 'more_body': False}
+                # The client stays connected until the response is sent
+                await asyncio.Event().wait()
+
+            async def send(message):
+                messages.append(message)
+
+            await application(scope, receive, send)
+            self.check_status(next(
+                message['status'] for message in messages
+                if message['type'] == 'http.response.start'
+            ))
+
+        return asyncio.run(self.fire(options, serve))
+
+    async def fire(self, options, serve):
+        """Send `requests` requests from `concurrency` clients; return (latencies, elapsed)"""
+        counter = iter(range(options['requests']))
+        latencies = []
+
+        async def client():
+            for i in counter:
+                start = time.perf_counter()
+                await serve(i)
+                latencies.append(time.perf_counter() - start)
+
+        started = time.perf_counter()
+        await asyncio.gather(*[client() for _ in range(options['concurrency'])])
+        return latencies, time.perf_counter() - started
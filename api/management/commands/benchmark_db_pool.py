@@ -0,0 +1,132 @@
+import statistics
+import time
+from importlib import import_module
+from wsgiref.util import setup_testing_defaults
+
+from django.core.management.base import BaseCommand, CommandError
+from django.core.wsgi import get_wsgi_application
+from django.db import DEFAULT_DB_ALIAS, connections
+
+from api import db_pool
+from api.models import Book
+
+# Requests are sent with a Host the project accepts
+HOST = 'localhost'
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+class Command(BaseCommand):
+    help = (
+        'Measure per-request latency of the book detail endpoint with and '
+        'without the connection pool, simulating the cost of opening a '
+        'connection to a remote database'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=200, help='Requests per run (default: 200)')
+        parser.add_argument(
+            '--connect-latency-ms', type=float, default=30.0,
+            help='Delay added to opening a connection: TCP, TLS and auth (default: 30)'
+        )
+        parser.add_argument(
+            '--query-latency-ms', type=float, default=2.0,
+            help='Delay added to every query: the network round trip (default: 2)'
+        )
+        parser.add_argument('--book-id', type=int, help='Book to request (default: the first one)')
+
+    def handle(self, *args, **options):
+        settings_dict = connections[DEFAULT_DB_ALIAS].settings_dict
+        if settings_dict['NAME'] in (':memory:', ''):
+            raise CommandError('Needs a file or server database; in-memory SQLite is per connection')
+        book_id = options['book_id'] or Book.objects.order_by('pk').values_list('pk', flat=True).first()
+        if book_id is None:
+            raise CommandError('No books in the database; run populate_db.py first')
+        connections[DEFAULT_DB_ALIAS].close()
+        db_pool.close_all()
+
+        # The plain Django backend for the configured engine (api.db_backends.X or django's X)
+        backend = import_module(
+            f"django.db.backends.{settings_dict['ENGINE'].rsplit('.', 1)[-1]}.base"
+        )
+        connect_delay = options['connect_latency_ms'] / 1000
+        query_delay = options['query_latency_ms'] / 1000
+
+        opened = []
+
+        def slow_query(execute, sql, params, many, context):
+            time.sleep(query_delay)
+            return execute(sql, params, many, context)
+
+        class RemoteDatabase:
+            """Make opening a connection and running a query cost a round trip"""
+            def get_new_connection(self, conn_params):
+                time.sleep(connect_delay)
+                opened.append(1)
+                return super().get_new_connection(conn_params)
+
+            def connect(self):
+                super().connect()
+                if slow_query not in self.execute_wrappers:
+                    self.execute_wrappers.append(slow_query)
+
+        wrappers = [
+            ('direct', type('Direct', (RemoteDatabase, backend.DatabaseWrapper), {})),
+            ('pooled', type(
+                'Pooled',
+                (db_pool.PooledDatabaseWrapperMixin, RemoteDatabase, backend.DatabaseWrapper),
+                {}
+            )),
+        ]
+        application = get_wsgi_application()
+        path = f'/api/books/{book_id}/'
+        original = connections[DEFAULT_DB_ALIAS]
+
+        self.stdout.write(
+            f"{'connections':<13}{'requests':>9}{'mean (ms)':>11}{'p50 (ms)':>10}"
+            f"{'p99 (ms)':>10}{'opened':>8}"
+        )
+        try:
+            for name, wrapper_class in wrappers:
+                wrapper = wrapper_class({**settings_dict, 'CONN_MAX_AGE': 0}, DEFAULT_DB_ALIAS)
+                connections[DEFAULT_DB_ALIAS] = wrapper
+                opened.clear()
+                latencies = []
+                for i in range(options['requests']):
+                    start = time.perf_counter()
+                    self.get(application, path, i)
+                    latencies.append(time.perf_counter() - start)
+                wrapper.close()
+                self.stdout.write(
+                    f'{name:<13}{len(latencies):>9}'
+                    f'{statistics.mean(latencies) * 1000:>11.1f}'
+                    f'{statistics.median(latencies) * 1000:>10.1f}'
+                    f'{percentile(latencies, 0.99) * 1000:>10.1f}'
+                    f'{len(opened):>8}'
+                )
+            pool = db_pool.stats()[DEFAULT_DB_ALIAS]
+            self.stdout.write(
+                f"pool: {pool['checkouts']} checkouts, {pool['opened']} opened, "
+                f"peak {pool['peak_in_use']}/{pool['max_size']} in use, {pool['waits']} waits"
+            )
+        finally:
+            connections[DEFAULT_DB_ALIAS] = original
+            db_pool.close_all()
+
+    def get(self, application, path, i):
+        environ = {
+            'PATH_INFO': path,
+            # A distinct query string skips the response cache
+            'QUERY_STRING': f'_={i}',
+            'HTTP_HOST': HOST,
+        }
+        setup_testing_defaults(environ)
+        statuses = []
+        body = application(environ, lambda status, headers: statuses.append(status))
+        b''.join(body)
+        body.close()
+        if not statuses[0].startswith('200'):
+            raise CommandError(f'Request failed with {statuses[0]}')
@@ -0,0 +1,121 @@
+import datetime
+import random
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+
+from api.models import Book, Review
+from api.row_serializers import get_row_serializer
+from api.serializers import BookSerializer, ReviewSerializer
+
+GENRES = ['FICTION', 'MYSTERY', 'SCIENCE', 'HISTORY', 'FANTASY', 'BIOGRAPHY']
+
+
+def make_books(count, rng):
+    now = timezone.now()
+    books = []
+    for i in range(1, count + 1):
+        reviews = [rng.randint(0, 20) for _ in range(5)]
+        review_count = sum(reviews)
+        total = sum(n * (r + 1) for r, n in enumerate(reviews))
+        books.append(Book(
+            book_id=i,
+            title=f'Book title {i}',
+            author=f'Author {i % 997}',
+            description='Lorem ipsum dolor sit amet. ' * rng.randint(5, 40),
+            genre=rng.choice(GENRES),
+            published_date=datetime.date(1900, 1, 1) + datetime.timedelta(days=rng.randint(0, 45000)),
+            cover_image=None if i % 3 == 0 else f'https://covers.example.com/{i}.jpg',
+            available_copies=rng.randint(0, 10),
+            created_at=now - datetime.timedelta(seconds=rng.randint(0, 10 ** 8), microseconds=rng.randint(0, 999999)),
+            updated_at=now,
+            avg_rating=total / review_count if review_count else 0,
+            review_count=review_count,
+            rating_1_count=reviews[0],
+            rating_2_count=reviews[1],
+            rating_3_count=reviews[2],
+            rating_4_count=reviews[3],
+            rating_5_count=reviews[4],
+        ))
+    return books
+
+
+def make_reviews(count, rng):
+    now = timezone.now()
+    return [
+        Review(
+            review_id=i,
+            user_id=rng.randint(1, 10000),
+            book_id=rng.randint(1, 100000),
+            rating=rng.randint(1, 5),
+            review_text='Great read. ' * rng.randint(1, 30),
+            created_at=now - datetime.timedelta(seconds=rng.randint(0, 10 ** 8)),
+            updated_at=now,
+        )
+        for i in range(1, count + 1)
+    ]
+
+
+def as_rows(instances, columns):
+    """The tuples values_list(*columns) would return for these instances"""
+    attnames = [
+        instances[0]._meta.get_field(column).attname for column in columns
+    ] if instances else []
+    return [tuple(getattr(obj, name) for name in attnames) for obj in instances]
+
+
+def best_of(repeat, func):
+    timings = []
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        timings.append(time.perf_counter() - start)
+    return min(timings), result
+
+
+class Command(BaseCommand):
+    help = (
+        'Compare ModelSerializer with the compiled RowSerializer fast path on '
+        'in-memory rows and check that both produce identical JSON'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--sizes', type=int, nargs='+', default=[1000, 10000, 100000],
+            help='Row counts to benchmark (default: 1000 10000 100000)'
+        )
+        parser.add_argument('--repeat', type=int, default=3, help='Runs per measurement; the best is reported')
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, **options):
+        renderer = JSONRenderer()
+        cases = [
+            ('BookSerializer', BookSerializer, make_books),
+            ('ReviewSerializer', ReviewSerializer, make_reviews),
+        ]
+
+        self.stdout.write(f"{'serializer':<18}{'rows':>9}{'model (s)':>12}{'fast (s)':>12}{'speedup':>10}")
+        for name, serializer_class, factory in cases:
+            row_serializer = get_row_serializer(serializer_class)
+            for size in options['sizes']:
+                instances = factory(size, random.Random(options['seed']))
+                rows = as_rows(instances, row_serializer.columns)
+
+                slow, expected = best_of(
+                    options['repeat'],
+                    lambda: serializer_class(instances, many=True).data
+                )
+                fast, actual = best_of(
+                    options['repeat'],
+                    lambda: row_serializer.serialize(rows)
+                )
+                if renderer.render(expected) != renderer.render(actual):
+                    raise CommandError(f'{name}: fast path output differs at {size} rows')
+
+                self.stdout.write(
+                    f'{name:<18}{size:>9}{slow:>12.4f}{fast:>12.4f}{slow / fast:>9.1f}x'
+                )
+        self.stdout.write(self.style.SUCCESS('Fast path output is byte-for-byte identical'))
@@ -0,0 +1,35 @@
+from django.core.management.base import BaseCommand
+
+from api.recommendations import (
+    DEFAULT_BLOCK_SIZE, DEFAULT_TOP_K, rebuild_similarities, recently_active_books
+)
+
+
+class Command(BaseCommand):
+    help = 'Compute the most similar books of every book from favorites and reviews'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--top-k', type=int, default=DEFAULT_TOP_K,
+            help=f'Similar books stored per book (default: {DEFAULT_TOP_K})'
+        )
+        parser.add_argument(
+            '--block-size', type=int, default=DEFAULT_BLOCK_SIZE,
+            help=f'Books scored and written per batch (default: {DEFAULT_BLOCK_SIZE})'
+        )
+        parser.add_argument(
+            '--since-minutes', type=int,
+            help='Only refresh books shelved or reviewed in the last N minutes, and their neighbors'
+        )
+
+    def handle(self, *args, **options):
+        book_ids = None
+        if options['since_minutes'] is not None:
+            book_ids = recently_active_books(options['since_minutes'])
+            if not book_ids:
+                self.stdout.write('No recent activity; nothing to refresh')
+                return
+        written = rebuild_similarities(
+            top_k=options['top_k'], block_size=options['block_size'], book_ids=book_ids
+        )
+        self.stdout.write(self.style.SUCCESS(f'Stored similar books for {written} books'))
@@ -0,0 +1,57 @@
+import json
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from api import bulk_import
+
+
+class Command(BaseCommand):
+    help = 'Stream books from a CSV or JSON Lines file into the catalog'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="File to import, or '-' for stdin")
+        parser.add_argument(
+            '--format', dest='fmt', choices=bulk_import.FORMATS,
+            help='Input format (default: guessed from the file extension)'
+        )
+        parser.add_argument(
+            '--chunk-size', type=int, default=bulk_import.DEFAULT_CHUNK_SIZE,
+            help='Rows per bulk INSERT and transaction'
+        )
+        parser.add_argument(
+            '--max-errors', type=int, default=bulk_import.DEFAULT_MAX_ERRORS,
+            help='Maximum number of row errors to include in the report'
+        )
+
+    def handle(self, *args, **options):
+        path = options['path']
+        fmt = options['fmt'] or bulk_import.detect_format(path)
+        if fmt is None:
+            raise CommandError('Cannot guess the format; pass --format csv or --format jsonl')
+
+        if path == '-':
+            report = self._import(sys.stdin.buffer, fmt, options)
+        else:
+            try:
+                with open(path, 'rb') as stream:
+                    report = self._import(stream, fmt, options)
+            except OSError as e:
+                raise CommandError(str(e))
+
+        for error in report['errors']:
+            self.stderr.write(f"row {error['row']}: {json.dumps(error['errors'])}")
+        if report['errors_truncated']:
+            self.stderr.write('(further row errors omitted)')
+        self.stdout.write(self.style.SUCCESS(
+            f"Imported {report['created']} books, {report['failed']} rows failed"
+        ))
+        if 'error' in report:
+            raise CommandError(report['error'])
+
+    def _import(self, stream, fmt, options):
+        return bulk_import.import_books(
+            stream, fmt,
+            chunk_size=options['chunk_size'],
+            max_errors=options['max_errors'],
+        )
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from api.facets import rebuild_facets
+
+
+class Command(BaseCommand):
+    help = 'Recompute the precomputed browse facet counts from the book table'
+
+    def handle(self, *args, **options):
+        rows = rebuild_facets()
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt {rows} facet counts'))
@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from api.leaderboard import rebuild_leaderboard
+
+
+class Command(BaseCommand):
+    help = 'Recompute trending and popular book scores from reviews and favorites'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=1000,
+            help='Rows written per bulk INSERT (default: 1000)'
+        )
+
+    def handle(self, *args, **options):
+        books = rebuild_leaderboard(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt leaderboard scores for {books} books'))
@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from api.ratings import rebuild_ratings
+
+
+class Command(BaseCommand):
+    help = 'Recompute avg_rating, review_count and the star histogram of every book'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=1000,
+            help='Books written per bulk UPDATE (default: 1000)'
+        )
+
+    def handle(self, *args, **options):
+        changed = rebuild_ratings(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'Updated rating aggregates for {changed} books'))
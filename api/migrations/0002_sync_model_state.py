@@ -0,0 +1,78 @@
+# Generated by Django 5.1.1 on 2026-10-18 02:40
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def create_missing_tables(apps, schema_editor):
+    """Bring a database built from 0001 up to the deployed schema
+
+    The production tables (book, user, review, favorite_pages) predate
+    these migrations, so the state changes below must not touch them.
+    Only a database created from 0001 alone, such as the test database,
+    still has the api_* tables; rename those and create favorite_pages.
+    api_list is left alone.
+    """
+    tables = set(schema_editor.connection.introspection.table_names())
+    for name in ('Book', 'User', 'Review'):
+        model = apps.get_model('api', name)
+        old_table = f'api_{name.lower()}'
+        if model._meta.db_table not in tables and old_table in tables:
+            schema_editor.alter_db_table(model, old_table, model._meta.db_table)
+    favorites = apps.get_model('api', 'FavoritePages')
+    if favorites._meta.db_table not in tables:
+        schema_editor.create_model(favorites)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0001_initial'),
+    ]
+
+    operations = [
+        # Model state only: the deployed tables already look like this
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.CreateModel(
+                    name='FavoritePages',
+                    fields=[
+                        ('favorite_id', models.AutoField(primary_key=True, serialize=False)),
+                        ('user_id', models.IntegerField()),
+                        ('book_id', models.IntegerField()),
+                        ('reading_status', models.CharField(choices=[('WANT_TO_READ', 'Want to Read'), ('CURRENTLY_READING', 'Currently Reading'), ('ALREADY_READ', 'Already Read')], default='WANT_TO_READ', max_length=20)),
+                        ('created_at', models.DateTimeField(auto_now_add=True)),
+                    ],
+                    options={
+                        'db_table': 'favorite_pages',
+                    },
+                ),
+                migrations.AlterField(
+                    model_name='review',
+                    name='book',
+                    field=models.ForeignKey(db_column='book_id', on_delete=django.db.models.deletion.CASCADE, to='api.book'),
+                ),
+                migrations.AlterField(
+                    model_name='review',
+                    name='user',
+                    field=models.ForeignKey(db_column='user_id', on_delete=django.db.models.deletion.CASCADE, to='api.user'),
+                ),
+                migrations.AlterModelTable(
+                    name='book',
+                    table='book',
+                ),
+                migrations.AlterModelTable(
+                    name='review',
+                    table='review',
+                ),
+                migrations.AlterModelTable(
+                    name='user',
+                    table='user',
+                ),
+                migrations.DeleteModel(
+                    name='List',
+                ),
+            ],
+        ),
+        migrations.RunPython(create_missing_tables, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,39 @@
+from django.db import migrations
+
+
+def create_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'mysql':
+        schema_editor.execute(
+            'CREATE FULLTEXT INDEX book_search_idx '
+            'ON book (title, author, description, genre)'
+        )
+    elif vendor == 'sqlite':
+        schema_editor.execute(
+            "CREATE VIRTUAL TABLE book_fts USING fts5("
+            "title, author, description, genre, "
+            "tokenize='porter unicode61')"
+        )
+        schema_editor.execute(
+            'INSERT INTO book_fts (rowid, title, author, description, genre) '
+            'SELECT book_id, title, author, description, genre FROM book'
+        )
+
+
+def drop_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'mysql':
+        schema_editor.execute('DROP INDEX book_search_idx ON book')
+    elif vendor == 'sqlite':
+        schema_editor.execute('DROP TABLE book_fts')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0002_sync_model_state'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
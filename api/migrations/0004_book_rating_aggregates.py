@@ -0,0 +1,67 @@
+# Generated by Django 5.1.1 on 2026-10-18 02:42
+
+from django.db import migrations, models
+from django.db.models import Count, Q
+
+
+def backfill_rating_aggregates(apps, schema_editor):
+    Book = apps.get_model('api', 'Book')
+    Review = apps.get_model('api', 'Review')
+    rows = Review.objects.values('book_id').annotate(
+        **{f'rating_{r}_count': Count('review_id', filter=Q(rating=r)) for r in range(1, 6)}
+    )
+    for row in rows:
+        book_id = row.pop('book_id')
+        review_count = sum(row.values())
+        total = sum(row[f'rating_{r}_count'] * r for r in range(1, 6))
+        Book.objects.filter(pk=book_id).update(
+            review_count=review_count,
+            avg_rating=total / review_count if review_count else 0,
+            **row
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0003_book_search_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='book',
+            name='avg_rating',
+            field=models.FloatField(default=0),
+        ),
+        migrations.AddField(
+            model_name='book',
+            name='rating_1_count',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='book',
+            name='rating_2_count',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='book',
+            name='rating_3_count',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='book',
+            name='rating_4_count',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='book',
+            name='rating_5_count',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='book',
+            name='review_count',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.RunPython(backfill_rating_aggregates, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,55 @@
+# Generated by Django 5.1.1 on 2026-10-18 02:44
+
+from collections import Counter
+
+from django.db import migrations, models
+
+
+def backfill_facet_counts(apps, schema_editor):
+    Book = apps.get_model('api', 'Book')
+    BookFacetCount = apps.get_model('api', 'BookFacetCount')
+    counts = Counter()
+    rows = Book.objects.values_list('genre', 'published_date', 'available_copies')
+    for genre, published_date, available_copies in rows.iterator():
+        counts[('genre', genre)] += 1
+        counts[('decade', str(published_date.year // 10 * 10))] += 1
+        counts[('available', 'true' if available_copies > 0 else 'false')] += 1
+    BookFacetCount.objects.bulk_create([
+        BookFacetCount(facet=facet, value=value, book_count=count)
+        for (facet, value), count in counts.items()
+    ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0004_book_rating_aggregates'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BookFacetCount',
+            fields=[
+                ('facet_count_id', models.AutoField(primary_key=True, serialize=False)),
+                ('facet', models.CharField(max_length=20)),
+                ('value', models.CharField(max_length=50)),
+                ('book_count', models.IntegerField(default=0)),
+            ],
+            options={
+                'db_table': 'book_facet_count',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='book',
+            index=models.Index(fields=['genre'], name='book_genre_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='book',
+            index=models.Index(fields=['published_date'], name='book_published_date_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='bookfacetcount',
+            constraint=models.UniqueConstraint(fields=('facet', 'value'), name='unique_book_facet_value'),
+        ),
+        migrations.RunPython(backfill_facet_counts, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 5.1.1 on 2026-10-18 02:50
+
+from django.db import migrations, models
+from django.db.models import Count, Min
+
+
+def remove_duplicate_favorites(apps, schema_editor):
+    """Keep the oldest row for each (user_id, book_id) before adding the constraint"""
+    FavoritePages = apps.get_model('api', 'FavoritePages')
+    duplicates = (
+        FavoritePages.objects.values('user_id', 'book_id')
+        .annotate(keep=Min('favorite_id'), rows=Count('favorite_id'))
+        .filter(rows__gt=1)
+    )
+    for row in duplicates.iterator():
+        FavoritePages.objects.filter(
+            user_id=row['user_id'], book_id=row['book_id']
+        ).exclude(favorite_id=row['keep']).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0005_book_facets'),
+    ]
+
+    operations = [
+        migrations.RunPython(remove_duplicate_favorites, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='favoritepages',
+            index=models.Index(fields=['user_id', 'reading_status', 'created_at'], name='favorite_user_status_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='favoritepages',
+            constraint=models.UniqueConstraint(fields=('user_id', 'book_id'), name='unique_favorite_user_book'),
+        ),
+    ]
@@ -0,0 +1,53 @@
+# Generated by Django 5.1.1 on 2026-10-18 02:52
+
+from django.db import migrations, models
+from django.db.models import Count, Min, Q
+
+
+def remove_duplicate_reviews(apps, schema_editor):
+    """Keep each user's first review of a book and recount the affected books"""
+    Book = apps.get_model('api', 'Book')
+    Review = apps.get_model('api', 'Review')
+    duplicates = (
+        Review.objects.values('user_id', 'book_id')
+        .annotate(keep=Min('review_id'), rows=Count('review_id'))
+        .filter(rows__gt=1)
+    )
+    book_ids = set()
+    for row in list(duplicates):
+        Review.objects.filter(
+            user_id=row['user_id'], book_id=row['book_id']
+        ).exclude(review_id=row['keep']).delete()
+        book_ids.add(row['book_id'])
+
+    rows = Review.objects.filter(book_id__in=book_ids).values('book_id').annotate(
+        **{f'rating_{r}_count': Count('review_id', filter=Q(rating=r)) for r in range(1, 6)}
+    )
+    for row in rows:
+        book_id = row.pop('book_id')
+        review_count = sum(row.values())
+        total = sum(row[f'rating_{r}_count'] * r for r in range(1, 6))
+        Book.objects.filter(pk=book_id).update(
+            review_count=review_count,
+            avg_rating=total / review_count if review_count else 0,
+            **row
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0006_favorite_pages_constraints'),
+    ]
+
+    operations = [
+        migrations.RunPython(remove_duplicate_reviews, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='review',
+            index=models.Index(fields=['book', 'created_at'], name='review_book_created_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='review',
+            constraint=models.UniqueConstraint(fields=('user', 'book'), name='unique_review_user_book'),
+        ),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 5.1.1 on 2026-10-18 02:55
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0008_book_similarity'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BookLeaderboard',
+            fields=[
+                ('book', models.OneToOneField(db_column='book_id', db_constraint=False, on_delete=django.db.models.deletion.CASCADE, primary_key=True, serialize=False, to='api.book')),
+                ('trending_score', models.FloatField(default=0)),
+                ('popular_score', models.IntegerField(default=0)),
+            ],
+            options={
+                'db_table': 'book_leaderboard',
+                'indexes': [models.Index(fields=['-trending_score'], name='leaderboard_trending_idx'), models.Index(fields=['-popular_score'], name='leaderboard_popular_idx')],
+            },
+        ),
+    ]
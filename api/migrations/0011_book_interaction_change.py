@@ -0,0 +1,24 @@
+# Generated by Django 5.1.1 on 2026-10-18 04:06
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0010_user_updated_at'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BookInteractionChange',
+            fields=[
+                ('book_id', models.IntegerField(primary_key=True, serialize=False)),
+                ('changed_at', models.DateTimeField()),
+            ],
+            options={
+                'db_table': 'book_interaction_change',
+                'indexes': [models.Index(fields=['changed_at'], name='interaction_change_at_idx')],
+            },
+        ),
+    ]
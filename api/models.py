@@ -12,10 +12,16 @@ class User(models.Model):
     is_librarian = models.BooleanField(default=False)
     profile_image = models.CharField(max_length=255, null=True)
     created_at = models.DateTimeField(auto_now_add=True)
+    # Book detail embeds reviewer names and images; its ETag follows this
+    updated_at = models.DateTimeField(auto_now=True)
 
 class Book(models.Model):
     class Meta:
         db_table = 'book'
+        indexes = [
+            models.Index(fields=['genre'], name='book_genre_idx'),
+            models.Index(fields=['published_date'], name='book_published_date_idx'),
+        ]
         
     book_id = models.AutoField(primary_key=True)
     title = models.CharField(max_length=200)
@@ -28,9 +34,24 @@ class Book(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    # Denormalized review aggregates, maintained by api/ratings.py
+    avg_rating = models.FloatField(default=0)
+    review_count = models.IntegerField(default=0)
+    rating_1_count = models.IntegerField(default=0)
+    rating_2_count = models.IntegerField(default=0)
+    rating_3_count = models.IntegerField(default=0)
+    rating_4_count = models.IntegerField(default=0)
+    rating_5_count = models.IntegerField(default=0)
+
 class Review(models.Model):
     class Meta:
         db_table = 'review'
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'book'], name='unique_review_user_book'),
+        ]
+        indexes = [
+            models.Index(fields=['book', 'created_at'], name='review_book_created_idx'),
+        ]
         
     review_id = models.AutoField(primary_key=True)
     user = models.ForeignKey(User, on_delete=models.CASCADE, db_column='user_id')
@@ -43,6 +64,12 @@ class Review(models.Model):
 class FavoritePages(models.Model):
     class Meta:
         db_table = 'favorite_pages'
+        constraints = [
+            models.UniqueConstraint(fields=['user_id', 'book_id'], name='unique_favorite_user_book'),
+        ]
+        indexes = [
+            models.Index(fields=['user_id', 'reading_status', 'created_at'], name='favorite_user_status_idx'),
+        ]
         
     favorite_id = models.AutoField(primary_key=True)
     user_id = models.IntegerField()  # Changed from ForeignKey to match table structure
@@ -56,4 +83,55 @@ class FavoritePages(models.Model):
         ],
         default='WANT_TO_READ'
     )
-    created_at = models.DateTimeField(auto_now_add=True)
\ No newline at end of file
+    created_at = models.DateTimeField(auto_now_add=True)
+
+class BookFacetCount(models.Model):
+    """Precomputed number of books per browse facet value (see api/facets.py)"""
+    class Meta:
+        db_table = 'book_facet_count'
+        constraints = [
+            models.UniqueConstraint(fields=['facet', 'value'], name='unique_book_facet_value'),
+        ]
+
+    facet_count_id = models.AutoField(primary_key=True)
+    facet = models.CharField(max_length=20)
+    value = models.CharField(max_length=50)
+    book_count = models.IntegerField(default=0)
+
+class BookSimilarity(models.Model):
+    """Precomputed most similar books for one book (see api/recommendations.py)"""
+    class Meta:
+        db_table = 'book_similarity'
+
+    book_id = models.IntegerField(primary_key=True)
+    # [[similar_book_id, score], ...], best first
+    neighbors = models.JSONField(default=list)
+    updated_at = models.DateTimeField(auto_now=True)
+
+class BookInteractionChange(models.Model):
+    """Last time a book lost a shelf entry or review, or one changed (see api/recommendations.py)"""
+    class Meta:
+        db_table = 'book_interaction_change'
+        indexes = [
+            models.Index(fields=['changed_at'], name='interaction_change_at_idx'),
+        ]
+
+    book_id = models.IntegerField(primary_key=True)
+    changed_at = models.DateTimeField()
+
+class BookLeaderboard(models.Model):
+    """Trending and popular scores for one book (see api/leaderboard.py)"""
+    class Meta:
+        db_table = 'book_leaderboard'
+        indexes = [
+            models.Index(fields=['-trending_score'], name='leaderboard_trending_idx'),
+            models.Index(fields=['-popular_score'], name='leaderboard_popular_idx'),
+        ]
+
+    # No database constraint: favorites may point at ids with no book row
+    book = models.OneToOneField(
+        Book, primary_key=True, on_delete=models.CASCADE,
+        db_column='book_id', db_constraint=False
+    )
+    trending_score = models.FloatField(default=0)
+    popular_score = models.IntegerField(default=0)
@@ -0,0 +1,55 @@
+# pagination.py
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import CursorPagination
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+class KeysetPagination(CursorPagination):
+    """
+    Opaque-cursor pagination that seeks on a unique key.
+
+    The cursor encodes the last primary key seen, so every page is a
+    `WHERE pk < cursor ORDER BY pk DESC LIMIT n` index range scan and deep
+    pages cost the same as the first one (no OFFSET).
+    """
+    page_size = 20
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+    cursor_query_param = 'cursor'
+
+    def decode_cursor(self, request):
+        """Raise InvalidCursor for a cursor this paginator did not issue
+
+        Every ordering here is on an integer key, so a position that is not
+        an integer has been tampered with.
+        """
+        try:
+            cursor = super().decode_cursor(request)
+        except NotFound:
+            raise InvalidCursor('Invalid cursor')
+        if cursor is not None and cursor.position is not None:
+            try:
+                int(cursor.position)
+            except ValueError:
+                raise InvalidCursor('Invalid cursor')
+        return cursor
+
+
+class BookPagination(KeysetPagination):
+    ordering = '-book_id'
+
+
+class ReviewPagination(KeysetPagination):
+    ordering = '-review_id'
+
+
+class FavoritePagination(KeysetPagination):
+    ordering = '-favorite_id'
+
+
+class UserPagination(KeysetPagination):
+    ordering = 'user_id'
+
@@ -0,0 +1,173 @@
+# ratings.py
+"""
+Denormalized rating aggregates on Book.
+
+Each book carries review_count, a 1-5 star histogram (rating_N_count) and
+avg_rating, so lists and detail pages never aggregate Review rows on read.
+The review write views call review_added / review_removed inside the same
+transaction as the review write, and delete_account calls reviews_removed
+for the reviews its user delete cascades to; rebuild_ratings recomputes
+everything from scratch.
+"""
+from collections import Counter, defaultdict
+
+from django.db.models import Case, Count, F, FloatField, IntegerField, Q, Value, When
+from django.db.models.functions import Cast
+from django.utils import timezone
+
+from .models import Book, Review
+from . import caching
+
+RATING_VALUES = range(1, 6)
+
+
+def histogram_field(rating):
+    return f'rating_{rating}_count'
+
+
+def parse_rating(value):
+    """Return `value` as an int star rating, or None if it is not 1-5
+
+    Booleans and non-integral numbers (4.9) are rejected, not truncated.
+    """
+    if isinstance(value, bool):
+        return None
+    if isinstance(value, float):
+        if not value.is_integer():
+            return None
+        value = int(value)
+    try:
+        rating = int(value)
+    except (TypeError, ValueError):
+        return None
+    return rating if rating in RATING_VALUES else None
+
+
+def _average_expression():
+    total = sum(F(histogram_field(r)) * r for r in RATING_VALUES)
+    return Case(
+        When(review_count=0, then=Value(0.0)),
+        default=Cast(total, FloatField()) / F('review_count'),
+        output_field=FloatField(),
+    )
+
+
+def _apply(book_id, rating, delta):
+    # Two statements: the first takes the row lock and moves the counters,
+    # the second derives the average from the locked, updated row. Doing it
+    # in one UPDATE is not portable because MySQL and SQLite disagree on
+    # whether SET expressions see earlier assignments.
+    if rating not in RATING_VALUES:
+        return  # legacy out-of-range ratings are not counted
+    Book.objects.filter(pk=book_id).update(
+        review_count=F('review_count') + delta,
+        **{histogram_field(rating): F(histogram_field(rating)) + delta},
+        updated_at=timezone.now(),
+    )
+    Book.objects.filter(pk=book_id).update(avg_rating=_average_expression())
+
+
+def review_added(book_id, rating):
+    """Count a new review. Call inside the transaction that creates it."""
+    _apply(book_id, rating, 1)
+
+
+def review_removed(book_id, rating):
+    """Uncount a review. Call inside the transaction that deletes it."""
+    _apply(book_id, rating, -1)
+
+
+def _per_book(values):
+    """CASE book_id WHEN ... THEN value END, 0 for books not in `values`"""
+    return Case(
+        *[When(book_id=book_id, then=Value(value)) for book_id, value in values.items()],
+        default=Value(0), output_field=IntegerField(),
+    )
+
+
+def reviews_removed(rows, batch_size=500):
+    """Uncount many `(book_id, rating)` reviews with two UPDATEs per batch of books
+
+    Call inside the transaction that deletes them, e.g. before deleting a
+    user, whose reviews go by cascade without passing through the views.
+    """
+    per_book = defaultdict(Counter)
+    for book_id, rating in rows:
+        if rating in RATING_VALUES:
+            per_book[book_id][rating] += 1
+    book_ids = sorted(per_book)
+    for start in range(0, len(book_ids), batch_size):
+        batch = {book_id: per_book[book_id] for book_id in book_ids[start:start + batch_size]}
+        histograms = {
+            histogram_field(r): F(histogram_field(r)) - _per_book(
+                {book_id: counts[r] for book_id, counts in batch.items() if counts[r]}
+            )
+            for r in RATING_VALUES if any(counts[r] for counts in batch.values())
+        }
+        books = Book.objects.filter(pk__in=batch)
+        books.update(
+            review_count=F('review_count') - _per_book(
+                {book_id: sum(counts.values()) for book_id, counts in batch.items()}
+            ),
+            **histograms,
+            updated_at=timezone.now(),
+        )
+        books.update(avg_rating=_average_expression())
+
+
+def review_changed(old_book_id, old_rating, new_book_id, new_rating):
+    """Move a review between buckets (and books) after an edit"""
+    if (old_book_id, old_rating) == (new_book_id, new_rating):
+        return
+    review_removed(old_book_id, old_rating)
+    review_added(new_book_id, new_rating)
+
+
+def rebuild_ratings(batch_size=1000):
+    """Recompute the aggregates of every book from the review table.
+
+    Returns the number of books whose aggregates changed.
+    """
+    histograms = {
+        row[0]: row[1:]
+        for row in Review.objects.values('book_id').annotate(
+            **{
+                histogram_field(r): Count('review_id', filter=Q(rating=r))
+                for r in RATING_VALUES
+            }
+        ).values_list('book_id', *[histogram_field(r) for r in RATING_VALUES])
+    }
+
+    fields = ['review_count', 'avg_rating', 'updated_at'] + [
+        histogram_field(r) for r in RATING_VALUES
+    ]
+    empty = (0,) * len(RATING_VALUES)
+    now = timezone.now()
+    changed = 0
+    batch = []
+    for book in Book.objects.only('book_id', *fields).iterator(chunk_size=batch_size):
+        counts = histograms.get(book.pk, empty)
+        # Only 1-5 star reviews are counted, matching the live updates.
+        review_count = sum(counts)
+        total = sum(count * r for count, r in zip(counts, RATING_VALUES))
+        avg_rating = total / review_count if review_count else 0
+        current = tuple(getattr(book, histogram_field(r)) for r in RATING_VALUES)
+        if (current, book.review_count, book.avg_rating) == (counts, review_count, avg_rating):
+            continue
+
+        for count, r in zip(counts, RATING_VALUES):
+            setattr(book, histogram_field(r), count)
+        book.review_count = review_count
+        book.avg_rating = avg_rating
+        book.updated_at = now
+        batch.append(book)
+        if len(batch) >= batch_size:
+            Book.objects.bulk_update(batch, fields)
+            changed += len(batch)
+            batch = []
+    if batch:
+        Book.objects.bulk_update(batch, fields)
+        changed += len(batch)
+    if changed:
+        caching.invalidate(caching.BOOKS)
+    return changed
@@ -0,0 +1,248 @@
+# recommendations.py
+"""
+Item-to-item recommendations from shelves and reviews.
+
+Every favorite and review becomes an entry in a sparse user x book
+matrix: shelved books count by reading status, reviewed books by rating.
+Each book column is L2-normalised, so a column product is the cosine
+similarity of two books' audiences. The top-K most similar books of every
+book are stored in book_similarity as one compact JSON row per book:
+serving "similar books" is a primary-key lookup, and "because you read"
+merges the rows of a handful of the user's books.
+
+`python manage.py build_recommendations` rebuilds the whole table;
+`--since-minutes` refreshes only books with recent shelf or review
+activity, and the books whose rows that activity changes: every book
+sharing a reader with them, and their previously stored neighbors.
+New favorites and reviews are found by their timestamps; removals,
+reading-status changes and reviews moved to another book leave none, so
+the write views record those books with interactions_changed().
+"""
+from datetime import timedelta
+
+import numpy as np
+from scipy import sparse
+from django.utils import timezone
+
+from .models import BookInteractionChange, BookSimilarity, FavoritePages, Review
+from . import caching
+
+DEFAULT_TOP_K = 20
+DEFAULT_BLOCK_SIZE = 500
+
+# How much an interaction says about a reader's taste
+READING_STATUS_WEIGHTS = {
+    'WANT_TO_READ': 0.5,
+    'CURRENTLY_READING': 1.0,
+    'ALREADY_READ': 1.0,
+}
+RATING_WEIGHTS = {1: 0.0, 2: 0.25, 3: 0.5, 4: 1.0, 5: 1.5}
+
+# "Because you read" starts from the user's recent books they liked
+SEED_READING_STATUSES = ('CURRENTLY_READING', 'ALREADY_READ')
+SEED_MIN_RATING = 4
+MAX_SEEDS = 20
+
+
+def _interactions():
+    """Yield (user_id, book_id, weight) for every favorite and review"""
+    favorites = FavoritePages.objects.values_list('user_id', 'book_id', 'reading_status')
+    for user_id, book_id, reading_status in favorites.iterator(chunk_size=5000):
+        yield user_id, book_id, READING_STATUS_WEIGHTS.get(reading_status, 0.5)
+    reviews = Review.objects.values_list('user_id', 'book_id', 'rating')
+    for user_id, book_id, rating in reviews.iterator(chunk_size=5000):
+        yield user_id, book_id, RATING_WEIGHTS.get(rating, 0.0)
+
+
+def build_matrix():
+    """Return (book_ids, matrix): a users x books CSR matrix, columns L2-normalised"""
+    rows = np.fromiter(
+        (value for row in _interactions() for value in row), dtype=np.float64
+    ).reshape(-1, 3)
+    if not len(rows):
+        return np.array([], dtype=np.int64), sparse.csr_matrix((0, 0))
+    user_ids, user_index = np.unique(rows[:, 0].astype(np.int64), return_inverse=True)
+    book_ids, book_index = np.unique(rows[:, 1].astype(np.int64), return_inverse=True)
+    # Duplicate (user, book) entries, e.g. shelved and reviewed, are summed
+    matrix = sparse.csr_matrix(
+        (rows[:, 2], (user_index, book_index)), shape=(len(user_ids), len(book_ids))
+    )
+    matrix.eliminate_zeros()
+    norms = np.sqrt(np.asarray(matrix.multiply(matrix).sum(axis=0)).ravel())
+    norms[norms == 0] = 1.0
+    return book_ids, sparse.csr_matrix(matrix @ sparse.diags(1.0 / norms))
+
+
+def top_k_neighbors(book_ids, matrix, transposed, positions, top_k):
+    """Yield (book_id, [[neighbor_id, score], ...]) for the given columns
+
+    `transposed` is `matrix.T` as CSR, so a block of book rows is cheap to slice.
+    """
+    similarities = (transposed[positions] @ matrix).tocsr()
+    for row, position in enumerate(positions):
+        start, end = similarities.indptr[row], similarities.indptr[row + 1]
+        columns = similarities.indices[start:end]
+        scores = similarities.data[start:end]
+        keep = (columns != position) & (scores > 0)
+        columns, scores = columns[keep], scores[keep]
+        if len(scores) > top_k:
+            best = np.argpartition(-scores, top_k - 1)[:top_k]
+            columns, scores = columns[best], scores[best]
+        order = np.lexsort((book_ids[columns], -scores))
+        yield int(book_ids[position]), [
+            [int(book_ids[columns[i]]), round(float(scores[i]), 4)] for i in order
+        ]
+
+
+def _save(neighbors_by_book, now):
+    BookSimilarity.objects.bulk_create(
+        [
+            BookSimilarity(book_id=book_id, neighbors=neighbors, updated_at=now)
+            for book_id, neighbors in neighbors_by_book.items()
+        ],
+        batch_size=DEFAULT_BLOCK_SIZE,
+        update_conflicts=True,
+        unique_fields=['book_id'],
+        update_fields=['neighbors', 'updated_at'],
+    )
+
+
+def _affected_positions(all_book_ids, matrix, transposed, book_ids):
+    """Columns whose rows change when the given books' interactions do
+
+    A book's similarity to every book sharing a reader with it moves, so
+    those books' rows are refreshed too. Their previously stored neighbors
+    are added for the pairs that no longer share a reader.
+    """
+    positions = np.flatnonzero(np.isin(all_book_ids, book_ids))
+    readers = np.unique(transposed[positions].indices)
+    affected = set(book_ids)
+    affected.update(all_book_ids[np.unique(matrix[readers].indices)].tolist())
+    stored = BookSimilarity.objects.filter(book_id__in=book_ids).values_list('neighbors', flat=True)
+    for neighbors in stored:
+        affected.update(neighbor_id for neighbor_id, _ in neighbors)
+    return np.flatnonzero(np.isin(all_book_ids, np.array(sorted(affected), dtype=np.int64)))
+
+
+def rebuild_similarities(top_k=DEFAULT_TOP_K, block_size=DEFAULT_BLOCK_SIZE, book_ids=None):
+    """Recompute and store similar books. Returns the number of books written.
+
+    With `book_ids` those books' rows and the rows their changes affect
+    are refreshed (against the full, current matrix); otherwise every row
+    is rebuilt and stale ones removed. Rows are upserted block by block,
+    so readers never see an empty table.
+    """
+    started = timezone.now()
+    all_book_ids, matrix = build_matrix()
+    transposed = matrix.T.tocsr()
+    if book_ids is None:
+        positions = np.arange(len(all_book_ids))
+    else:
+        wanted = np.array(sorted(set(book_ids)), dtype=np.int64)
+        positions = _affected_positions(all_book_ids, matrix, transposed, wanted)
+        # Books that lost all their interactions have no neighbors left
+        BookSimilarity.objects.filter(
+            book_id__in=np.setdiff1d(wanted, all_book_ids).tolist()
+        ).delete()
+
+    written = 0
+    for start in range(0, len(positions), block_size):
+        block = positions[start:start + block_size]
+        _save(dict(top_k_neighbors(all_book_ids, matrix, transposed, block, top_k)), timezone.now())
+        written += len(block)
+
+    if book_ids is None:
+        BookSimilarity.objects.filter(updated_at__lt=started).delete()
+        BookInteractionChange.objects.filter(changed_at__lt=started).delete()
+    caching.invalidate(caching.RECOMMENDATIONS)
+    return written
+
+
+def interactions_changed(book_ids):
+    """Record books that lost a favorite or review, or had one changed
+
+    Called inside the write's transaction. One upsert for all the books.
+    """
+    now = timezone.now()
+    BookInteractionChange.objects.bulk_create(
+        [BookInteractionChange(book_id=book_id, changed_at=now) for book_id in set(book_ids)],
+        batch_size=DEFAULT_BLOCK_SIZE,
+        update_conflicts=True,
+        unique_fields=['book_id'],
+        update_fields=['changed_at'],
+    )
+
+
+def recently_active_books(minutes):
+    """Books shelved, reviewed, or with either removed or changed in the last `minutes` minutes"""
+    since = timezone.now() - timedelta(minutes=minutes)
+    book_ids = set(
+        FavoritePages.objects.filter(created_at__gte=since).values_list('book_id', flat=True)
+    )
+    book_ids.update(
+        Review.objects.filter(updated_at__gte=since).values_list('book_id', flat=True)
+    )
+    book_ids.update(
+        BookInteractionChange.objects.filter(changed_at__gte=since).values_list('book_id', flat=True)
+    )
+    return book_ids
+
+
+def similar_books(book_id, limit):
+    """Return [(book_id, score), ...] most similar to `book_id`"""
+    row = BookSimilarity.objects.filter(pk=book_id).values_list('neighbors', flat=True).first()
+    return [(neighbor_id, score) for neighbor_id, score in (row or [])[:limit]]
+
+
+def _user_books(user_id):
+    """Return (seeds, known) for a user
+
+    `seeds` are the most recent books the user read or rated highly, newest
+    first; `known` is every book already on their shelf or reviewed.
+    """
+    shelved = FavoritePages.objects.filter(user_id=user_id).values_list(
+        'book_id', 'reading_status', 'created_at'
+    )
+    reviewed = Review.objects.filter(user_id=user_id).values_list(
+        'book_id', 'rating', 'created_at'
+    )
+    known = set()
+    candidates = []
+    for book_id, reading_status, created_at in shelved:
+        known.add(book_id)
+        if reading_status in SEED_READING_STATUSES:
+            candidates.append((created_at, book_id))
+    for book_id, rating, created_at in reviewed:
+        known.add(book_id)
+        if rating >= SEED_MIN_RATING:
+            candidates.append((created_at, book_id))
+    candidates.sort(reverse=True)
+    seeds = list(dict.fromkeys(book_id for _, book_id in candidates))[:MAX_SEEDS]
+    return seeds, known
+
+
+def because_you_read(user_id, limit):
+    """Return [(book_id, score, seed_book_id), ...] for a user
+
+    Neighbor scores are summed over the user's seed books; books already
+    on the user's shelf or reviewed by them are left out. `seed_book_id`
+    is the seed that contributed most to each recommendation.
+    """
+    seeds, known = _user_books(user_id)
+    if not seeds:
+        return []
+
+    scores = {}
+    best_seed = {}
+    rows = BookSimilarity.objects.filter(book_id__in=seeds).values_list('book_id', 'neighbors')
+    for seed_id, neighbors in rows:
+        for neighbor_id, score in neighbors:
+            if neighbor_id in known:
+                continue
+            scores[neighbor_id] = scores.get(neighbor_id, 0.0) + score
+            if score > best_seed.get(neighbor_id, (None, 0.0))[1]:
+                best_seed[neighbor_id] = (seed_id, score)
+    ranked = sorted(scores.items(), key=lambda item: (-item[1], item[0]))[:limit]
+    return [
+        (book_id, round(score, 4), best_seed[book_id][0]) for book_id, score in ranked
+    ]
@@ -0,0 +1,118 @@
+# replicas.py
+"""
+Read replicas.
+
+settings.DATABASE_REPLICAS lists database aliases that hold read-only
+copies of `default`. ReplicaMiddleware lets GET and HEAD requests read
+from a random replica; everything else, and every write, uses the
+primary. A reader inside a transaction also stays on the primary.
+
+Replicas lag the primary. So that a client sees its own writes, any
+other request (POST, PUT, DELETE...) sets a cookie that pins the client
+to the primary for REPLICA_STICKY_SECONDS, which should exceed the
+usual replication lag. The cookie is only marked Secure (and
+SameSite=None, for the cross-site frontend) on HTTPS requests, so it
+also works over plain-HTTP local development. Clients without a cookie
+jar get the same pin from the X-Primary-Until response header and send
+it back as a request header. The response cache keys primary and replica
+reads separately (api/caching.py), so a pinned client never gets an
+entry that another client read from a lagging replica.
+"""
+import random
+import time
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.utils.decorators import sync_and_async_middleware
+
+PIN_COOKIE = 'bookhive_primary'
+PIN_HEADER = 'X-Primary-Until'
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+_replica_reads = ContextVar('replica_reads', default=False)
+
+
+def replica_aliases():
+    return getattr(settings, 'DATABASE_REPLICAS', [])
+
+
+def reading_from_replica():
+    """Whether reads in the current request go to a replica"""
+    return _replica_reads.get() and bool(replica_aliases())
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        aliases = replica_aliases()
+        if not aliases or not _replica_reads.get():
+            return None
+        if connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return DEFAULT_DB_ALIAS
+        return random.choice(aliases)
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas hold the same rows, so objects read from any of them can relate
+        databases = {DEFAULT_DB_ALIAS, *replica_aliases()}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+
+def _pinned(request):
+    for value in (request.COOKIES.get(PIN_COOKIE), request.headers.get(PIN_HEADER)):
+        try:
+            if value and float(value) > time.time():
+                return True
+        except ValueError:
+            pass
+    return False
+
+
+def _start(request):
+    use_replica = (
+        bool(replica_aliases())
+        and request.method in SAFE_METHODS
+        and not _pinned(request)
+    )
+    return _replica_reads.set(use_replica)
+
+
+def _finish(request, response):
+    if replica_aliases() and request.method not in SAFE_METHODS:
+        window = settings.REPLICA_STICKY_SECONDS
+        until = str(int(time.time() + window))
+        # Browsers drop Secure cookies over http, and SameSite=None needs Secure
+        secure = request.is_secure()
+        response.set_cookie(
+            PIN_COOKIE, until, max_age=window,
+            httponly=True, secure=secure, samesite='None' if secure else 'Lax'
+        )
+        response[PIN_HEADER] = until
+    return response
+
+
+@sync_and_async_middleware
+def ReplicaMiddleware(get_response):
+    """Route safe requests' reads to replicas; pin writers to the primary"""
+    if iscoroutinefunction(get_response):
+        async def middleware(request):
+            token = _start(request)
+            try:
+                response = await get_response(request)
+            finally:
+                _replica_reads.reset(token)
+            return _finish(request, response)
+    else:
+        def middleware(request):
+            token = _start(request)
+            try:
+                response = get_response(request)
+            finally:
+                _replica_reads.reset(token)
+            return _finish(request, response)
+    return middleware
@@ -0,0 +1,111 @@
+# search.py
+"""
+Ranked full-text search over book title, author, description and genre.
+
+MySQL uses the `book_search_idx` FULLTEXT index and orders by MATCH()
+relevance. SQLite (local development and tests) uses the `book_fts` FTS5
+table with the porter stemmer and bm25() ranking; that table is kept in
+sync from the Book signals in signals.py. Both indexes are created by
+migration 0003. Other backends fall back to an unranked icontains filter.
+"""
+import re
+
+from django.db import connection
+from django.db.models import Q
+
+from .models import Book
+
+TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+
+# bm25() column weights for (title, author, description, genre)
+FTS_WEIGHTS = (10.0, 5.0, 1.0, 2.0)
+
+
+def tokenize(query):
+    """Split a free-text query into lowercase word tokens"""
+    return TOKEN_RE.findall(query.lower())
+
+
+def search_book_ids(query, limit):
+    """Return up to `limit` book ids matching `query`, best match first"""
+    tokens = tokenize(query)
+    if not tokens:
+        return []
+
+    if connection.vendor == 'mysql':
+        sql = (
+            'SELECT book_id FROM book '
+            'WHERE MATCH(title, author, description, genre) '
+            'AGAINST (%s IN NATURAL LANGUAGE MODE) '
+            'ORDER BY MATCH(title, author, description, genre) '
+            'AGAINST (%s IN NATURAL LANGUAGE MODE) DESC '
+            'LIMIT %s'
+        )
+        text = ' '.join(tokens)
+        params = [text, text, limit]
+    elif connection.vendor == 'sqlite':
+        # Quote every token so user input can never be parsed as FTS5
+        # query syntax; adjacent phrases are ANDed together.
+        sql = (
+            'SELECT rowid FROM book_fts WHERE book_fts MATCH %s '
+            'ORDER BY bm25(book_fts, {}) LIMIT %s'
+        ).format(', '.join(str(w) for w in FTS_WEIGHTS))
+        params = [' '.join(f'"{token}"' for token in tokens), limit]
+    else:
+        condition = Q()
+        for token in tokens:
+            condition &= (
+                Q(title__icontains=token) | Q(author__icontains=token) |
+                Q(description__icontains=token) | Q(genre__icontains=token)
+            )
+        return list(
+            Book.objects.filter(condition)
+            .order_by('book_id')
+            .values_list('book_id', flat=True)[:limit]
+        )
+
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        return [row[0] for row in cursor.fetchall()]
+
+
+def search_books(query, limit, queryset=None):
+    """Return up to `limit` Book instances matching `query` in rank order"""
+    book_ids = search_book_ids(query, limit)
+    if queryset is None:
+        queryset = Book.objects.all()
+    books = queryset.in_bulk(book_ids)
+    return [books[book_id] for book_id in book_ids if book_id in books]
+
+
+def index_book(book):
+    """Add or refresh one book in the search index"""
+    index_books([book])
+
+
+def index_books(books):
+    """Add or refresh several books in the search index"""
+    # InnoDB maintains FULLTEXT indexes itself; only FTS5 needs a write.
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        cursor.executemany(
+            'DELETE FROM book_fts WHERE rowid = %s',
+            [[book.pk] for book in books]
+        )
+        cursor.executemany(
+            'INSERT INTO book_fts (rowid, title, author, description, genre) '
+            'VALUES (%s, %s, %s, %s, %s)',
+            [
+                [book.pk, book.title, book.author, book.description, book.genre]
+                for book in books
+            ]
+        )
+
+
+def unindex_book(book_id):
+    """Remove one book from the search index"""
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        cursor.execute('DELETE FROM book_fts WHERE rowid = %s', [book_id])
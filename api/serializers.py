@@ -1,36 +1,86 @@
 # serializers.py
 from rest_framework import serializers
 from .models import User, Book, Review, FavoritePages
+from .ratings import parse_rating
+from .instrumentation import span
 
-class UserSerializer(serializers.ModelSerializer):
+class DynamicFieldsModelSerializer(serializers.ModelSerializer):
+    """
+    A ModelSerializer that takes an additional `fields` argument that
+    controls which fields should be displayed.
+    """
+    def __init__(self, *args, **kwargs):
+        fields = kwargs.pop('fields', None)
+        super().__init__(*args, **kwargs)
+        if fields is not None:
+            allowed = set(fields)
+            for field_name in set(self.fields) - allowed:
+                self.fields.pop(field_name)
+
+    def to_representation(self, instance):
+        with span('serialize'):
+            return super().to_representation(instance)
+
+class UserSerializer(DynamicFieldsModelSerializer):
     class Meta:
         model = User
         fields = '__all__'
 
-class BookSerializer(serializers.ModelSerializer):
+class BookSerializer(DynamicFieldsModelSerializer):
     class Meta:
         model = Book
         fields = '__all__'
+        read_only_fields = [
+            'avg_rating', 'review_count', 'rating_1_count', 'rating_2_count',
+            'rating_3_count', 'rating_4_count', 'rating_5_count'
+        ]
 
-class ReviewSerializer(serializers.ModelSerializer):
+class ReviewSerializer(DynamicFieldsModelSerializer):
     class Meta:
         model = Review
         fields = '__all__'
 
+    def validate_rating(self, value):
+        if parse_rating(value) is None:
+            raise serializers.ValidationError('Rating must be an integer from 1 to 5')
+        return value
+
+class ReviewWithReviewerSerializer(ReviewSerializer):
+    """Review plus the reviewer's public profile; use with select_related('user')"""
+    username = serializers.CharField(source='user.username', read_only=True)
+    profile_image = serializers.CharField(source='user.profile_image', read_only=True)
+
+class FavoritePagesListSerializer(serializers.ListSerializer):
+    """Loads the books for a whole page of favorites with one query"""
+    def to_representation(self, data):
+        favorites = list(data.all() if hasattr(data, 'all') else data)
+        book_ids = {favorite.book_id for favorite in favorites}
+        self.child.books = Book.objects.only('book_id', 'title', 'author', 'genre').in_bulk(book_ids)
+        return super().to_representation(favorites)
+
 class FavoritePagesSerializer(serializers.ModelSerializer):
     book_details = serializers.SerializerMethodField()
     
     class Meta:
         model = FavoritePages
         fields = ['favorite_id', 'user_id', 'book_id', 'reading_status', 'created_at', 'book_details']
+        list_serializer_class = FavoritePagesListSerializer
+
+    def to_representation(self, instance):
+        with span('serialize'):
+            return super().to_representation(instance)
     
     def get_book_details(self, obj):
-        try:
-            book = Book.objects.get(book_id=obj.book_id)
-            return {
-                'title': book.title,
-                'author': book.author,
-                'genre': book.genre
-            }
-        except Book.DoesNotExist:
-            return None
\ No newline at end of file
+        # Set by FavoritePagesListSerializer when serializing many=True
+        books = getattr(self, 'books', None)
+        if books is not None:
+            book = books.get(obj.book_id)
+        else:
+            book = Book.objects.filter(book_id=obj.book_id).first()
+        if book is None:
+            return None
+        return {
+            'title': book.title,
+            'author': book.author,
+            'genre': book.genre
+        }
@@ -0,0 +1,209 @@
+# shelf.py
+"""
+Batch changes to a user's shelf (favorite_pages).
+
+Offline clients send every add / update / remove made since their last
+sync in one request. apply_operations replays them in order against the
+user's current shelf in memory, then writes the net result with at most
+three statements inside one transaction: an IN DELETE for removed books,
+a bulk INSERT for new (or re-added) books and a CASE UPDATE for status
+changes.
+
+It also builds the per-user shelf summary (count and most recent books per
+reading status) shown in the shelf header. Summaries are cached under the
+favorites and books cache versions (api/caching.py), so any favorite or
+book write, and the delayed bump after replica lag, makes them stale.
+"""
+from django.db import transaction
+from django.db.models import Case, Count, F, Value, When, Window
+from django.db.models.functions import RowNumber
+
+from .models import Book, FavoritePages
+from . import caching, leaderboard, recommendations
+from .serializers import FavoritePagesSerializer
+
+ADD = 'add'
+UPDATE = 'update'
+REMOVE = 'remove'
+OPERATIONS = (ADD, UPDATE, REMOVE)
+
+READING_STATUSES = [
+    value for value, _ in FavoritePages._meta.get_field('reading_status').choices
+]
+DEFAULT_READING_STATUS = FavoritePages._meta.get_field('reading_status').default
+
+MAX_OPERATIONS = 500
+
+SUMMARY_MAX_RECENT = 20
+SUMMARY_CACHE_TIMEOUT = 300
+
+
+def _parse_operation(operation):
+    """Return (op, book_id, reading_status) or raise ValueError with a message"""
+    if not isinstance(operation, dict):
+        raise ValueError('Operation must be an object')
+    op = operation.get('op')
+    if op not in OPERATIONS:
+        raise ValueError(f"op must be one of {', '.join(OPERATIONS)}")
+    try:
+        book_id = int(operation.get('book_id'))
+    except (TypeError, ValueError):
+        raise ValueError('book_id must be an integer')
+    reading_status = operation.get('reading_status')
+    if op == ADD and reading_status is None:
+        reading_status = DEFAULT_READING_STATUS
+    if op != REMOVE and reading_status not in READING_STATUSES:
+        raise ValueError(f"reading_status must be one of {', '.join(READING_STATUSES)}")
+    return op, book_id, reading_status
+
+
+def apply_operations(user_id, operations):
+    """Apply a list of shelf operations for one user atomically
+
+    Returns one result dict per operation, in request order, plus totals.
+    An operation that cannot be applied (bad input, adding a book already
+    on the shelf, updating or removing one that is not) is reported as an
+    error and skipped; the rest are still applied. A stored book that is
+    removed and added again is deleted and inserted anew, as reported.
+    """
+    parsed = []
+    book_ids = set()
+    for operation in operations:
+        try:
+            parsed.append(_parse_operation(operation))
+            book_ids.add(parsed[-1][1])
+        except ValueError as e:
+            parsed.append(e)
+
+    results = []
+    with transaction.atomic():
+        rows = (
+            FavoritePages.objects.select_for_update()
+            .filter(user_id=user_id, book_id__in=book_ids)
+            .values_list('book_id', 'reading_status', 'created_at')
+        )
+        before = {}
+        created_at = {}
+        for book_id, reading_status, added_at in rows:
+            before[book_id] = reading_status
+            created_at[book_id] = added_at
+        existing_books = set(
+            Book.objects.filter(pk__in=book_ids).values_list('book_id', flat=True)
+        )
+
+        # Replay the operations against the shelf state
+        after = dict(before)
+        removed = set()
+        for index, item in enumerate(parsed):
+            if isinstance(item, ValueError):
+                results.append({'index': index, 'status': 'error', 'error': str(item)})
+                continue
+            op, book_id, reading_status = item
+            result = {'index': index, 'op': op, 'book_id': book_id}
+            if op == ADD:
+                if book_id not in existing_books:
+                    result.update(status='error', error='Book not found')
+                elif after.get(book_id) is not None:
+                    result.update(status='error', error='Book is already in favorites')
+                else:
+                    after[book_id] = reading_status
+                    result['status'] = 'created'
+            elif after.get(book_id) is None:
+                result.update(status='error', error='Book is not in favorites')
+            elif op == UPDATE:
+                after[book_id] = reading_status
+                result['status'] = 'updated'
+            else:
+                after[book_id] = None
+                if book_id in before:
+                    removed.add(book_id)
+                result['status'] = 'removed'
+            results.append(result)
+
+        # Write the net difference; stored rows that were removed go even
+        # if the book was added back, so it gets a new row and created_at
+        to_delete = list(removed)
+        to_create = [
+            book_id for book_id, value in after.items()
+            if value is not None and (book_id not in before or book_id in removed)
+        ]
+        to_update = {
+            book_id: value for book_id, value in after.items()
+            if value is not None and book_id in before and book_id not in removed
+            and before[book_id] != value
+        }
+        if to_delete:
+            FavoritePages.objects.filter(user_id=user_id, book_id__in=to_delete).delete()
+        created = []
+        if to_create:
+            created = FavoritePages.objects.bulk_create([
+                FavoritePages(user_id=user_id, book_id=book_id, reading_status=after[book_id])
+                for book_id in to_create
+            ])
+        if to_update:
+            FavoritePages.objects.filter(
+                user_id=user_id, book_id__in=to_update
+            ).update(reading_status=Case(
+                *[When(book_id=book_id, then=Value(value)) for book_id, value in to_update.items()],
+                default='reading_status'
+            ))
+        leaderboard.favorites_changed(
+            added=[(favorite.book_id, favorite.created_at) for favorite in created],
+            removed=[(book_id, created_at[book_id]) for book_id in to_delete],
+        )
+        if to_delete or to_update:
+            recommendations.interactions_changed([*to_delete, *to_update])
+        # bulk_create and update() send no signals
+        caching.invalidate(caching.FAVORITES)
+
+    totals = {'created': 0, 'updated': 0, 'removed': 0, 'error': 0}
+    for result in results:
+        totals[result['status']] += 1
+    return {'results': results, **totals}
+
+
+def _build_summary(user_id):
+    """Counts and up to SUMMARY_MAX_RECENT newest favorites per shelf, one query"""
+    by_shelf = [F('reading_status')]
+    favorites = list(
+        FavoritePages.objects.filter(user_id=user_id)
+        .annotate(
+            position=Window(
+                RowNumber(), partition_by=by_shelf,
+                order_by=[F('created_at').desc(), F('favorite_id').desc()]
+            ),
+            shelf_count=Window(Count('favorite_id'), partition_by=by_shelf),
+        )
+        .filter(position__lte=SUMMARY_MAX_RECENT)
+        .order_by('reading_status', 'position')
+    )
+    summary = {reading_status: {'count': 0, 'recent': []} for reading_status in READING_STATUSES}
+    for favorite in favorites:
+        shelf = summary.setdefault(favorite.reading_status, {'count': 0, 'recent': []})
+        shelf['count'] = favorite.shelf_count
+        shelf['recent'].append(favorite)
+    return summary
+
+
+def get_summary(user_id, recent):
+    """Return `{reading_status: {'count', 'recent'}}` with at most `recent` items each
+
+    The full summary is cached as serialized data, so a hit costs no queries.
+    """
+    def build():
+        summary = _build_summary(user_id)
+        # Serialize every shelf's items together so book details are one query
+        favorites = [favorite for shelf in summary.values() for favorite in shelf['recent']]
+        data = iter(FavoritePagesSerializer(favorites, many=True).data)
+        for shelf in summary.values():
+            shelf['recent'] = [dict(next(data)) for _ in shelf['recent']]
+        return summary
+
+    summary = caching.cached_value(
+        (caching.FAVORITES, caching.BOOKS), f'shelf_summary:{user_id}', build,
+        timeout=SUMMARY_CACHE_TIMEOUT
+    )
+    return {
+        reading_status: {'count': shelf['count'], 'recent': shelf['recent'][:recent]}
+        for reading_status, shelf in summary.items()
+    }
@@ -0,0 +1,68 @@
+# signals.py
+from django.db.models.signals import pre_save, post_save, post_delete
+from django.dispatch import Signal, receiver
+
+from .models import Book, BookSimilarity, Review, FavoritePages, User
+from . import caching, facets, search, suggest
+
+# Sent after bulk_create writes books, which skips post_save.
+# Arguments: books (the created Book instances)
+books_bulk_created = Signal()
+
+
+@receiver(pre_save, sender=Book)
+def book_saving(sender, instance, **kwargs):
+    # Remember the stored facet values so post_save can apply a delta
+    if instance._state.adding:
+        instance._facet_values_before = []
+    else:
+        instance._facet_values_before = facets.stored_facet_values(instance.pk)
+
+
+@receiver(post_save, sender=Book)
+def book_saved(sender, instance, created, **kwargs):
+    """Keep the search, suggestion and facet indexes in step with book writes"""
+    caching.invalidate(caching.BOOKS)
+    search.index_book(instance)
+    suggest.book_saved(instance, created)
+    facets.book_changed(
+        getattr(instance, '_facet_values_before', []),
+        facets.book_facet_values(instance)
+    )
+
+
+@receiver(post_delete, sender=Book)
+def book_deleted(sender, instance, **kwargs):
+    caching.invalidate(caching.BOOKS)
+    search.unindex_book(instance.pk)
+    suggest.book_deleted(instance.pk)
+    facets.book_changed(facets.book_facet_values(instance), [])
+    BookSimilarity.objects.filter(pk=instance.pk).delete()
+
+
+@receiver(books_bulk_created)
+def books_imported(sender, books, **kwargs):
+    caching.invalidate(caching.BOOKS)
+    search.index_books(books)
+    # Some backends (MySQL) do not return primary keys from bulk_create,
+    # so rebuild the suggestion index rather than patching it.
+    suggest.invalidate()
+    facets.books_added(books)
+
+
+# Cached responses that read these tables (see api/caching.py)
+CACHE_NAMESPACES = {
+    Review: caching.REVIEWS,
+    FavoritePages: caching.FAVORITES,
+    User: caching.USERS,
+}
+
+
+def model_written(sender, **kwargs):
+    caching.invalidate(CACHE_NAMESPACES[sender])
+
+
+# Connected per model, so writes to other tables never call it
+for model in CACHE_NAMESPACES:
+    post_save.connect(model_written, sender=model)
+    post_delete.connect(model_written, sender=model)
@@ -0,0 +1,336 @@
+# suggest.py
+"""
+In-memory prefix index for search-box autocomplete.
+
+Every title, and every distinct author, is a suggestion ranked by review
+count (an author by the total over their books). Suggestions are found
+from any word start, so "gatsby" finds "The Great Gatsby".
+
+The index is compact: each suggestion's normalized text is stored once,
+and the sorted array of word starts holds one packed integer per start
+(suggestion id and offset), searched with bisect. Prefixes matching more
+than SCAN_LIMIT word starts ("t", "the ") have their ranked top
+suggestions precomputed when the index is built, merged up from the
+longer prefixes' lists. Any other prefix matches
+at most about SCAN_LIMIT starts, which are ranked on the fly, so a lookup
+never does more than a binary search and a short scan.
+
+The index is built lazily on first use and rebuilt after SUGGEST_INDEX_TTL
+seconds, so writes made by other worker processes show up too. Rebuilds
+run off the lock; lookups keep using the old index until the new one is
+swapped in. Book writes are applied as deltas once their transaction
+commits. Ranks change only on rebuild, not when reviews are written.
+"""
+import bisect
+import heapq
+import threading
+import time
+from array import array
+
+from django.db import transaction
+
+from .models import Book
+
+SUGGEST_INDEX_TTL = 300
+
+# Longest suggestion list a lookup can ask for (the view's maximum limit)
+TOP_N = 25
+# Prefixes matching more word starts than this get a precomputed top list
+SCAN_LIMIT = 64
+
+TITLE = 'title'
+AUTHOR = 'author'
+
+# A word start is packed as (suggestion id << OFFSET_BITS) | offset
+OFFSET_BITS = 12
+OFFSET_MASK = (1 << OFFSET_BITS) - 1
+# Sorts after every character, so [prefix, prefix + END) holds its matches
+END = '\U0010ffff'
+
+
+def normalize(text):
+    """Casefold and collapse whitespace"""
+    return ' '.join((text or '').casefold().split())
+
+
+def _word_starts(key):
+    """Offsets of every word start in a normalized string"""
+    if not key:
+        return []
+    return [0] + [i + 1 for i, char in enumerate(key) if char == ' ']
+
+
+class PrefixIndex:
+    """Ranked prefix search over titles and authors"""
+
+    def __init__(self, rows=(), top_n=TOP_N, scan_limit=SCAN_LIMIT):
+        # Twice as many as a lookup needs, so removals rarely force a refill
+        self.kept = 2 * top_n
+        self.top_n = top_n
+        self.scan_limit = scan_limit
+        self.built_at = time.monotonic()
+        self._lock = threading.Lock()
+        # Suggestions, by id, in parallel arrays rather than an object each.
+        # A book's title is always a suggestion, even if it has no words.
+        self._labels = []
+        self._keys = []  # normalized label; None once removed
+        self._book_ids = array('q')  # -1 for authors
+        self._scores = array('q')
+        self._author_of = array('q')  # a title's author suggestion, or -1
+        self._book_counts = array('q')  # an author's number of books
+        self._titles = {}  # book_id -> title suggestion id
+        self._authors = {}  # label -> author suggestion id
+
+        starts = []
+        for book_id, title, author, review_count in rows:
+            for item_id in self._add_book(book_id, title, author, review_count or 0):
+                starts.extend(self._starts(item_id))
+        starts.sort(key=self._suffix)
+        self._starts_array = array('q', starts)
+        self._top = {}
+        if len(starts) > scan_limit:
+            keys = [self._suffix(packed) for packed in starts]
+            self._precompute_top(keys, 0, len(starts), '')
+
+    def _suffix(self, packed):
+        return self._keys[packed >> OFFSET_BITS][packed & OFFSET_MASK:]
+
+    def _starts(self, item_id):
+        return [(item_id << OFFSET_BITS) | offset for offset in _word_starts(self._keys[item_id])]
+
+    def _rank(self, item_id):
+        return (-self._scores[item_id], self._keys[item_id], self._book_ids[item_id] < 0, item_id)
+
+    def _best(self, item_ids, limit):
+        return heapq.nsmallest(limit, set(item_ids), key=self._rank)
+
+    def _new_item(self, label, book_id, score, author_id):
+        self._labels.append(label)
+        self._keys.append(normalize(label))
+        self._book_ids.append(book_id)
+        self._scores.append(score)
+        self._author_of.append(author_id)
+        self._book_counts.append(0)
+        return len(self._keys) - 1
+
+    def _add_book(self, book_id, title, author, score):
+        """Register a book's suggestions; return the ids needing new word starts"""
+        new = []
+        author_id = -1
+        if normalize(author):
+            author_id = self._authors.get(author, -1)
+            if author_id < 0:
+                author_id = self._new_item(author, -1, 0, -1)
+                self._authors[author] = author_id
+                new.append(author_id)
+            self._book_counts[author_id] += 1
+            self._scores[author_id] += score
+        title_id = self._new_item(title, book_id, score, author_id)
+        self._titles[book_id] = title_id
+        new.append(title_id)
+        return new
+
+    def _precompute_top(self, keys, lo, hi, prefix):
+        """Store and return the top list for `prefix`, whose matches are keys[lo:hi]
+
+        Each longer prefix's run is handled by recursion if it is large, or
+        scanned if not, and the parent's list is merged from theirs: a
+        suggestion in the parent's top list is also in the top list of
+        whichever run holds it.
+        """
+        depth = len(prefix)
+        starts = self._starts_array
+        candidates = []
+        i = lo
+        while i < hi:
+            if len(keys[i]) == depth:
+                # The key is exactly the prefix; these sort first
+                candidates.append(starts[i] >> OFFSET_BITS)
+                i += 1
+                continue
+            child = keys[i][:depth + 1]
+            j = bisect.bisect_left(keys, child + END, i, hi)
+            if j - i > self.scan_limit:
+                candidates.extend(self._precompute_top(keys, i, j, child))
+            else:
+                candidates.extend(starts[k] >> OFFSET_BITS for k in range(i, j))
+            i = j
+        best = self._best(candidates, self.kept)
+        if prefix:
+            self._top[prefix] = best
+        return best
+
+    def _range(self, prefix):
+        starts = self._starts_array
+        lo = bisect.bisect_left(starts, prefix, key=self._suffix)
+        hi = bisect.bisect_left(starts, prefix + END, lo, key=self._suffix)
+        return lo, hi
+
+    def _top_lists(self, item_id):
+        """(prefix, list) for every precomputed list the suggestion could be in"""
+        key = self._keys[item_id]
+        for offset in _word_starts(key):
+            suffix = key[offset:]
+            for length in range(1, len(suffix) + 1):
+                ids = self._top.get(suffix[:length])
+                if ids is None:
+                    # Longer prefixes match fewer starts, so none of them has one
+                    break
+                yield suffix[:length], ids
+
+    def _insert_starts(self, item_id):
+        for packed in self._starts(item_id):
+            bisect.insort(self._starts_array, packed, key=self._suffix)
+        for _, ids in self._top_lists(item_id):
+            if item_id not in ids:
+                ids.append(item_id)
+                ids[:] = self._best(ids, self.kept)
+
+    def _delete_item(self, item_id):
+        key = self._keys[item_id]
+        starts = self._starts_array
+        for packed in self._starts(item_id):
+            i = bisect.bisect_left(starts, key[packed & OFFSET_MASK:], key=self._suffix)
+            while starts[i] != packed:
+                i += 1
+            del starts[i]
+        for prefix, ids in list(self._top_lists(item_id)):
+            if item_id in ids:
+                ids.remove(item_id)
+                if len(ids) < self.top_n:
+                    # Used up the spare entries: refill from every match
+                    lo, hi = self._range(prefix)
+                    ids[:] = self._best((starts[k] >> OFFSET_BITS for k in range(lo, hi)), self.kept)
+        self._labels[item_id] = self._keys[item_id] = None
+
+    def add(self, book_id, title, author, review_count=0):
+        """Add a book, replacing what was indexed for it before"""
+        with self._lock:
+            self._remove(book_id)
+            for item_id in self._add_book(book_id, title, author, review_count or 0):
+                self._insert_starts(item_id)
+
+    def remove(self, book_id):
+        with self._lock:
+            self._remove(book_id)
+
+    def _remove(self, book_id):
+        title_id = self._titles.pop(book_id, None)
+        if title_id is None:
+            return
+        author_id = self._author_of[title_id]
+        self._delete_item(title_id)
+        if author_id >= 0:
+            self._book_counts[author_id] -= 1
+            if self._book_counts[author_id]:
+                self._scores[author_id] -= self._scores[title_id]
+            else:
+                del self._authors[self._labels[author_id]]
+                self._delete_item(author_id)
+
+    def lookup(self, prefix, limit):
+        """Return up to `limit` suggestions starting with `prefix`, best first"""
+        prefix = normalize(prefix)
+        if not prefix:
+            return []
+
+        with self._lock:
+            item_ids = self._top.get(prefix)
+            if item_ids is None:
+                lo, hi = self._range(prefix)
+                item_ids = self._best(
+                    (self._starts_array[k] >> OFFSET_BITS for k in range(lo, hi)), limit
+                )
+            results = []
+            for item_id in item_ids[:limit]:
+                book_id = self._book_ids[item_id]
+                if book_id < 0:
+                    results.append({'type': AUTHOR, 'text': self._labels[item_id]})
+                else:
+                    results.append({'type': TITLE, 'text': self._labels[item_id], 'book_id': book_id})
+            return results
+
+
+_index = None
+_lock = threading.Lock()  # guards _index, _pending and _generation
+_build_lock = threading.Lock()
+# Deltas committed while a rebuild runs, replayed onto the new index
+_pending = None
+# Bumped by invalidate() so a rebuild that started earlier is not trusted
+_generation = 0
+
+
+def _rebuild():
+    global _index, _pending
+    with _lock:
+        _pending = []
+        generation = _generation
+    rows = Book.objects.values_list('book_id', 'title', 'author', 'review_count').iterator()
+    index = PrefixIndex(rows)
+    with _lock:
+        for change in _pending:
+            change(index)
+        _pending = None
+        if generation != _generation:
+            # Invalidated while building: serve it, but rebuild next time
+            index.built_at -= SUGGEST_INDEX_TTL
+        _index = index
+
+
+def _is_fresh(index):
+    return index is not None and time.monotonic() - index.built_at < SUGGEST_INDEX_TTL
+
+
+def get_index():
+    """Return the process-wide index, (re)building it if missing or stale
+
+    While a stale index is rebuilt, other threads keep using it.
+    """
+    index = _index
+    if _is_fresh(index):
+        return index
+    if index is not None:
+        if _build_lock.acquire(blocking=False):
+            try:
+                _rebuild()
+            finally:
+                _build_lock.release()
+        return _index or index
+    with _build_lock:
+        if _index is None:
+            _rebuild()
+        return _index
+
+
+def suggest(prefix, limit):
+    return get_index().lookup(prefix, limit)
+
+
+def _apply(change):
+    with _lock:
+        if _index is not None:
+            change(_index)
+        if _pending is not None:
+            _pending.append(change)
+
+
+def book_saved(book, created):
+    """Apply a create/update delta once the transaction commits"""
+    book_id, title, author, review_count = book.pk, book.title, book.author, book.review_count
+    transaction.on_commit(
+        lambda: _apply(lambda index: index.add(book_id, title, author, review_count))
+    )
+
+
+def book_deleted(book_id):
+    transaction.on_commit(lambda: _apply(lambda index: index.remove(book_id)))
+
+
+def invalidate():
+    """Drop the index once the transaction commits, so the next lookup rebuilds it"""
+    def drop():
+        global _index, _generation
+        with _lock:
+            _index = None
+            _generation += 1
+    transaction.on_commit(drop)
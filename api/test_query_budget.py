@@ -0,0 +1,297 @@
+"""
+Query and response-size budgets for every route in api/urls.py.
+
+Each endpoint is called against the same fixtures grown through several
+sizes. A test fails when an endpoint runs more queries than its budget,
+when its query count changes with the amount of data (an N+1 creeping
+in), or when its response outgrows its byte budget. A per-endpoint table
+is printed either way.
+
+Queries are counted from the Server-Timing header, so the queries the
+async views run on their worker threads are included. Each call is made
+with an empty response cache, after one warm-up call that fills
+process-wide indexes (suggestions). Writes run in a transaction that is
+rolled back, so their counts include its BEGIN and the savepoints their
+own atomic blocks become, but not the work they defer with
+transaction.on_commit (facet counts), which is never run.
+
+Budgets are the measured counts, so any new query fails: raise a budget
+only together with the change that needs it.
+
+    python manage.py test api.test_query_budget
+"""
+import re
+import sys
+from collections import namedtuple
+
+from django.core.cache import cache
+from django.db import transaction
+from django.test import TransactionTestCase
+from rest_framework.test import APIClient
+
+from . import leaderboard, ratings, recommendations
+from .models import Book, FavoritePages, Review, User
+from .signals import books_bulk_created
+from .urls import urlpatterns
+
+# Readers; each reviews and shelves `size` books, and there are 2 * size books
+FIXTURE_SIZES = (3, 10, 30)
+
+READING_STATUSES = ('WANT_TO_READ', 'CURRENTLY_READING', 'ALREADY_READ')
+GENRES = ('FICTION', 'MYSTERY', 'SCIENCE', 'HISTORY')
+
+QUERY_COUNT = re.compile(r'desc="(\d+) queries"')
+
+Endpoint = namedtuple(
+    'Endpoint', 'method path data max_queries max_bytes status',
+    defaults=(200,)
+)
+
+IMPORT_CSV = 'title,author,description,genre,published_date,available_copies\n' + ''.join(
+    f'Imported {i},Importer,Bulk,FICTION,1955-01-0{i},1\n' for i in range(1, 6)
+)
+
+# Keyed by URL name. `path` and `data` take the Fixtures being measured.
+ENDPOINTS = {
+    'api-root': Endpoint('get', lambda f: '/api/', None, 0, 600),
+    'get-all-users': Endpoint('get', lambda f: '/api/users/', None, 1, 1600),
+    'login': Endpoint(
+        'post', lambda f: '/api/users/login/',
+        lambda f: {'email': f.reader.email}, 1, 200
+    ),
+    'logout': Endpoint(
+        'post', lambda f: '/api/users/logout/',
+        lambda f: {'user_id': f.reader.pk}, 1, 100
+    ),
+    'delete-account': Endpoint(
+        'delete', lambda f: '/api/users/delete/',
+        lambda f: {'user_id': f.reader.pk, 'password': 'secret'}, 11, 100
+    ),
+    'update-user': Endpoint(
+        'put', lambda f: '/api/users/update/',
+        lambda f: {'user_id': f.reader.pk, 'current_password': 'secret', 'new_username': 'renamed'},
+        3, 100
+    ),
+    'get-user-recommendations': Endpoint(
+        'get', lambda f: f'/api/users/{f.reader.pk}/recommendations/', None, 4, 5400
+    ),
+    'get-all-books': Endpoint('get', lambda f: '/api/books/', None, 2, 9100),
+    'get-book-detail': Endpoint('get', lambda f: f'/api/books/{f.book.pk}/', None, 3, 5900),
+    'get-similar-books': Endpoint(
+        'get', lambda f: f'/api/books/{f.book.pk}/similar/', None, 2, 4800
+    ),
+    'get-books-batch': Endpoint(
+        'get', lambda f: f'/api/books/batch/?ids={f.batch_ids}&reviews=3', None, 2, 3900
+    ),
+    'get-trending-books': Endpoint('get', lambda f: '/api/books/trending/', None, 1, 4700),
+    'get-popular-books': Endpoint('get', lambda f: '/api/books/popular/', None, 1, 4700),
+    'search-books': Endpoint('get', lambda f: '/api/books/search/?q=book', None, 2, 9100),
+    'suggest-books': Endpoint('get', lambda f: '/api/books/suggest/?prefix=boo', None, 0, 600),
+    'browse-books': Endpoint(
+        'get', lambda f: '/api/books/browse/?genre=FICTION', None, 2, 7300
+    ),
+    'create-book': Endpoint(
+        'post', lambda f: '/api/books/create/',
+        lambda f: {
+            'user_id': f.librarian.pk, 'title': 'New Book', 'author': 'New Author',
+            'description': 'New', 'genre': 'FICTION', 'published_date': '1955-01-01',
+            'available_copies': 1,
+        },
+        4, 500, 201
+    ),
+    'import-books': Endpoint(
+        'post', lambda f: f'/api/books/import/?user_id={f.librarian.pk}', IMPORT_CSV, 6, 100
+    ),
+    'get-book-reviews': Endpoint(
+        'get', lambda f: f'/api/books/{f.book.pk}/reviews/', None, 2, 4200
+    ),
+    'get-user-reviews': Endpoint(
+        'get', lambda f: f'/api/users/{f.reader.pk}/reviews/', None, 1, 3100
+    ),
+    'create-review': Endpoint(
+        'post', lambda f: '/api/reviews/',
+        lambda f: {
+            'user_id': f.reader.pk, 'book_id': f.unshelved.pk,
+            'rating': 4, 'review_text': 'Good',
+        },
+        9, 200, 201
+    ),
+    'update-review': Endpoint(
+        'put', lambda f: f'/api/reviews/{f.review.pk}/',
+        lambda f: {'user_id': f.reader.pk, 'rating': 2}, 10, 200
+    ),
+    'delete-review': Endpoint(
+        'delete', lambda f: f'/api/reviews/{f.review.pk}/delete/',
+        lambda f: {'user_id': f.reader.pk}, 8, 100
+    ),
+    'get-user-favorites': Endpoint(
+        'get', lambda f: f'/api/users/{f.reader.pk}/favorites/', None, 2, 3700
+    ),
+    'add-favorite': Endpoint(
+        'post', lambda f: '/api/favorites/add/',
+        lambda f: {'user_id': f.reader.pk, 'book_id': f.unshelved.pk}, 8, 300, 201
+    ),
+    'batch-favorites': Endpoint(
+        'post', lambda f: '/api/favorites/batch/',
+        lambda f: {'user_id': f.reader.pk, 'operations': [
+            {'op': 'add', 'book_id': f.unshelved.pk},
+            {'op': 'update', 'book_id': f.book.pk, 'reading_status': 'ALREADY_READ'},
+            {'op': 'remove', 'book_id': f.other_book.pk},
+        ]},
+        15, 300
+    ),
+    'update-reading-status': Endpoint(
+        'put', lambda f: '/api/favorites/status/update/',
+        lambda f: {'user_id': f.reader.pk, 'book_id': f.book.pk, 'reading_status': 'ALREADY_READ'},
+        6, 300
+    ),
+    'remove-favorite': Endpoint(
+        'delete', lambda f: f'/api/favorites/{f.reader.pk}/{f.book.pk}/remove/', None, 6, 100
+    ),
+    'get-reading-status-books': Endpoint(
+        'get', lambda f: f'/api/users/{f.reader.pk}/reading/WANT_TO_READ/', None, 2, 1300
+    ),
+    'get-shelf-summary': Endpoint(
+        'get', lambda f: f'/api/users/{f.reader.pk}/shelves/', None, 2, 3900
+    ),
+    'async-get-all-books': Endpoint('get', lambda f: '/api/async/books/', None, 2, 9100),
+    'async-get-book-detail': Endpoint(
+        'get', lambda f: f'/api/async/books/{f.book.pk}/', None, 3, 5900
+    ),
+    'async-get-book-reviews': Endpoint(
+        'get', lambda f: f'/api/async/books/{f.book.pk}/reviews/', None, 2, 4200
+    ),
+    'async-get-user-favorites': Endpoint(
+        'get', lambda f: f'/api/async/users/{f.reader.pk}/favorites/', None, 2, 3700
+    ),
+    'cache-stats': Endpoint('get', lambda f: '/api/system/cache/', None, 0, 1100),
+    'db-pool-stats': Endpoint('get', lambda f: '/api/system/db-pool/', None, 0, 100),
+}
+
+
+class Fixtures:
+    """Readers, books, reviews and shelves, grown in place from one size to the next
+
+    Every reader reviews and shelves books 0..size-1, except that the first
+    reader skips the odd ones, which become their recommendations. The
+    first reader and the first book gain rows at every size; the last book
+    is never shelved.
+    """
+
+    def __init__(self):
+        self.size = 0
+        self.librarian = User.objects.create(
+            username='librarian', email='librarian@example.com',
+            password='secret', is_librarian=True
+        )
+
+    def grow(self, size):
+        old = self.size
+        User.objects.bulk_create(
+            User(username=f'reader{i}', email=f'reader{i}@example.com', password='secret')
+            for i in range(old, size)
+        )
+        books = Book.objects.bulk_create(
+            Book(
+                title=f'Book {i}', author=f'Author {i % 7}', description=f'Description of book {i}',
+                genre=GENRES[i % len(GENRES)], published_date=f'{1950 + i}-01-01',
+                available_copies=i % 3
+            )
+            for i in range(2 * old, 2 * size)
+        )
+        books_bulk_created.send(sender=Book, books=books)
+
+        readers = list(User.objects.filter(is_librarian=False).order_by('pk'))
+        shelved = list(Book.objects.order_by('pk')[:size])
+        pairs = [
+            (r, b) for r in range(size) for b in range(size)
+            if (r >= old or b >= old) and not (r == 0 and b % 2)
+        ]
+        Review.objects.bulk_create(
+            Review(user=readers[r], book=shelved[b], rating=1 + (r + b) % 5, review_text=f'Review {r}-{b}')
+            for r, b in pairs
+        )
+        FavoritePages.objects.bulk_create(
+            FavoritePages(
+                user_id=readers[r].pk, book_id=shelved[b].pk,
+                reading_status=READING_STATUSES[b % len(READING_STATUSES)]
+            )
+            for r, b in pairs
+        )
+        ratings.rebuild_ratings()
+        leaderboard.rebuild_leaderboard()
+        recommendations.rebuild_similarities()
+
+        self.size = size
+        self.reader = readers[0]
+        self.book, self.other_book = shelved[0], shelved[2]
+        self.unshelved = Book.objects.order_by('-pk').first()
+        self.review = Review.objects.get(user=self.reader, book=self.book)
+        self.batch_ids = ','.join(str(book.pk) for book in shelved[:3])
+
+
+class QueryBudgetTests(TransactionTestCase):
+    """Every endpoint keeps a fixed number of queries and a bounded response size"""
+
+    def setUp(self):
+        self.client = APIClient()
+
+    def request(self, endpoint, fixtures):
+        path = endpoint.path(fixtures)
+        data = endpoint.data(fixtures) if callable(endpoint.data) else endpoint.data
+        if isinstance(data, str):
+            kwargs = {'data': data, 'content_type': 'text/csv'}
+        else:
+            kwargs = {'data': data, 'format': 'json'}
+        if endpoint.method == 'get':
+            return self.client.get(path)
+        # Roll writes back so every size measures the same fixtures
+        with transaction.atomic():
+            response = getattr(self.client, endpoint.method)(path, **kwargs)
+            transaction.set_rollback(True)
+        return response
+
+    def measure(self, endpoint, fixtures):
+        self.request(endpoint, fixtures)
+        cache.clear()
+        response = self.request(endpoint, fixtures)
+        match = QUERY_COUNT.search(response.get('Server-Timing', ''))
+        self.assertIsNotNone(match, 'Server-Timing header missing; is PERF_INSTRUMENTATION on?')
+        return response.status_code, int(match.group(1)), len(response.content)
+
+    def test_every_route_has_a_budget(self):
+        names = {pattern.name for pattern in urlpatterns}
+        self.assertEqual(names - ENDPOINTS.keys(), set(), 'Add these routes to ENDPOINTS')
+        self.assertEqual(ENDPOINTS.keys() - names, set(), 'Remove these from ENDPOINTS')
+
+    def test_query_and_size_budgets(self):
+        fixtures = Fixtures()
+        results = {name: [] for name in ENDPOINTS}
+        for size in FIXTURE_SIZES:
+            fixtures.grow(size)
+            for name, endpoint in ENDPOINTS.items():
+                results[name].append(self.measure(endpoint, fixtures))
+        self.print_table(results)
+
+        for name, endpoint in ENDPOINTS.items():
+            statuses, queries, sizes = zip(*results[name])
+            with self.subTest(endpoint=name):
+                self.assertEqual(set(statuses), {endpoint.status}, 'Unexpected status')
+                self.assertEqual(
+                    len(set(queries)), 1,
+                    f'Query count grows with data: {queries} at sizes {FIXTURE_SIZES}'
+                )
+                self.assertLessEqual(max(queries), endpoint.max_queries, 'Over query budget')
+                self.assertLessEqual(max(sizes), endpoint.max_bytes, 'Over response size budget')
+
+    def print_table(self, results):
+        counts = ''.join(f'{f"q@{size}":>6}' for size in FIXTURE_SIZES)
+        lines = ['', f"{'endpoint':<27}{'method':<7}{counts}{'budget':>8}{'bytes':>8}{'budget':>8}"]
+        for name, endpoint in ENDPOINTS.items():
+            _, queries, sizes = zip(*results[name])
+            lines.append(
+                f'{name:<27}{endpoint.method.upper():<7}'
+                + ''.join(f'{count:>6}' for count in queries)
+                + f'{endpoint.max_queries:>8}{max(sizes):>8}{endpoint.max_bytes:>8}'
+            )
+        sys.stderr.write('\n'.join(lines) + '\n')
@@ -1,3 +1,1247 @@
-from django.test import TestCase
+import io
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from datetime import datetime, timezone
 
-# Create your tests here.
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection, transaction
+from django.db.models import Count, Sum
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from . import bulk_import, caching, dataset, db_pool, facets, leaderboard, ratings, recommendations, suggest
+from .db_pool import ConnectionPool, PoolTimeout
+from .models import Book, BookLeaderboard, BookSimilarity, User, FavoritePages, Review
+from . import replicas
+from .replicas import PIN_COOKIE, PIN_HEADER
+from .row_serializers import get_row_serializer
+from .serializers import BookSerializer, DynamicFieldsModelSerializer, ReviewSerializer
+from .views.views_book import BOOK_BATCH_MAX_IDS
+
+
+def make_books(count):
+    """Bulk-create `count` books titled 'Book 0', 'Book 1', ..."""
+    return Book.objects.bulk_create(
+        Book(
+            title=f'Book {i}', author='Author', description='',
+            genre='FICTION', published_date='2000-01-01', available_copies=1
+        )
+        for i in range(count)
+    )
+
+
+def make_users(count):
+    """Bulk-create `count` users named reader0, reader1, ... with password 'secret'"""
+    return User.objects.bulk_create(
+        User(username=f'reader{i}', email=f'reader{i}@example.com', password='secret')
+        for i in range(count)
+    )
+
+
+class APIClientMixin:
+    """Start each test with an empty response cache and a fresh APIClient"""
+
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        self.client = APIClient()
+
+
+class FavoritesQueryCountTests(APIClientMixin, TestCase):
+    """Favorites listings must not run one book query per favorite"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(
+            username='reader', email='reader@example.com', password='secret'
+        )
+
+    def shelve(self, count):
+        FavoritePages.objects.filter(user_id=self.user.pk).delete()
+        for i in range(count):
+            book = Book.objects.create(
+                title=f'Book {i}', author=f'Author {i}', description='',
+                genre='FICTION', published_date='2000-01-01', available_copies=1
+            )
+            FavoritePages.objects.create(
+                user_id=self.user.pk, book_id=book.pk, reading_status='ALREADY_READ'
+            )
+
+    def count_queries(self, url):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(queries), response.json()
+
+    def assert_constant_queries(self, url):
+        self.shelve(2)
+        small, data = self.count_queries(url)
+        self.assertEqual(len(data['results']), 2)
+
+        self.shelve(40)
+        large, data = self.count_queries(url + '?page_size=40')
+        self.assertEqual(len(data['results']), 40)
+        self.assertEqual(small, large)
+        self.assertLessEqual(large, 2)
+        self.assertTrue(all(item['book_details'] for item in data['results']))
+
+    def test_user_favorites(self):
+        self.assert_constant_queries(f'/api/users/{self.user.pk}/favorites/')
+
+    def test_reading_status_books(self):
+        self.assert_constant_queries(f'/api/users/{self.user.pk}/reading/ALREADY_READ/')
+
+    def test_missing_book_has_no_details(self):
+        FavoritePages.objects.create(user_id=self.user.pk, book_id=999999)
+        _, data = self.count_queries(f'/api/users/{self.user.pk}/favorites/')
+        self.assertIsNone(data['results'][0]['book_details'])
+
+
+class FavoriteConstraintTests(TestCase):
+    """The (user_id, book_id) constraint turns a second add into a 400"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(
+            username='reader', email='reader@example.com', password='secret'
+        )
+        cls.book = Book.objects.create(
+            title='Book', author='Author', description='',
+            genre='FICTION', published_date='2000-01-01', available_copies=1
+        )
+
+    def test_duplicate_add_is_rejected_and_counted_once(self):
+        client = APIClient()
+        data = {'user_id': self.user.pk, 'book_id': self.book.pk}
+        self.assertEqual(client.post('/api/favorites/add/', data, format='json').status_code, 201)
+        response = client.post(
+            '/api/favorites/add/', {**data, 'reading_status': 'ALREADY_READ'}, format='json'
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json(), {'error': 'Book is already in favorites'})
+        favorite, = FavoritePages.objects.filter(user_id=self.user.pk)
+        self.assertEqual(favorite.reading_status, 'WANT_TO_READ')
+        self.assertEqual(BookLeaderboard.objects.get(book_id=self.book.pk).popular_score, 1)
+
+
+class ResponseCacheTests(APIClientMixin, TestCase):
+    """Cached GET responses must never outlive a write in the same process"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(
+            username='reader', email='reader@example.com', password='secret'
+        )
+        cls.book = Book.objects.create(
+            title='Dune', author='Frank Herbert', description='',
+            genre='FICTION', published_date='1965-08-01', available_copies=1
+        )
+
+    def test_repeat_request_is_served_from_cache(self):
+        first = self.client.get('/api/books/')
+        with CaptureQueriesContext(connection) as queries:
+            second = self.client.get('/api/books/')
+        self.assertEqual(first['X-Cache'], 'MISS')
+        self.assertEqual(second['X-Cache'], 'HIT')
+        self.assertEqual(first.json(), second.json())
+        # The conditional GET validators are cached too
+        self.assertEqual(len(queries), 0)
+
+    @override_settings(ALLOWED_HOSTS=['a.example.com', 'b.example.com'])
+    def test_hosts_are_cached_apart(self):
+        Book.objects.create(
+            title='Emma', author='Jane Austen', description='',
+            genre='FICTION', published_date='1815-12-23', available_copies=1
+        )
+        for host in ('a.example.com', 'b.example.com'):
+            with self.subTest(host=host):
+                response = self.client.get('/api/books/?page_size=1', HTTP_HOST=host)
+                self.assertEqual(response['X-Cache'], 'MISS')
+                self.assertTrue(response.json()['next'].startswith(f'http://{host}/'))
+
+    def test_review_write_invalidates_book_list(self):
+        self.client.get('/api/books/')
+        response = self.client.post('/api/reviews/', {
+            'user_id': self.user.pk, 'book_id': self.book.pk,
+            'rating': 4, 'review_text': 'Great'
+        }, format='json')
+        self.assertEqual(response.status_code, 201)
+        response = self.client.get('/api/books/')
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertEqual(response.json()['results'][0]['avg_rating'], 4.0)
+
+    def test_batch_favorites_invalidates_listing(self):
+        url = f'/api/users/{self.user.pk}/favorites/'
+        self.assertEqual(self.client.get(url).json()['results'], [])
+        self.client.post('/api/favorites/batch/', {
+            'user_id': self.user.pk,
+            'operations': [{'op': 'add', 'book_id': self.book.pk}]
+        }, format='json')
+        self.assertEqual(len(self.client.get(url).json()['results']), 1)
+
+
+@override_settings(DATABASE_REPLICAS=['replica'], REPLICA_STICKY_SECONDS=0.2)
+class ReplicaLagBumpTests(SimpleTestCase):
+    """Invalidations wait out replica lag with one pending timer per namespace"""
+
+    def test_writes_share_one_pending_bump(self):
+        versions = lambda: caching._versions([caching.REVIEWS])[0]
+        lag_timers = lambda: [
+            thread for thread in threading.enumerate()
+            if isinstance(thread, threading.Timer) and thread.args == [caching.REVIEWS]
+        ]
+        for _ in range(50):
+            caching.invalidate(caching.REVIEWS)
+        self.assertEqual(len(lag_timers()), 1)
+        bumped = versions()
+        for timer in lag_timers():
+            timer.join(1)
+        # It bumps when the lag has passed, then re-arms for any later write
+        self.assertNotEqual(versions(), bumped)
+        time.sleep(0.3)
+        self.assertEqual(lag_timers(), [])
+        self.assertNotIn(caching.REVIEWS, caching._lag_deadlines)
+
+
+class ConnectionPoolTests(SimpleTestCase):
+    """Checkout, reuse, limits and recycling of pooled connections"""
+
+    def make_pool(self, **options):
+        opened = []
+
+        def connect():
+            conn = sqlite3.connect(':memory:', check_same_thread=False)
+            opened.append(conn)
+            return conn
+
+        def check(conn):
+            conn.execute('SELECT 1')
+
+        options.setdefault('health_check_after', 0)
+        return ConnectionPool(connect, check=check, **options), opened
+
+    def test_released_connection_is_reused(self):
+        pool, opened = self.make_pool(min_size=0, max_size=2)
+        first = pool.acquire()
+        pool.release(first)
+        self.assertIs(pool.acquire(), first)
+        self.assertEqual(len(opened), 1)
+
+    def test_fill_opens_min_size(self):
+        pool, opened = self.make_pool(min_size=2, max_size=4)
+        pool.fill()
+        self.assertEqual(len(opened), 2)
+        self.assertEqual(pool.stats()['idle'], 2)
+
+    def test_checkout_waits_then_times_out(self):
+        pool, _ = self.make_pool(min_size=0, max_size=1, timeout=0.05)
+        pool.acquire()
+        with self.assertRaises(PoolTimeout):
+            pool.acquire()
+        stats = pool.stats()
+        self.assertEqual(stats['timeouts'], 1)
+        self.assertEqual(stats['saturation'], 1.0)
+
+    def test_waiting_checkout_gets_released_connection(self):
+        pool, opened = self.make_pool(min_size=0, max_size=1, timeout=5)
+        held = pool.acquire()
+        threading.Timer(0.05, pool.release, [held]).start()
+        self.assertIs(pool.acquire(), held)
+        self.assertEqual(len(opened), 1)
+        self.assertEqual(pool.stats()['waits'], 1)
+
+    def test_dead_connection_is_replaced_on_checkout(self):
+        pool, opened = self.make_pool(min_size=0, max_size=1)
+        conn = pool.acquire()
+        pool.release(conn)
+        conn.close()
+        with self.assertLogs('api.db_pool', 'WARNING'):
+            replacement = pool.acquire()
+        self.assertIsNot(replacement, conn)
+        self.assertEqual(len(opened), 2)
+        self.assertEqual(pool.stats()['failed_health_checks'], 1)
+
+    def test_expired_connection_is_closed(self):
+        pool, opened = self.make_pool(min_size=0, max_size=1, max_lifetime=0)
+        conn = pool.acquire()
+        pool.release(conn)
+        stats = pool.stats()
+        self.assertEqual((stats['size'], stats['expired']), (0, 1))
+        self.assertIsNot(pool.acquire(), conn)
+
+    def test_discarded_connection_frees_its_slot(self):
+        pool, _ = self.make_pool(min_size=0, max_size=1, timeout=0.05)
+        pool.release(pool.acquire(), discard=True)
+        pool.acquire()
+        self.assertEqual(pool.stats()['size'], 1)
+
+    def test_forked_child_never_closes_inherited_connections(self):
+        pool, opened = self.make_pool(min_size=1, max_size=2, max_lifetime=0)
+        self.addCleanup(db_pool.close_all)
+        db_pool.close_all()
+        self.assertIs(db_pool.get_pool('forktest', 'db', lambda: pool), pool)
+        conn = pool.acquire()
+        pid = os.fork()
+        if pid == 0:
+            ok = False
+            try:
+                # Releasing an expired connection would normally close it
+                pool.release(conn)
+                conn.execute('SELECT 1')
+                ok = (
+                    not db_pool._pools and pool in db_pool._inherited
+                    and conn in db_pool._inherited
+                )
+            finally:
+                os._exit(0 if ok else 1)
+        _, exit_status = os.waitpid(pid, 0)
+        self.assertEqual(os.waitstatus_to_exitcode(exit_status), 0)
+        self.assertEqual(conn.execute('SELECT 1').fetchone(), (1,))
+
+
+@override_settings(DATABASE_REPLICAS=['replica'])
+class ReplicaRoutingTests(TransactionTestCase):
+    """GETs read from the replica until the client writes"""
+
+    # Not TestCase: reads inside a transaction always use the primary
+    databases = {'default', 'replica'}
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create(
+            username='reader', email='reader@example.com', password='secret'
+        )
+        self.book = Book.objects.create(
+            title='Primary title', author='Author', description='',
+            genre='FICTION', published_date='2000-01-01', available_copies=1
+        )
+        # The replica has not caught up with the title yet
+        Book.objects.using('replica').bulk_create([Book(
+            book_id=self.book.pk, title='Replica title', author='Author', description='',
+            genre='FICTION', published_date='2000-01-01', available_copies=1
+        )])
+        self.client = APIClient()
+
+    def titles(self):
+        response = self.client.get('/api/books/')
+        self.assertEqual(response.status_code, 200)
+        return [book['title'] for book in response.json()['results']]
+
+    def test_get_reads_from_replica(self):
+        self.assertEqual(self.titles(), ['Replica title'])
+
+    def test_write_pins_client_to_primary(self):
+        self.titles()
+        response = self.client.post('/api/favorites/add/', {
+            'user_id': self.user.pk, 'book_id': self.book.pk
+        }, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertIn(PIN_COOKIE, response.cookies)
+        self.assertEqual(self.titles(), ['Primary title'])
+        # Other clients keep reading from the replica
+        self.assertEqual(APIClient().get('/api/books/').json()['results'][0]['title'], 'Replica title')
+
+    def test_pin_cookie_is_secure_only_over_https(self):
+        data = {'user_id': self.user.pk, 'book_id': self.book.pk}
+        cookie = self.client.post('/api/favorites/add/', data, format='json').cookies[PIN_COOKIE]
+        self.assertFalse(cookie['secure'])
+        self.assertEqual(cookie['samesite'], 'Lax')
+        FavoritePages.objects.all().delete()
+        cookie = self.client.post(
+            '/api/favorites/add/', data, format='json', secure=True
+        ).cookies[PIN_COOKIE]
+        self.assertTrue(cookie['secure'])
+        self.assertEqual(cookie['samesite'], 'None')
+
+    def test_header_pins_clients_without_cookies(self):
+        response = APIClient().post('/api/favorites/add/', {
+            'user_id': self.user.pk, 'book_id': self.book.pk
+        }, format='json')
+        until = response[PIN_HEADER]
+        response = APIClient().get('/api/books/', HTTP_X_PRIMARY_UNTIL=until)
+        self.assertEqual(response.json()['results'][0]['title'], 'Primary title')
+        response = APIClient().get('/api/books/', HTTP_X_PRIMARY_UNTIL=str(int(until) - 3600))
+        self.assertEqual(response.json()['results'][0]['title'], 'Replica title')
+
+    def test_reads_in_transaction_use_primary(self):
+        token = replicas._replica_reads.set(True)
+        try:
+            self.assertEqual(Book.objects.get(pk=self.book.pk).title, 'Replica title')
+            with transaction.atomic():
+                self.assertEqual(Book.objects.get(pk=self.book.pk).title, 'Primary title')
+        finally:
+            replicas._replica_reads.reset(token)
+
+
+class AsyncBookDetailTests(TransactionTestCase):
+    """The async detail view answers 304 before loading any reviews"""
+
+    def queries(self, response):
+        return int(re.search(r'desc="(\d+) queries"', response['Server-Timing']).group(1))
+
+    def test_not_modified_skips_the_reviews_query(self):
+        book = Book.objects.create(
+            title='Async', author='Author', description='',
+            genre='FICTION', published_date='2000-01-01', available_copies=1
+        )
+        user = User.objects.create(username='reader', email='reader@example.com', password='secret')
+        Review.objects.create(user=user, book=book, rating=4, review_text='Good')
+        client = APIClient()
+        url = f'/api/async/books/{book.pk}/'
+        cache.clear()
+        first = client.get(url)
+        self.assertEqual(first.json()['reviews']['results'][0]['review_text'], 'Good')
+        self.assertEqual(self.queries(first), 3)
+        cache.clear()
+        response = client.get(url, HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(response.status_code, 304)
+        # The book and the validators only
+        self.assertEqual(self.queries(response), 2)
+
+
+class InstrumentationTests(APIClientMixin, TestCase):
+    """Server-Timing headers and performance log lines"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.book = Book.objects.create(
+            title='Timed', author='Author', description='',
+            genre='FICTION', published_date='2000-01-01', available_copies=1
+        )
+
+    def test_server_timing_counts_queries(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(f'/api/books/{self.book.pk}/')
+        timing = response['Server-Timing']
+        for metric in ('db;', 'db-slowest;', 'serialize;', 'app;', 'total;'):
+            self.assertIn(metric, timing)
+        self.assertIn(f'desc="{len(queries)} queries"', timing)
+
+    def test_request_is_logged_as_json(self):
+        with self.assertLogs('api.performance', 'INFO') as logs:
+            self.client.get('/api/books/')
+        record = json.loads(logs.records[0].getMessage())
+        self.assertEqual((record['path'], record['status']), ('/api/books/', 200))
+        self.assertGreater(record['queries'], 0)
+        self.assertIn('SELECT', record['slowest_query'])
+
+    @override_settings(PERF_SLOW_REQUEST_MS=0, PERF_SLOW_SQL_SAMPLE_RATE=1.0)
+    def test_slow_request_logs_its_sql(self):
+        with self.assertLogs('api.performance', 'WARNING') as logs:
+            self.client.get('/api/books/')
+        slow = json.loads(logs.records[-1].getMessage())['slow_request']
+        self.assertEqual(len(slow['statements']), slow['queries'])
+        self.assertTrue(all('sql' in statement for statement in slow['statements']))
+
+
+class SyntheticDatasetTests(TestCase):
+    """populate_db.py's generator: reproducible, skewed and consistent"""
+
+    END = datetime(2026, 1, 1, tzinfo=timezone.utc)
+
+    def plan(self, seed=dataset.DEFAULT_SEED):
+        return dataset.Plan(users=400, books=200, seed=seed, end=self.END)
+
+    def test_same_seed_gives_same_rows(self):
+        first, second, other = self.plan(), self.plan(), self.plan(seed=7)
+        self.assertEqual(dataset.review_rows(first, 0, 400), dataset.review_rows(second, 0, 400))
+        self.assertEqual(dataset.book_rows(first, 0, 200), dataset.book_rows(second, 0, 200))
+        self.assertNotEqual(dataset.review_rows(first, 0, 400), dataset.review_rows(other, 0, 400))
+
+    def test_generated_data_is_consistent_and_skewed(self):
+        written = dataset.generate(self.plan(), chunk_size=150)
+        self.assertEqual(written[dataset.USERS], User.objects.count())
+        self.assertEqual(written[dataset.REVIEWS], Review.objects.count())
+        self.assertEqual(written[dataset.FAVORITES], FavoritePages.objects.count())
+        # Derived aggregates were rebuilt from the inserted reviews
+        self.assertEqual(Book.objects.aggregate(total=Sum('review_count'))['total'], Review.objects.count())
+
+        per_book = sorted(
+            Review.objects.values('book').annotate(n=Count('pk')).values_list('n', flat=True),
+            reverse=True
+        )
+        self.assertGreater(per_book[0], 10 * per_book[len(per_book) // 2])
+        response = APIClient().get('/api/books/search/?q=the')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.json())
+
+
+class CursorPaginationTests(APIClientMixin, TestCase):
+    """Cursors walk every row once; cursors the API did not issue are a 400"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(
+            username='reader', email='reader@example.com', password='secret'
+        )
+        cls.books = make_books(7)
+
+    def test_cursors_walk_every_book_once(self):
+        seen = []
+        url = '/api/books/?page_size=3'
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            seen += [book['book_id'] for book in response.json()['results']]
+            url = response.json()['next']
+        self.assertEqual(seen, sorted((book.pk for book in self.books), reverse=True))
+
+    def test_tampered_cursor_is_rejected(self):
+        # 'x' is not base64; 'cD1hYmM=' decodes to p=abc, not an integer key
+        paths = [
+            '/api/books/', '/api/books/browse/', '/api/users/',
+            f'/api/books/{self.books[0].pk}/', f'/api/books/{self.books[0].pk}/reviews/',
+            f'/api/users/{self.user.pk}/reviews/', f'/api/users/{self.user.pk}/favorites/',
+            f'/api/users/{self.user.pk}/reading/WANT_TO_READ/',
+            '/api/async/books/', f'/api/async/books/{self.books[0].pk}/',
+            f'/api/async/books/{self.books[0].pk}/reviews/',
+            f'/api/async/users/{self.user.pk}/favorites/',
+        ]
+        for path in paths:
+            for cursor in ('x', 'cD1hYmM='):
+                with self.subTest(path=path, cursor=cursor):
+                    response = self.client.get(f'{path}?cursor={cursor}')
+                    self.assertEqual(response.status_code, 400)
+                    self.assertEqual(response.json(), {'error': 'Invalid cursor'})
+
+
+class BookBatchTests(APIClientMixin, TestCase):
+    """/api/books/batch/: request order, limits and each book's newest reviews"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.books = make_books(3)
+        cls.users = make_users(4)
+        # Book 0 gets four reviews, book 1 one, book 2 none
+        for user in cls.users:
+            Review.objects.create(user=user, book=cls.books[0], rating=4, review_text=user.username)
+        Review.objects.create(user=cls.users[0], book=cls.books[1], rating=2, review_text='only')
+
+    def batch(self, ids, **params):
+        query = '&'.join(f'{key}={value}' for key, value in params.items())
+        return self.client.get(f'/api/books/batch/?ids={ids}&{query}')
+
+    def test_results_follow_request_order_without_repeats(self):
+        first, second, third = (book.pk for book in self.books)
+        response = self.batch(f'{third},{first},{third},999999,{second}')
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual([book['book_id'] for book in data['results']], [third, first, second])
+        self.assertEqual(data['missing'], [999999])
+
+    def test_id_count_and_format_are_checked(self):
+        self.assertEqual(self.batch('').status_code, 400)
+        for ids in ('1,x', '0', '-1', '1,99999999999999999999'):
+            with self.subTest(ids=ids):
+                response = self.batch(ids)
+                self.assertEqual(response.status_code, 400)
+                self.assertEqual(
+                    response.json(), {'error': 'ids must be a comma-separated list of positive integers'}
+                )
+        for reviews in ('x', '-1'):
+            with self.subTest(reviews=reviews):
+                response = self.batch(self.books[0].pk, reviews=reviews)
+                self.assertEqual(response.status_code, 400)
+                self.assertEqual(response.json(), {'error': 'reviews must be a non-negative integer'})
+        too_many = ','.join(['1'] * (BOOK_BATCH_MAX_IDS + 1))
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(self.batch(too_many).status_code, 400)
+        self.assertEqual(len(queries), 0)
+
+    def test_each_book_gets_its_newest_reviews(self):
+        ids = ','.join(str(book.pk) for book in self.books)
+        with CaptureQueriesContext(connection) as queries:
+            data = self.batch(ids, reviews=2).json()
+        self.assertEqual(len(queries), 2)
+        newest = list(
+            Review.objects.filter(book=self.books[0]).order_by('-review_id')
+            .values_list('review_text', flat=True)[:2]
+        )
+        reviews = [[review['review_text'] for review in book['reviews']] for book in data['results']]
+        self.assertEqual(reviews, [newest, ['only'], []])
+        self.assertEqual(data['results'][1]['reviews'][0]['username'], 'reader0')
+
+
+class ConditionalRequestTests(APIClientMixin, TestCase):
+    """ETags change on deletes; list validators cost no query once cached"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.books = make_books(3)
+
+    def test_list_revalidates_without_queries(self):
+        etag = self.client.get('/api/books/')['ETag']
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/books/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(len(queries), 0)
+
+    def test_delete_changes_list_validators(self):
+        first = self.client.get('/api/books/')
+        # MAX(updated_at) does not move on a delete, so lists send no
+        # Last-Modified and If-Modified-Since alone never answers 304
+        self.assertNotIn('Last-Modified', first)
+        self.books[0].delete()
+        response = self.client.get('/api/books/', HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json()['results']), 2)
+        response = self.client.get(
+            '/api/books/', HTTP_IF_MODIFIED_SINCE='Fri, 01 Jan 2100 00:00:00 GMT'
+        )
+        self.assertEqual(response.status_code, 200)
+
+    def test_async_views_answer_conditional_requests(self):
+        # Not the detail view: its concurrent queries lock SQLite in a TestCase
+        for path in ('/api/async/books/', f'/api/async/books/{self.books[0].pk}/reviews/'):
+            with self.subTest(path=path):
+                etag = self.client.get(path)['ETag']
+                response = self.client.get(path, HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(response.status_code, 304)
+        etag = self.client.get('/api/async/books/')['ETag']
+        self.books[1].delete()
+        response = self.client.get('/api/async/books/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+    def test_reviewer_rename_changes_detail_validators(self):
+        user = User.objects.create(
+            username='reader', email='reader@example.com', password='secret'
+        )
+        Review.objects.create(user=user, book=self.books[0], rating=4, review_text='Good')
+        url = f'/api/books/{self.books[0].pk}/'
+        first = self.client.get(url)
+        self.assertEqual(first.json()['reviews']['results'][0]['username'], 'reader')
+        self.client.put('/api/users/update/', {
+            'user_id': user.pk, 'current_password': 'secret', 'new_username': 'renamed'
+        }, format='json')
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['reviews']['results'][0]['username'], 'renamed')
+
+
+class ShelfBatchTests(APIClientMixin, TestCase):
+    """Batch shelf operations write what they report and are safe to replay"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(
+            username='reader', email='reader@example.com', password='secret'
+        )
+        cls.books = make_books(3)
+
+    def setUp(self):
+        super().setUp()
+        self.kept = FavoritePages.objects.create(user_id=self.user.pk, book_id=self.books[0].pk)
+        FavoritePages.objects.filter(pk=self.kept.pk).update(
+            created_at=datetime(2020, 1, 1, tzinfo=timezone.utc)
+        )
+        leaderboard.rebuild_leaderboard()
+
+    def batch(self, *operations):
+        response = self.client.post('/api/favorites/batch/', {
+            'user_id': self.user.pk, 'operations': list(operations)
+        }, format='json')
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def shelf(self):
+        return sorted(
+            FavoritePages.objects.filter(user_id=self.user.pk)
+            .values_list('favorite_id', 'book_id', 'reading_status', 'created_at')
+        )
+
+    def scores(self):
+        return {
+            row.book_id: (float(f'{row.trending_score:.9g}'), row.popular_score)
+            for row in BookLeaderboard.objects.all()
+        }
+
+    def test_remove_then_add_replaces_the_row(self):
+        book_id = self.books[0].pk
+        report = self.batch(
+            {'op': 'remove', 'book_id': book_id},
+            {'op': 'add', 'book_id': book_id, 'reading_status': 'ALREADY_READ'},
+        )
+        self.assertEqual([r['status'] for r in report['results']], ['removed', 'created'])
+        (favorite_id, _, reading_status, created_at), = self.shelf()
+        self.assertNotEqual(favorite_id, self.kept.pk)
+        self.assertEqual(reading_status, 'ALREADY_READ')
+        self.assertGreater(created_at.year, 2020)
+        # The incremental leaderboard matches one rebuilt from the new rows
+        incremental = self.scores()
+        leaderboard.rebuild_leaderboard()
+        self.assertEqual(incremental, self.scores())
+
+    def test_replaying_a_batch_changes_nothing(self):
+        operations = [
+            {'op': 'add', 'book_id': self.books[1].pk},
+            {'op': 'update', 'book_id': self.books[1].pk, 'reading_status': 'CURRENTLY_READING'},
+            {'op': 'update', 'book_id': self.books[0].pk, 'reading_status': 'ALREADY_READ'},
+            {'op': 'add', 'book_id': self.books[2].pk},
+            {'op': 'remove', 'book_id': self.books[2].pk},
+        ]
+        first = self.batch(*operations)
+        self.assertEqual(
+            (first['created'], first['updated'], first['removed'], first['error']), (2, 2, 1, 0)
+        )
+        shelf, scores = self.shelf(), self.scores()
+        replay = self.batch(*operations)
+        self.assertEqual(
+            [r['status'] for r in replay['results']],
+            ['error', 'updated', 'updated', 'created', 'removed']
+        )
+        self.assertEqual(self.shelf(), shelf)
+        self.assertEqual(self.scores(), scores)
+
+    def test_summary_follows_batch_writes(self):
+        url = f'/api/users/{self.user.pk}/shelves/'
+        self.assertEqual(self.client.get(url).json()['shelves']['WANT_TO_READ']['count'], 1)
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(url)
+        self.assertEqual(len(queries), 0)
+        self.batch({'op': 'add', 'book_id': self.books[1].pk})
+        self.assertEqual(self.client.get(url).json()['shelves']['WANT_TO_READ']['count'], 2)
+
+
+class SuggestTests(TestCase):
+    """Suggestions are ranked by reviews and follow committed book writes"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.books = Book.objects.bulk_create(
+            Book(
+                title=title, author=author, description='', genre='FICTION',
+                published_date='2000-01-01', available_copies=1, review_count=reviews
+            )
+            for title, author, reviews in [
+                ('The Great Gatsby', 'F. Scott Fitzgerald', 50),
+                ('Great Expectations', 'Charles Dickens', 30),
+                ('A Christmas Carol', 'Charles Dickens', 40),
+                ('Greatness', 'Unknown', 1),
+            ]
+        )
+
+    def setUp(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            suggest.invalidate()
+
+    def texts(self, prefix, limit=10):
+        return [item['text'] for item in suggest.suggest(prefix, limit)]
+
+    def test_ranked_by_reviews_from_any_word(self):
+        self.assertEqual(
+            self.texts('great'), ['The Great Gatsby', 'Great Expectations', 'Greatness']
+        )
+        # An author ranks by the reviews of all their books
+        self.assertEqual(self.texts('c'), ['Charles Dickens', 'A Christmas Carol'])
+
+    def test_precomputed_prefixes_match_a_scan(self):
+        rows = Book.objects.values_list('book_id', 'title', 'author', 'review_count')
+        precomputed = suggest.PrefixIndex(rows, top_n=2, scan_limit=1)
+        scanned = suggest.PrefixIndex(rows, top_n=2, scan_limit=100)
+        self.assertIn('great', precomputed._top)
+        for prefix in ('g', 'gr', 'great', 'c', 'the', 'x'):
+            self.assertEqual(precomputed.lookup(prefix, 4), scanned.lookup(prefix, 4))
+        precomputed.remove(self.books[0].pk)
+        scanned.remove(self.books[0].pk)
+        self.assertEqual(precomputed.lookup('g', 4), scanned.lookup('g', 4))
+
+    def test_only_committed_writes_are_applied(self):
+        suggest.get_index()
+        with transaction.atomic():
+            Book.objects.create(
+                title='Great Rollback', author='Nobody', description='', genre='FICTION',
+                published_date='2000-01-01', available_copies=1
+            )
+            transaction.set_rollback(True)
+        self.assertNotIn('Great Rollback', self.texts('great'))
+        with self.captureOnCommitCallbacks(execute=True):
+            book = Book.objects.create(
+                title='Great Commit', author='Nobody', description='', genre='FICTION',
+                published_date='2000-01-01', available_copies=1
+            )
+        self.assertIn('Great Commit', self.texts('great'))
+        with self.captureOnCommitCallbacks(execute=True):
+            book.delete()
+        self.assertNotIn('Great Commit', self.texts('great'))
+
+
+class RatingAggregateTests(APIClientMixin, TestCase):
+    """Only whole 1-5 ratings and one review per book are accepted; every delete is counted"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.users = make_users(2)
+        cls.books = make_books(2)
+
+    def post_review(self, user, book, rating):
+        return self.client.post('/api/reviews/', {
+            'user_id': user.pk, 'book_id': book.pk, 'rating': rating, 'review_text': 'ok'
+        }, format='json')
+
+    def aggregates(self):
+        return sorted(Book.objects.values_list(
+            'book_id', 'review_count', 'avg_rating',
+            *[ratings.histogram_field(r) for r in ratings.RATING_VALUES]
+        ))
+
+    def scores(self):
+        return sorted(
+            (row.book_id, float(f'{row.trending_score:.9g}'), row.popular_score)
+            for row in BookLeaderboard.objects.all()
+        )
+
+    def test_rejects_booleans_and_fractions(self):
+        for rating in (True, 4.9, '4.9', 0, 6, None, 'five'):
+            with self.subTest(rating=rating):
+                self.assertEqual(self.post_review(self.users[0], self.books[0], rating).status_code, 400)
+        self.assertEqual(self.post_review(self.users[0], self.books[0], 4.0).status_code, 201)
+        self.assertEqual(self.post_review(self.users[1], self.books[0], '5').status_code, 201)
+        self.assertFalse(Review.objects.exclude(rating__in=[4, 5]).exists())
+
+    def test_second_review_of_a_book_is_rejected(self):
+        self.assertEqual(self.post_review(self.users[0], self.books[0], 5).status_code, 201)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.post_review(self.users[0], self.books[0], 1)
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json(), {'error': 'You have already reviewed this book'})
+        # No existence check up front: the INSERT is the first statement
+        self.assertTrue(
+            next(q['sql'] for q in queries if 'review' in q['sql']).startswith('INSERT')
+        )
+        self.assertEqual(Review.objects.filter(book_id=self.books[0].pk).count(), 1)
+        book = Book.objects.get(pk=self.books[0].pk)
+        self.assertEqual((book.review_count, book.avg_rating), (1, 5.0))
+
+    def test_account_delete_uncounts_its_reviews(self):
+        for user, book, rating in [
+            (self.users[0], self.books[0], 5), (self.users[0], self.books[1], 1),
+            (self.users[1], self.books[0], 3),
+        ]:
+            self.assertEqual(self.post_review(user, book, rating).status_code, 201)
+        response = self.client.delete('/api/users/delete/', {
+            'user_id': self.users[0].pk, 'password': 'secret'
+        }, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            Book.objects.get(pk=self.books[0].pk).avg_rating, 3.0
+        )
+        incremental, scores = self.aggregates(), self.scores()
+        self.assertEqual(ratings.rebuild_ratings(), 0)
+        leaderboard.rebuild_leaderboard()
+        self.assertEqual(self.aggregates(), incremental)
+        self.assertEqual(self.scores(), [row for row in scores if row[2]])
+
+
+class FacetCountTests(TestCase):
+    """Facet counts follow committed book writes and ignore rolled-back ones"""
+
+    def counts(self):
+        return {
+            (facet, item['value']): item['count']
+            for facet, items in facets.get_facet_counts().items() for item in items
+        }
+
+    def test_counts_follow_committed_writes_only(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            book = Book.objects.create(
+                title='Dune', author='Frank Herbert', description='', genre='FICTION',
+                published_date='1965-08-01', available_copies=1
+            )
+        self.assertEqual(self.counts(), {
+            ('genre', 'FICTION'): 1, ('decade', '1960'): 1, ('available', 'true'): 1
+        })
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            with transaction.atomic():
+                book.genre = 'HISTORY'
+                book.save()
+                transaction.set_rollback(True)
+        self.assertEqual(callbacks, [])
+        book.refresh_from_db()
+        with self.captureOnCommitCallbacks(execute=True):
+            with transaction.atomic():
+                book.genre = 'SCIENCE'
+                book.published_date = '1971-01-01'
+                book.save()
+        self.assertEqual(self.counts(), {
+            ('genre', 'SCIENCE'): 1, ('decade', '1970'): 1, ('available', 'true'): 1
+        })
+        with self.captureOnCommitCallbacks(execute=True):
+            book.delete()
+        self.assertEqual(self.counts(), {})
+
+
+class RecommendationTests(APIClientMixin, TestCase):
+    """Similar books and "because you read" from shared readers"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.books = make_books(4)
+        cls.users = make_users(4)
+        # Books 0 and 1 share two readers, books 0 and 2 one; book 3 only
+        # shares a reader with book 2. reader3 has read book 0 alone.
+        shelves = {0: (0, 1), 1: (0, 1, 2), 2: (2, 3), 3: (0,)}
+        FavoritePages.objects.bulk_create(
+            FavoritePages(
+                user_id=cls.users[user].pk, book_id=cls.books[book].pk,
+                reading_status='ALREADY_READ'
+            )
+            for user, books in shelves.items() for book in books
+        )
+
+    def stored_rows(self):
+        return dict(
+            BookSimilarity.objects.values_list('book_id', 'neighbors')
+        )
+
+    def test_similar_books_ranked_by_shared_readers(self):
+        recommendations.rebuild_similarities()
+        response = self.client.get(f'/api/books/{self.books[0].pk}/similar/')
+        self.assertEqual(response.status_code, 200)
+        results = response.json()['results']
+        self.assertEqual([book['book_id'] for book in results], [self.books[1].pk, self.books[2].pk])
+        self.assertGreater(results[0]['score'], results[1]['score'])
+
+    def test_because_you_read_skips_known_books(self):
+        recommendations.rebuild_similarities()
+        response = self.client.get(f'/api/users/{self.users[3].pk}/recommendations/')
+        self.assertEqual(response.status_code, 200)
+        results = response.json()['results']
+        self.assertEqual([book['book_id'] for book in results], [self.books[1].pk, self.books[2].pk])
+        self.assertEqual(results[0]['because'], {'book_id': self.books[0].pk, 'title': 'Book 0'})
+
+    def test_partial_refresh_updates_neighbors_rows(self):
+        recommendations.rebuild_similarities()
+        # reader0 shelves book 3: rows of books 0 and 1, which it now shares
+        # a reader with, change even though they saw no activity
+        FavoritePages.objects.create(
+            user_id=self.users[0].pk, book_id=self.books[3].pk, reading_status='ALREADY_READ'
+        )
+        recommendations.rebuild_similarities(book_ids=[self.books[3].pk])
+        partial = self.stored_rows()
+        self.assertIn(self.books[3].pk, [neighbor for neighbor, _ in partial[self.books[0].pk]])
+        recommendations.rebuild_similarities()
+        self.assertEqual(partial, self.stored_rows())
+
+    def test_since_minutes_sees_removed_favorites(self):
+        FavoritePages.objects.update(created_at=datetime(2024, 1, 1, tzinfo=timezone.utc))
+        recommendations.rebuild_similarities()
+        self.assertIn(self.books[3].pk, self.stored_rows())
+        # Book 3's only reader drops it: no row is left with a new timestamp
+        response = self.client.delete(f'/api/favorites/{self.users[2].pk}/{self.books[3].pk}/remove/')
+        self.assertEqual(response.status_code, 200)
+        changed = recommendations.recently_active_books(5)
+        self.assertEqual(changed, {self.books[3].pk})
+        recommendations.rebuild_similarities(book_ids=changed)
+        partial = self.stored_rows()
+        self.assertNotIn(self.books[3].pk, partial)
+        self.assertNotIn(self.books[3].pk, [neighbor for neighbor, _ in partial[self.books[2].pk]])
+        recommendations.rebuild_similarities()
+        self.assertEqual(partial, self.stored_rows())
+
+
+class LeaderboardTests(APIClientMixin, TestCase):
+    """Incremental leaderboard updates agree with a rebuild from the tables"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.books = make_books(3)
+        cls.users = make_users(3)
+
+    def post(self, url, data, method='post'):
+        response = getattr(self.client, method)(url, data, format='json')
+        self.assertIn(response.status_code, (200, 201))
+        return response.json()
+
+    def scores(self):
+        return sorted(
+            (row.book_id, float(f'{row.trending_score:.9g}'), row.popular_score)
+            for row in BookLeaderboard.objects.filter(popular_score__gt=0)
+        )
+
+    def ranked(self, path):
+        return [book['book_id'] for book in self.client.get(path).json()]
+
+    def test_incremental_writes_match_rebuild(self):
+        users, books = self.users, self.books
+        reviews = [
+            self.post('/api/reviews/', {
+                'user_id': user.pk, 'book_id': book.pk, 'rating': 4, 'review_text': 'ok'
+            })
+            for user, book in [(users[0], books[0]), (users[1], books[0]), (users[2], books[1])]
+        ]
+        for book in (books[1], books[2]):
+            self.post('/api/favorites/add/', {'user_id': users[0].pk, 'book_id': book.pk})
+        self.post('/api/favorites/status/update/', {
+            'user_id': users[0].pk, 'book_id': books[1].pk, 'reading_status': 'ALREADY_READ'
+        }, method='put')
+        self.post(
+            f"/api/reviews/{reviews[1]['review_id']}/delete/", {'user_id': users[1].pk},
+            method='delete'
+        )
+        self.post(f'/api/favorites/{users[0].pk}/{books[2].pk}/remove/', {}, method='delete')
+
+        incremental = self.scores()
+        self.assertEqual(leaderboard.rebuild_leaderboard(), 2)
+        self.assertEqual(self.scores(), incremental)
+        # Book 1 has a review and a favorite, book 0 one review
+        self.assertEqual(self.ranked('/api/books/popular/'), [books[1].pk, books[0].pk])
+        self.assertEqual(self.ranked('/api/books/trending/'), [books[1].pk, books[0].pk])
+
+    def test_book_without_interactions_leaves_both_lists(self):
+        book = self.books[0]
+        self.post('/api/favorites/add/', {'user_id': self.users[0].pk, 'book_id': book.pk})
+        self.assertEqual(self.ranked('/api/books/trending/'), [book.pk])
+        self.post(f'/api/favorites/{self.users[0].pk}/{book.pk}/remove/', {}, method='delete')
+        # What float cancellation can leave behind once every event is removed
+        BookLeaderboard.objects.filter(book_id=book.pk).update(trending_score=2.0 ** 94)
+        cache.clear()
+        self.assertEqual(self.ranked('/api/books/trending/'), [])
+        self.assertEqual(self.ranked('/api/books/popular/'), [])
+
+    def test_old_activity_decays_out_of_trending(self):
+        for user in self.users[:2]:
+            FavoritePages.objects.create(user_id=user.pk, book_id=self.books[0].pk)
+        FavoritePages.objects.update(created_at=datetime(2024, 1, 1, tzinfo=timezone.utc))
+        leaderboard.rebuild_leaderboard()
+        self.post('/api/favorites/add/', {'user_id': self.users[2].pk, 'book_id': self.books[1].pk})
+        self.assertEqual(self.ranked('/api/books/popular/'), [self.books[0].pk, self.books[1].pk])
+        self.assertEqual(self.ranked('/api/books/trending/'), [self.books[1].pk, self.books[0].pk])
+
+
+class BookImportTests(APIClientMixin, TestCase):
+    """CSV and JSON Lines imports report every row, even when they stop early"""
+
+    HEADER = 'title,author,description,genre,published_date,available_copies\n'
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.librarian = User.objects.create(
+            username='librarian', email='librarian@example.com', password='secret',
+            is_librarian=True
+        )
+
+    def post_csv(self, body, user_id=None):
+        return self.client.post(
+            f'/api/books/import/?user_id={user_id or self.librarian.pk}',
+            data=body, content_type='text/csv'
+        )
+
+    def csv_row(self, title, copies=1):
+        return f'{title},Author,About,FICTION,2000-01-01,{copies}\n'
+
+    def test_csv_body_is_imported(self):
+        body = self.HEADER + self.csv_row('One') + self.csv_row('Two')
+        response = self.post_csv(body.encode())
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['created'], 2)
+        self.assertEqual(
+            sorted(Book.objects.values_list('title', 'cover_image')), [('One', None), ('Two', None)]
+        )
+
+    def test_jsonl_upload_is_imported(self):
+        lines = [
+            {'title': 'One', 'author': 'Author', 'description': 'About', 'genre': 'FICTION',
+             'published_date': '2000-01-01', 'available_copies': 1, 'cover_image': 'one.jpg'},
+            {'title': 'Two', 'author': 'Author', 'description': 'About', 'genre': 'POETRY',
+             'published_date': '1999-12-31', 'available_copies': 0},
+        ]
+        upload = SimpleUploadedFile(
+            'books.jsonl', '\n\n'.join(json.dumps(line) for line in lines).encode()
+        )
+        response = self.client.post(
+            '/api/books/import/', {'user_id': self.librarian.pk, 'file': upload}
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), {
+            'created': 2, 'failed': 0, 'errors': [], 'errors_truncated': False
+        })
+        self.assertEqual(Book.objects.get(title='One').cover_image, 'one.jpg')
+
+    def test_invalid_rows_are_reported_and_skipped(self):
+        body = self.HEADER + self.csv_row('One') + self.csv_row('', copies='many') + self.csv_row('Three')
+        report = self.post_csv(body.encode()).json()
+        self.assertEqual((report['created'], report['failed']), (2, 1))
+        error, = report['errors']
+        self.assertEqual(error['row'], 2)
+        self.assertEqual(set(error['errors']), {'title', 'available_copies'})
+
+    def test_error_list_stops_at_max_errors(self):
+        body = self.HEADER + ''.join(self.csv_row(f'Book {i}', copies='x') for i in range(3))
+        report = bulk_import.import_books(io.BytesIO(body.encode()), bulk_import.CSV, max_errors=1)
+        self.assertEqual((report['created'], report['failed']), (0, 3))
+        self.assertEqual([error['row'] for error in report['errors']], [1])
+        self.assertTrue(report['errors_truncated'])
+
+    def test_bad_encoding_stops_with_partial_report(self):
+        body = (self.HEADER + self.csv_row('One')).encode() + self.csv_row('Café').encode('latin-1')
+        response = self.post_csv(body)
+        self.assertEqual(response.status_code, 400)
+        report = response.json()
+        self.assertEqual((report['created'], report['failed']), (1, 1))
+        self.assertEqual(report['errors'][0]['row'], 2)
+        self.assertIn('row 2', report['error'])
+        self.assertEqual(list(Book.objects.values_list('title', flat=True)), ['One'])
+
+    def test_non_integer_user_id_is_rejected(self):
+        response = self.post_csv((self.HEADER + self.csv_row('One')).encode(), user_id='abc')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json(), {'error': 'user_id must be an integer'})
+        self.assertFalse(Book.objects.exists())
+
+
+class SearchTests(APIClientMixin, TestCase):
+    """Ranked full-text search and its index follow book writes"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.title_match = Book.objects.create(
+            title='The Dragon Rider', author='Cornelia Funke', description='A quest.',
+            genre='FANTASY', published_date='1997-01-01', available_copies=1
+        )
+        cls.description_match = Book.objects.create(
+            title='Mountain Tales', author='Anon', description='A village and its dragon.',
+            genre='FOLKLORE', published_date='1950-01-01', available_copies=1
+        )
+        cls.other = Book.objects.create(
+            title='Gardening', author='Anon', description='Growing tomatoes.',
+            genre='HOME', published_date='2000-01-01', available_copies=1
+        )
+
+    def search(self, query):
+        response = self.client.get('/api/books/search/', {'q': query})
+        self.assertEqual(response.status_code, 200)
+        return [book['book_id'] for book in response.json()]
+
+    def test_title_matches_rank_above_description_matches(self):
+        self.assertEqual(
+            self.search('dragon'), [self.title_match.pk, self.description_match.pk]
+        )
+
+    def test_words_match_by_stem(self):
+        # The porter stemmer folds plurals and verb forms onto one term
+        self.assertEqual(self.search('dragons'), [self.title_match.pk, self.description_match.pk])
+        self.assertEqual(self.search('dragons riders'), [self.title_match.pk])
+        self.assertEqual(self.search('grow tomato'), [self.other.pk])
+        self.assertEqual(self.search('drag'), [])
+
+    def test_query_syntax_is_treated_as_text(self):
+        for query in ('dragon"', 'dragon OR gardening', 'NEAR(dragon rider)', 'rider:dragon*', '-"'):
+            with self.subTest(query=query):
+                response = self.client.get('/api/books/search/', {'q': query})
+                self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.search('dragon OR gardening'), [])
+        self.assertEqual(self.search('rider:dragon*'), [self.title_match.pk])
+
+    def test_index_follows_create_update_and_delete(self):
+        book = Book.objects.create(
+            title='Submarine Voyages', author='Anon', description='Under the sea.',
+            genre='TRAVEL', published_date='2001-01-01', available_copies=1
+        )
+        self.assertEqual(self.search('submarine'), [book.pk])
+        book.title = 'Balloon Voyages'
+        book.save()
+        self.assertEqual(self.search('submarine'), [])
+        self.assertEqual(self.search('balloon'), [book.pk])
+        book.delete()
+        self.assertEqual(self.search('voyages'), [])
+
+
+class FieldsetTests(APIClientMixin, TestCase):
+    """?fields= picks the columns read and returned; unknown names are a 400"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.book = Book.objects.create(
+            title='Projected', author='Author', description='Long text',
+            genre='FICTION', published_date='2000-01-01', available_copies=1
+        )
+        cls.user = User.objects.create(username='reader', email='reader@example.com', password='secret')
+        Review.objects.create(user=cls.user, book=cls.book, rating=4, review_text='Good')
+
+    def test_only_requested_fields_are_read_and_returned(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/books/?fields=title,book_id')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['results'], [{'book_id': self.book.pk, 'title': 'Projected'}])
+        page_sql = next(q['sql'] for q in queries if '"title"' in q['sql'])
+        self.assertNotIn('"author"', page_sql)
+        response = self.client.get(f'/api/books/{self.book.pk}/reviews/?fields=rating')
+        self.assertEqual(response.json()['results'], [{'rating': 4}])
+
+    def test_list_defers_description_unless_requested(self):
+        book, = self.client.get('/api/books/').json()['results']
+        self.assertNotIn('description', book)
+        self.assertIn('author', book)
+        book, = self.client.get('/api/books/?fields=description').json()['results']
+        self.assertEqual(book, {'description': 'Long text'})
+
+    def test_unknown_and_hidden_fields_are_rejected(self):
+        for path in ('/api/books/?fields=title,nope', '/api/users/?fields=password'):
+            with self.subTest(path=path):
+                response = self.client.get(path)
+                self.assertEqual(response.status_code, 400)
+                self.assertTrue(response.json()['error'].startswith('Unknown field(s): '))
+
+    def test_empty_field_list_means_default_fields(self):
+        default = self.client.get('/api/books/').json()
+        for query in ('fields=', 'fields=,', 'fields=%20,%20'):
+            with self.subTest(query=query):
+                response = self.client.get(f'/api/books/?{query}')
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(response.json(), default)
+
+
+class RowSerializerTests(TestCase):
+    """The compiled values_list() path returns exactly what DRF would"""
+
+    class ShelfSerializer(DynamicFieldsModelSerializer):
+        class Meta:
+            model = FavoritePages
+            fields = '__all__'
+
+    @classmethod
+    def setUpTestData(cls):
+        books = [
+            Book.objects.create(
+                title='Covered', author='Author', description='About',
+                genre='FICTION', published_date='1999-12-31', available_copies=2,
+                cover_image='covered.jpg', avg_rating=4.5
+            ),
+            Book.objects.create(
+                title='Bare', author='Author', description='',
+                genre='POETRY', published_date='2000-01-01', available_copies=0
+            ),
+        ]
+        user = User.objects.create(username='reader', email='reader@example.com', password='secret')
+        for book, rating in zip(books, (5, 2)):
+            Review.objects.create(user=user, book=book, rating=rating, review_text='ok')
+            FavoritePages.objects.create(user_id=user.pk, book_id=book.pk, reading_status='ALREADY_READ')
+
+    def assert_same_output(self, serializer_class, queryset, fields=None):
+        queryset = queryset.order_by('pk')
+        rows = get_row_serializer(serializer_class, fields)
+        fast = rows.serialize(rows.values_list(queryset))
+        kwargs = {} if fields is None else {'fields': fields}
+        slow = serializer_class(queryset, many=True, **kwargs).data
+        # Same keys in the same order, and the same values
+        self.assertEqual([list(item.items()) for item in fast], [list(item.items()) for item in slow])
+
+    def test_books_match_book_serializer(self):
+        self.assert_same_output(BookSerializer, Book.objects.all())
+        self.assert_same_output(
+            BookSerializer, Book.objects.all(), ['title', 'published_date', 'cover_image', 'avg_rating']
+        )
+
+    def test_reviews_match_review_serializer(self):
+        self.assert_same_output(ReviewSerializer, Review.objects.all())
+        self.assert_same_output(ReviewSerializer, Review.objects.all(), ['user', 'rating', 'created_at'])
+
+    def test_choices_match(self):
+        self.assert_same_output(self.ShelfSerializer, FavoritePages.objects.all())
+        self.assert_same_output(self.ShelfSerializer, FavoritePages.objects.all(), ['reading_status'])
@@ -1,5 +1,5 @@
 from django.urls import path
-from .views import views_user, views_book, views_review, views_favorite
+from .views import views_user, views_book, views_review, views_favorite, views_system, views_async
 
 urlpatterns = [
     # Root endpoint
@@ -11,12 +11,20 @@ urlpatterns = [
     path('users/logout/', views_user.logout, name='logout'),
     path('users/delete/', views_user.delete_account, name='delete-account'),
     path('users/update/', views_user.update_user, name='update-user'),
+    path('users/<int:user_id>/recommendations/', views_book.get_user_recommendations, name='get-user-recommendations'),
 
     # Book endpoints
     path('books/', views_book.get_all_books, name='get-all-books'),
     path('books/<int:book_id>/', views_book.get_book_detail, name='get-book-detail'),
+    path('books/<int:book_id>/similar/', views_book.get_similar_books, name='get-similar-books'),
+    path('books/batch/', views_book.get_books_batch, name='get-books-batch'),
+    path('books/trending/', views_book.get_trending_books, name='get-trending-books'),
+    path('books/popular/', views_book.get_popular_books, name='get-popular-books'),
     path('books/search/', views_book.search_books, name='search-books'),
+    path('books/suggest/', views_book.suggest_books, name='suggest-books'),
+    path('books/browse/', views_book.browse_books, name='browse-books'),
     path('books/create/', views_book.create_book, name='create-book'),
+    path('books/import/', views_book.import_books, name='import-books'),
 
     # Review endpoints
     path('books/<int:book_id>/reviews/', views_review.get_book_reviews, name='get-book-reviews'),
@@ -28,7 +36,19 @@ urlpatterns = [
     # Favorite endpoints
     path('users/<int:user_id>/favorites/', views_favorite.get_user_favorites, name='get-user-favorites'),
     path('favorites/add/', views_favorite.add_favorite, name='add-favorite'),
+    path('favorites/batch/', views_favorite.batch_favorites, name='batch-favorites'),
     path('favorites/status/update/', views_favorite.update_reading_status, name='update-reading-status'),
     path('favorites/<int:user_id>/<int:book_id>/remove/', views_favorite.remove_favorite, name='remove-favorite'),
     path('users/<int:user_id>/reading/<str:reading_status>/', views_favorite.get_reading_status_books, name='get-reading-status-books'),
+    path('users/<int:user_id>/shelves/', views_favorite.get_shelf_summary, name='get-shelf-summary'),
+
+    # Async read endpoints (same responses, for ASGI deployments)
+    path('async/books/', views_async.get_all_books, name='async-get-all-books'),
+    path('async/books/<int:book_id>/', views_async.get_book_detail, name='async-get-book-detail'),
+    path('async/books/<int:book_id>/reviews/', views_async.get_book_reviews, name='async-get-book-reviews'),
+    path('async/users/<int:user_id>/favorites/', views_async.get_user_favorites, name='async-get-user-favorites'),
+
+    # System endpoints
+    path('system/cache/', views_system.cache_stats, name='cache-stats'),
+    path('system/db-pool/', views_system.db_pool_stats, name='db-pool-stats'),
 ]
\ No newline at end of file
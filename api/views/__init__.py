@@ -2,18 +2,25 @@ from .views_user import *
 from .views_book import *
 from .views_review import *
 from .views_favorite import *
+from .views_system import *
 
 __all__ = [
     # User views
     'get_all_users', 'login', 'logout', 'delete_account', 'update_user',
     
     # Book views
-    'get_all_books', 'get_book_detail', 'search_books', 'create_book',
+    'get_all_books', 'get_book_detail', 'search_books', 'suggest_books', 'create_book',
+    'import_books', 'browse_books', 'get_books_batch', 'get_similar_books',
+    'get_user_recommendations', 'get_trending_books', 'get_popular_books',
     
     # Review views
     'get_book_reviews', 'get_user_reviews', 'create_review', 'update_review', 'delete_review',
     
     # Favorite views
     'get_user_favorites', 'add_favorite', 'update_reading_status', 
-    'remove_favorite', 'get_reading_status_books'
+    'remove_favorite', 'get_reading_status_books', 'batch_favorites',
+    'get_shelf_summary',
+
+    # System views
+    'cache_stats', 'db_pool_stats'
 ]
\ No newline at end of file
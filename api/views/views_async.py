@@ -0,0 +1,246 @@
+"""
+Async variants of the hot read endpoints, served under /api/async/.
+
+They return the same JSON as their @api_view counterparts but do not hold a
+worker while MySQL answers, so under an ASGI server (see gunicorn_asgi.py)
+one worker can keep many slow requests in flight. DRF views are sync-only,
+so these are plain Django async views rendered with DRF's JSONRenderer.
+They answer conditional GETs from the same validators as the sync views,
+but the response cache is not applied here.
+
+Queries go through sync_to_async on a private thread pool rather than
+Django's async ORM (aget(), async for). In Django 5.1 the async ORM still
+runs each query through sync_to_async on the request's single shared
+thread, so queries awaited together run one after another. Independent
+threads, each with its own pooled connection, let `concurrently` overlap
+them.
+"""
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import close_old_connections
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+from rest_framework import status
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+
+from ..models import Book, Review, FavoritePages
+from ..serializers import (
+    BookSerializer, ReviewSerializer, ReviewWithReviewerSerializer, FavoritePagesSerializer
+)
+from ..pagination import BookPagination, ReviewPagination, FavoritePagination, InvalidCursor
+from ..conditional import make_etag
+from ..fieldsets import InvalidFields, requested_fields
+from ..row_serializers import get_row_serializer
+from .. import ratings
+from .views_book import (
+    BOOK_LIST_DEFERRED_FIELDS, REVIEW_WITH_REVIEWER_COLUMNS,
+    book_detail_validators, book_list_validators
+)
+from .views_review import book_reviews_validators
+import logging
+
+logger = logging.getLogger(__name__)
+
+query_executor = ThreadPoolExecutor(
+    max_workers=settings.ASYNC_QUERY_THREADS,
+    thread_name_prefix='async-query'
+)
+
+def json_response(data, status_code=status.HTTP_200_OK):
+    return HttpResponse(
+        JSONRenderer().render(data), status=status_code, content_type='application/json'
+    )
+
+def check_conditional(request, validators, send_last_modified=True):
+    """Return (304 response or None, headers for a 200) for `(last_modified, count)`
+
+    Mirrors the @conditional decorator, see api/conditional.py.
+    """
+    if validators is None:
+        return None, {}
+    last_modified, count = validators
+    etag = make_etag(request, last_modified, count)
+    timestamp = None
+    if send_last_modified and last_modified:
+        timestamp = int(last_modified.timestamp())
+    headers = {'ETag': etag}
+    if timestamp is not None:
+        headers['Last-Modified'] = http_date(timestamp)
+    return get_conditional_response(request, etag=etag, last_modified=timestamp), headers
+
+def with_headers(response, headers):
+    for name, value in headers.items():
+        response[name] = value
+    return response
+
+async def concurrently(*funcs):
+    """Run sync ORM functions at the same time, each on its own thread and connection"""
+    def isolated(func):
+        def run():
+            try:
+                return func()
+            finally:
+                close_old_connections()
+        return sync_to_async(run, thread_sensitive=False, executor=query_executor)()
+    return await asyncio.gather(*[isolated(func) for func in funcs])
+
+async def get_all_books(request):
+    """Async GET /api/books/"""
+    request = Request(request)
+    try:
+        fields = requested_fields(
+            request, BookSerializer, deferred=BOOK_LIST_DEFERRED_FIELDS
+        )
+    except InvalidFields as e:
+        return json_response({'error': str(e)}, status.HTTP_400_BAD_REQUEST)
+    try:
+        validators = await sync_to_async(book_list_validators)(request)
+        not_modified, headers = check_conditional(request, validators, send_last_modified=False)
+        if not_modified is not None:
+            return not_modified
+
+        rows = get_row_serializer(BookSerializer, fields)
+        paginator = BookPagination()
+        books = await sync_to_async(paginator.paginate_queryset)(
+            rows.values_list(Book.objects.all()), request
+        )
+        return with_headers(
+            json_response(paginator.get_paginated_response(rows.serialize(books)).data),
+            headers
+        )
+    except InvalidCursor as e:
+        return json_response({'error': str(e)}, status.HTTP_400_BAD_REQUEST)
+    except Exception as e:
+        logger.error(f"Error fetching books: {str(e)}")
+        return json_response(
+            {'error': 'Failed to fetch books'},
+            status.HTTP_500_INTERNAL_SERVER_ERROR
+        )
+
+async def get_book_detail(request, book_id):
+    """Async GET /api/books/<book_id>/
+
+    The book and the conditional GET aggregate run concurrently; the page
+    of reviews is only fetched and serialized when the answer is not 304.
+    """
+    request = Request(request)
+    try:
+        # Reject a bad cursor before any of the three queries goes out
+        paginator = ReviewPagination()
+        paginator.decode_cursor(request)
+
+        def fetch_book():
+            return Book.objects.filter(pk=book_id).first()
+
+        def fetch_reviews():
+            reviews = paginator.paginate_queryset(
+                Review.objects.filter(book_id=book_id)
+                .select_related('user')
+                .only(*REVIEW_WITH_REVIEWER_COLUMNS),
+                request
+            )
+            return paginator, ReviewWithReviewerSerializer(reviews, many=True).data
+
+        def fetch_validators():
+            return book_detail_validators(request, book_id)
+
+        book, validators = await concurrently(fetch_book, fetch_validators)
+        if book is None:
+            return json_response(
+                {'error': 'Failed to fetch book details'},
+                status.HTTP_404_NOT_FOUND
+            )
+
+        not_modified, headers = check_conditional(request, validators)
+        if not_modified is not None:
+            return not_modified
+
+        (paginator, reviews), = await concurrently(fetch_reviews)
+
+        return with_headers(json_response({
+            'book': BookSerializer(book).data,
+            'rating': {
+                'average': book.avg_rating,
+                'count': book.review_count,
+                'histogram': {
+                    str(r): getattr(book, ratings.histogram_field(r))
+                    for r in ratings.RATING_VALUES
+                },
+            },
+            'reviews': {
+                'next': paginator.get_next_link(),
+                'previous': paginator.get_previous_link(),
+                'results': reviews,
+            },
+        }), headers)
+    except InvalidCursor as e:
+        return json_response({'error': str(e)}, status.HTTP_400_BAD_REQUEST)
+    except Exception as e:
+        logger.error(f"Error fetching book details: {str(e)}")
+        return json_response(
+            {'error': 'Failed to fetch book details'},
+            status.HTTP_404_NOT_FOUND
+        )
+
+async def get_book_reviews(request, book_id):
+    """Async GET /api/books/<book_id>/reviews/"""
+    request = Request(request)
+    try:
+        fields = requested_fields(request, ReviewSerializer)
+    except InvalidFields as e:
+        return json_response({'error': str(e)}, status.HTTP_400_BAD_REQUEST)
+    try:
+        validators = await sync_to_async(book_reviews_validators)(request, book_id)
+        not_modified, headers = check_conditional(request, validators, send_last_modified=False)
+        if not_modified is not None:
+            return not_modified
+
+        rows = get_row_serializer(ReviewSerializer, fields)
+        paginator = ReviewPagination()
+        reviews = await sync_to_async(paginator.paginate_queryset)(
+            rows.values_list(Review.objects.filter(book_id=book_id)), request
+        )
+        return with_headers(
+            json_response(paginator.get_paginated_response(rows.serialize(reviews)).data),
+            headers
+        )
+    except InvalidCursor as e:
+        return json_response({'error': str(e)}, status.HTTP_400_BAD_REQUEST)
+    except Exception as e:
+        logger.error(f"Error fetching reviews for book {book_id}: {str(e)}")
+        return json_response(
+            {'error': 'Failed to fetch reviews'},
+            status.HTTP_500_INTERNAL_SERVER_ERROR
+        )
+
+async def get_user_favorites(request, user_id):
+    """Async GET /api/users/<user_id>/favorites/"""
+    request = Request(request)
+    try:
+        favorites = FavoritePages.objects.filter(user_id=user_id)
+        status_filter = request.query_params.get('status')
+        if status_filter:
+            favorites = favorites.filter(reading_status=status_filter)
+
+        def fetch_page():
+            paginator = FavoritePagination()
+            page = paginator.paginate_queryset(favorites, request)
+            # Serializing loads the page's books, so it runs on the same thread
+            return paginator.get_paginated_response(
+                FavoritePagesSerializer(page, many=True).data
+            ).data
+
+        return json_response(await sync_to_async(fetch_page)())
+    except InvalidCursor as e:
+        return json_response({'error': str(e)}, status.HTTP_400_BAD_REQUEST)
+    except Exception as e:
+        logger.error(f"Error fetching favorites for user {user_id}: {str(e)}")
+        return json_response(
+            {'error': f'Failed to fetch favorites: {str(e)}'},
+            status.HTTP_500_INTERNAL_SERVER_ERROR
+        )
@@ -1,21 +1,110 @@
 from rest_framework.decorators import api_view
 from rest_framework.response import Response
 from rest_framework import status
-from django.db.models import Q
+from django.http import Http404
 from django.shortcuts import get_object_or_404
+from django.db.models import Count, F, Max, Window
+from django.db.models.functions import RowNumber
 from ..models import Book, User, Review, FavoritePages
-from ..serializers import BookSerializer, ReviewSerializer, FavoritePagesSerializer
+from ..serializers import (
+    BookSerializer, ReviewSerializer, ReviewWithReviewerSerializer, FavoritePagesSerializer
+)
+from ..pagination import BookPagination, ReviewPagination, InvalidCursor
+from .. import search, suggest, bulk_import, facets, ratings, recommendations, leaderboard
+from ..conditional import conditional
+from ..fieldsets import InvalidFields, requested_fields, project
+from ..row_serializers import get_row_serializer
+from ..caching import cached, cached_value, BOOKS, REVIEWS, FAVORITES, USERS, RECOMMENDATIONS
 import logging
 
 logger = logging.getLogger(__name__)
 
+SEARCH_DEFAULT_LIMIT = 20
+SEARCH_MAX_LIMIT = 100
+SUGGEST_DEFAULT_LIMIT = 10
+SUGGEST_MAX_LIMIT = 25
+
+# List cards do not show the description; it is sent only when requested
+# with ?fields=...,description
+BOOK_LIST_DEFERRED_FIELDS = ('description',)
+
+LEADERBOARD_DEFAULT_LIMIT = 10
+LEADERBOARD_MAX_LIMIT = 50
+
+RECOMMENDATION_DEFAULT_LIMIT = 10
+RECOMMENDATION_MAX_LIMIT = 50
+
+BOOK_BATCH_MAX_IDS = 100
+BOOK_BATCH_MAX_REVIEWS = 10
+# Largest key a signed 64-bit column can hold
+MAX_BOOK_ID = 2 ** 63 - 1
+
+REVIEW_WITH_REVIEWER_COLUMNS = (
+    'review_id', 'book_id', 'rating', 'review_text', 'created_at', 'updated_at',
+    'user__user_id', 'user__username', 'user__profile_image'
+)
+
+def book_list_validators(request):
+    """Latest book change and book count, for conditional GET
+
+    Cached until books or reviews change, so a repeat request costs no
+    query; review writes move the book's updated_at via its rating.
+    """
+    def compute():
+        result = Book.objects.aggregate(
+            last_modified=Max('updated_at'), count=Count('book_id')
+        )
+        return result['last_modified'], result['count']
+    return cached_value((BOOKS, REVIEWS), 'book_list_validators', compute)
+
+def book_detail_validators(request, book_id):
+    """Latest change to the book, its reviews or their reviewers, for conditional GET
+
+    Removing a review updates the book's rating, and with it updated_at,
+    so Last-Modified also moves on deletes.
+    """
+    def compute():
+        row = (
+            Book.objects.filter(pk=book_id)
+            .annotate(
+                reviews_modified=Max('review__updated_at'),
+                reviewers_modified=Max('review__user__updated_at'),
+                reviews_count=Count('review')
+            )
+            .values('updated_at', 'reviews_modified', 'reviewers_modified', 'reviews_count')
+            .first()
+        )
+        if row is None:
+            return None
+        last_modified = max(filter(None, [
+            row['updated_at'], row['reviews_modified'], row['reviewers_modified']
+        ]))
+        return last_modified, row['reviews_count']
+    return cached_value(
+        (BOOKS, REVIEWS, USERS), f'book_detail_validators:{book_id}', compute
+    )
+
 @api_view(['GET'])
+@conditional(book_list_validators, send_last_modified=False)
+@cached(BOOKS, REVIEWS)
 def get_all_books(request):
-    """Get all books for homepage display"""
+    """Get a page of books for homepage display (newest first)"""
     try:
-        books = Book.objects.all()
-        serializer = BookSerializer(books, many=True)
-        return Response(serializer.data, status=status.HTTP_200_OK)
+        fields = requested_fields(
+            request, BookSerializer, deferred=BOOK_LIST_DEFERRED_FIELDS
+        )
+    except InvalidFields as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    try:
+        # Fast path: values_list() rows -> dicts, same output as BookSerializer
+        rows = get_row_serializer(BookSerializer, fields)
+        paginator = BookPagination()
+        books = paginator.paginate_queryset(
+            rows.values_list(Book.objects.all()), request
+        )
+        return paginator.get_paginated_response(rows.serialize(books))
+    except InvalidCursor as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
     except Exception as e:
         logger.error(f"Error fetching books: {str(e)}")
         return Response(
@@ -24,21 +113,46 @@ def get_all_books(request):
         )
 
 @api_view(['GET'])
+@conditional(book_detail_validators)
+@cached(BOOKS, REVIEWS, USERS)
 def get_book_detail(request, book_id):
-    """Get detailed information about a specific book"""
+    """Get a book, its rating summary and a page of reviews with reviewer info
+
+    Always two queries: the book, and one page of reviews joined to their
+    reviewers. Further review pages are fetched with the `next` cursor.
+    """
     try:
         book = get_object_or_404(Book, pk=book_id)
         serializer = BookSerializer(book)
         
-        # Get book reviews
-        reviews = Review.objects.filter(book_id=book_id)
-        review_serializer = ReviewSerializer(reviews, many=True)
+        paginator = ReviewPagination()
+        reviews = paginator.paginate_queryset(
+            Review.objects.filter(book_id=book_id)
+            .select_related('user')
+            .only(*REVIEW_WITH_REVIEWER_COLUMNS),
+            request
+        )
+        review_serializer = ReviewWithReviewerSerializer(reviews, many=True)
         
         response_data = {
             'book': serializer.data,
-            'reviews': review_serializer.data
+            'rating': {
+                'average': book.avg_rating,
+                'count': book.review_count,
+                'histogram': {
+                    str(r): getattr(book, ratings.histogram_field(r))
+                    for r in ratings.RATING_VALUES
+                },
+            },
+            'reviews': {
+                'next': paginator.get_next_link(),
+                'previous': paginator.get_previous_link(),
+                'results': review_serializer.data,
+            },
         }
         return Response(response_data, status=status.HTTP_200_OK)
+    except InvalidCursor as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
     except Exception as e:
         logger.error(f"Error fetching book details: {str(e)}")
         return Response(
@@ -46,6 +160,87 @@ def get_book_detail(request, book_id):
             status=status.HTTP_404_NOT_FOUND
         )
 
+def latest_reviews(book_ids, per_book):
+    """`{book_id: [review, ...]}` with each book's newest reviews, one query"""
+    reviews = (
+        Review.objects.filter(book_id__in=book_ids)
+        .select_related('user')
+        .only(*REVIEW_WITH_REVIEWER_COLUMNS)
+        .annotate(position=Window(
+            RowNumber(), partition_by=[F('book_id')], order_by=F('review_id').desc()
+        ))
+        .filter(position__lte=per_book)
+        .order_by('book_id', 'position')
+    )
+    by_book = {book_id: [] for book_id in book_ids}
+    for review in reviews:
+        by_book[review.book_id].append(review)
+    return by_book
+
+@api_view(['GET'])
+@cached(BOOKS, REVIEWS, USERS)
+def get_books_batch(request):
+    """Get several books by id, in request order, optionally with latest reviews
+
+    `?ids=3,1,2` (up to BOOK_BATCH_MAX_IDS) and `?reviews=N` for each book's
+    N newest reviews. Ids that do not exist are listed under `missing`.
+    """
+    # Check the size before any per-id work, so an oversized list is cheap to reject
+    values = [value for value in request.GET.get('ids', '').split(',') if value.strip()]
+    if not values or len(values) > BOOK_BATCH_MAX_IDS:
+        return Response(
+            {'error': f'Pass between 1 and {BOOK_BATCH_MAX_IDS} ids'}, 
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    try:
+        # dict.fromkeys drops repeats and keeps request order
+        book_ids = list(dict.fromkeys(int(value) for value in values))
+    except ValueError:
+        book_ids = []
+    if not book_ids or not all(0 < book_id <= MAX_BOOK_ID for book_id in book_ids):
+        return Response(
+            {'error': 'ids must be a comma-separated list of positive integers'}, 
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    try:
+        per_book = int(request.GET.get('reviews', 0))
+    except ValueError:
+        per_book = -1
+    if per_book < 0:
+        return Response(
+            {'error': 'reviews must be a non-negative integer'}, 
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    per_book = min(per_book, BOOK_BATCH_MAX_REVIEWS)
+    try:
+        fields = requested_fields(request, BookSerializer)
+    except InvalidFields as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    try:
+        books = project(Book.objects.all(), fields).in_bulk(book_ids)
+        found = [book_id for book_id in book_ids if book_id in books]
+        results = BookSerializer(
+            [books[book_id] for book_id in found], many=True, fields=fields
+        ).data
+
+        if per_book > 0 and found:
+            reviews = latest_reviews(found, per_book)
+            for book_id, book_data in zip(found, results):
+                book_data['reviews'] = ReviewWithReviewerSerializer(
+                    reviews[book_id], many=True
+                ).data
+
+        return Response({
+            'results': results,
+            'missing': [book_id for book_id in book_ids if book_id not in books],
+        }, status=status.HTTP_200_OK)
+    except Exception as e:
+        logger.error(f"Error fetching book batch: {str(e)}")
+        return Response(
+            {'error': 'Failed to fetch books'}, 
+            status=status.HTTP_500_INTERNAL_SERVER_ERROR
+        )
+
 @api_view(['POST'])
 def add_to_favorites(request):
     """Add a book to user's favorites"""
@@ -86,6 +281,14 @@ def create_book(request):
     user_id = request.data.get('user_id')
     
     try:
+        try:
+            user_id = int(user_id)
+        except (TypeError, ValueError):
+            return Response(
+                {'error': 'user_id must be an integer'}, 
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
         # Check if user is a librarian
         user = get_object_or_404(User, pk=user_id)
         if not user.is_librarian:
@@ -136,19 +339,304 @@ def create_review(request, book_id):
             status=status.HTTP_500_INTERNAL_SERVER_ERROR
         )
 
+@api_view(['POST'])
+def import_books(request):
+    """Bulk import books from a CSV or JSON Lines file (librarian only)
+
+    Accepts either a multipart upload (`file` and `user_id` fields) or a raw
+    text/csv or application/x-ndjson body with `?user_id=`.
+    """
+    try:
+        if request.content_type.startswith('multipart/'):
+            user_id = request.data.get('user_id')
+            upload = request.FILES.get('file')
+            if upload is None:
+                return Response(
+                    {'error': 'No file uploaded'}, 
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+            stream = upload
+            fmt = bulk_import.detect_format(upload.name, upload.content_type)
+        else:
+            user_id = request.query_params.get('user_id')
+            stream = request.stream
+            fmt = bulk_import.detect_format(content_type=request.content_type)
+
+        try:
+            user_id = int(user_id)
+        except (TypeError, ValueError):
+            return Response(
+                {'error': 'user_id must be an integer'}, 
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        # Check if user is a librarian
+        user = get_object_or_404(User, pk=user_id)
+        if not user.is_librarian:
+            return Response(
+                {'error': 'Only librarians can import books'}, 
+                status=status.HTTP_403_FORBIDDEN
+            )
+        if fmt is None:
+            return Response(
+                {'error': 'Upload a .csv or .jsonl file'}, 
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if stream is None:
+            return Response(
+                {'error': 'Request body is empty'}, 
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        report = bulk_import.import_books(stream, fmt)
+        if 'error' in report:
+            # Stopped on unreadable input; what came before it is committed
+            return Response(report, status=status.HTTP_400_BAD_REQUEST)
+        return Response(report, status=status.HTTP_200_OK)
+
+    except Http404:
+        return Response(
+            {'error': 'User not found'}, 
+            status=status.HTTP_404_NOT_FOUND
+        )
+    except Exception as e:
+        logger.error(f"Error importing books: {str(e)}")
+        return Response(
+            {'error': 'Failed to import books'}, 
+            status=status.HTTP_500_INTERNAL_SERVER_ERROR
+        )
+
 @api_view(['GET'])
+@cached(BOOKS, REVIEWS)
+def browse_books(request):
+    """Browse books by genre, decade and availability with facet counts"""
+    try:
+        fields = requested_fields(
+            request, BookSerializer, deferred=BOOK_LIST_DEFERRED_FIELDS
+        )
+    except InvalidFields as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    try:
+        books = facets.filter_books(
+            project(Book.objects.all(), fields),
+            genre=request.GET.get('genre'),
+            decade=request.GET.get('decade'),
+            available=request.GET.get('available'),
+        )
+    except ValueError:
+        return Response(
+            {'error': 'decade must be a year such as 1990'}, 
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    try:
+        paginator = BookPagination()
+        page = paginator.paginate_queryset(books, request)
+        serializer = BookSerializer(page, many=True, fields=fields)
+        response = paginator.get_paginated_response(serializer.data)
+        response.data['facets'] = facets.get_facet_counts()
+        return response
+    except InvalidCursor as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    except Exception as e:
+        logger.error(f"Error browsing books: {str(e)}")
+        return Response(
+            {'error': 'Failed to browse books'}, 
+            status=status.HTTP_500_INTERNAL_SERVER_ERROR
+        )
+
+@api_view(['GET'])
+@cached(BOOKS, REVIEWS)
 def search_books(request):
-    """Search books by title, author, or genre"""
+    """Search books by title, author, description or genre, best match first"""
     query = request.GET.get('q', '')
     try:
-        books = Book.objects.filter(
-            Q(genre__icontains=query)
+        limit = min(
+            int(request.GET.get('limit', SEARCH_DEFAULT_LIMIT)),
+            SEARCH_MAX_LIMIT
+        )
+    except ValueError:
+        return Response(
+            {'error': 'limit must be an integer'}, 
+            status=status.HTTP_400_BAD_REQUEST
         )
-        serializer = BookSerializer(books, many=True)
+    try:
+        fields = requested_fields(
+            request, BookSerializer, deferred=BOOK_LIST_DEFERRED_FIELDS
+        )
+    except InvalidFields as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    try:
+        books = search.search_books(
+            query, max(limit, 1), queryset=project(Book.objects.all(), fields)
+        )
+        serializer = BookSerializer(books, many=True, fields=fields)
         return Response(serializer.data, status=status.HTTP_200_OK)
     except Exception as e:
         logger.error(f"Error searching books: {str(e)}")
         return Response(
             {'error': 'Failed to search books'}, 
             status=status.HTTP_500_INTERNAL_SERVER_ERROR
-        )
\ No newline at end of file
+        )
+
+@api_view(['GET'])
+def suggest_books(request):
+    """Autocomplete titles and authors from the in-memory prefix index"""
+    prefix = request.GET.get('prefix', '')
+    try:
+        limit = min(
+            int(request.GET.get('limit', SUGGEST_DEFAULT_LIMIT)),
+            SUGGEST_MAX_LIMIT
+        )
+    except ValueError:
+        return Response(
+            {'error': 'limit must be an integer'}, 
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    try:
+        suggestions = suggest.suggest(prefix, max(limit, 1))
+        return Response(suggestions, status=status.HTTP_200_OK)
+    except Exception as e:
+        logger.error(f"Error suggesting books: {str(e)}")
+        return Response(
+            {'error': 'Failed to suggest books'}, 
+            status=status.HTTP_500_INTERNAL_SERVER_ERROR
+        )
+
+def recommendation_limit(request):
+    return min(
+        int(request.GET.get('limit', RECOMMENDATION_DEFAULT_LIMIT)),
+        RECOMMENDATION_MAX_LIMIT
+    )
+
+@api_view(['GET'])
+@cached(BOOKS, REVIEWS, RECOMMENDATIONS)
+def get_similar_books(request, book_id):
+    """Books most often shelved and liked by the same readers, best first"""
+    try:
+        limit = recommendation_limit(request)
+    except ValueError:
+        return Response(
+            {'error': 'limit must be an integer'}, 
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    try:
+        fields = requested_fields(
+            request, BookSerializer, deferred=BOOK_LIST_DEFERRED_FIELDS
+        )
+    except InvalidFields as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    try:
+        similar = recommendations.similar_books(book_id, max(limit, 1))
+        books = project(Book.objects.all(), fields).in_bulk(
+            [similar_id for similar_id, _ in similar]
+        )
+        results = []
+        for similar_id, score in similar:
+            if similar_id in books:
+                book_data = BookSerializer(books[similar_id], fields=fields).data
+                book_data['score'] = score
+                results.append(book_data)
+        return Response(
+            {'book_id': book_id, 'results': results}, 
+            status=status.HTTP_200_OK
+        )
+    except Exception as e:
+        logger.error(f"Error fetching similar books for book {book_id}: {str(e)}")
+        return Response(
+            {'error': 'Failed to fetch similar books'}, 
+            status=status.HTTP_500_INTERNAL_SERVER_ERROR
+        )
+
+@api_view(['GET'])
+@cached(BOOKS, REVIEWS, FAVORITES, RECOMMENDATIONS)
+def get_user_recommendations(request, user_id):
+    """Recommendations based on the books the user recently read or liked"""
+    try:
+        limit = recommendation_limit(request)
+    except ValueError:
+        return Response(
+            {'error': 'limit must be an integer'}, 
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    try:
+        fields = requested_fields(
+            request, BookSerializer, deferred=BOOK_LIST_DEFERRED_FIELDS
+        )
+    except InvalidFields as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    try:
+        recommended = recommendations.because_you_read(user_id, max(limit, 1))
+        book_ids = {book_id for book_id, _, _ in recommended}
+        book_ids.update(seed_id for _, _, seed_id in recommended)
+        books = project(Book.objects.all(), set(fields) | {'title'}).in_bulk(book_ids)
+        results = []
+        for book_id, score, seed_id in recommended:
+            if book_id not in books:
+                continue
+            book_data = BookSerializer(books[book_id], fields=fields).data
+            book_data['score'] = score
+            seed = books.get(seed_id)
+            book_data['because'] = {
+                'book_id': seed_id, 'title': seed.title if seed else None
+            }
+            results.append(book_data)
+        return Response(
+            {'user_id': user_id, 'results': results}, 
+            status=status.HTTP_200_OK
+        )
+    except Exception as e:
+        logger.error(f"Error fetching recommendations for user {user_id}: {str(e)}")
+        return Response(
+            {'error': 'Failed to fetch recommendations'}, 
+            status=status.HTTP_500_INTERNAL_SERVER_ERROR
+        )
+
+def leaderboard_response(request, score):
+    try:
+        limit = min(
+            int(request.GET.get('limit', LEADERBOARD_DEFAULT_LIMIT)),
+            LEADERBOARD_MAX_LIMIT
+        )
+    except ValueError:
+        return Response(
+            {'error': 'limit must be an integer'}, 
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    try:
+        fields = requested_fields(
+            request, BookSerializer, deferred=BOOK_LIST_DEFERRED_FIELDS
+        )
+    except InvalidFields as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    results = []
+    for book, value in leaderboard.top(score, max(limit, 1)):
+        book_data = BookSerializer(book, fields=fields).data
+        book_data['score'] = round(value, 4)
+        results.append(book_data)
+    return Response(results, status=status.HTTP_200_OK)
+
+@api_view(['GET'])
+@cached(BOOKS, REVIEWS, FAVORITES)
+def get_trending_books(request):
+    """Books with the most recent reviews and shelf adds (time-decayed)"""
+    try:
+        return leaderboard_response(request, leaderboard.TRENDING)
+    except Exception as e:
+        logger.error(f"Error fetching trending books: {str(e)}")
+        return Response(
+            {'error': 'Failed to fetch trending books'}, 
+            status=status.HTTP_500_INTERNAL_SERVER_ERROR
+        )
+
+@api_view(['GET'])
+@cached(BOOKS, REVIEWS, FAVORITES)
+def get_popular_books(request):
+    """Books with the most reviews and shelf adds of all time"""
+    try:
+        return leaderboard_response(request, leaderboard.POPULAR)
+    except Exception as e:
+        logger.error(f"Error fetching popular books: {str(e)}")
+        return Response(
+            {'error': 'Failed to fetch popular books'}, 
+            status=status.HTTP_500_INTERNAL_SERVER_ERROR
+        )
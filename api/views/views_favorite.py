@@ -1,15 +1,22 @@
 from rest_framework.decorators import api_view
 from rest_framework.response import Response
 from rest_framework import status
+from django.http import Http404
 from django.shortcuts import get_object_or_404
-from django.db import IntegrityError
+from django.db import IntegrityError, transaction
 from ..models import FavoritePages, User, Book
 from ..serializers import FavoritePagesSerializer
+from ..pagination import FavoritePagination, InvalidCursor
+from .. import leaderboard, recommendations, shelf
+from ..caching import cached, BOOKS, FAVORITES
 import logging
 
 logger = logging.getLogger(__name__)
 
+SHELF_SUMMARY_DEFAULT_RECENT = 5
+
 @api_view(['GET'])
+@cached(FAVORITES, BOOKS)
 def get_user_favorites(request, user_id):
     """Get all favorites for a user with optional status filter"""
     try:
@@ -21,12 +28,15 @@ def get_user_favorites(request, user_id):
         if status_filter:
             favorites = favorites.filter(reading_status=status_filter)
         
-        serializer = FavoritePagesSerializer(favorites, many=True)
+        paginator = FavoritePagination()
+        page = paginator.paginate_queryset(favorites, request)
+        serializer = FavoritePagesSerializer(page, many=True)
         
-        # Add additional debug logging
-        logger.info(f"Found {favorites.count()} favorites for user {user_id}")
+        logger.info(f"Returning {len(page)} favorites for user {user_id}")
         
-        return Response(serializer.data, status=status.HTTP_200_OK)
+        return paginator.get_paginated_response(serializer.data)
+    except InvalidCursor as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
     except Exception as e:
         logger.error(f"Error fetching favorites for user {user_id}: {str(e)}")
         return Response(
@@ -42,14 +52,22 @@ def add_favorite(request):
         book_id = request.data.get('book_id')
         reading_status = request.data.get('reading_status', 'WANT_TO_READ')
 
-        # Check if favorite already exists
-        favorite, created = FavoritePages.objects.get_or_create(
-            user_id=user_id,
-            book_id=book_id,
-            defaults={'reading_status': reading_status}
-        )
+        if user_id is None or book_id is None:
+            return Response(
+                {'error': 'Invalid user_id or book_id'}, 
+                status=status.HTTP_400_BAD_REQUEST
+            )
 
-        if not created:
+        # One INSERT; the (user_id, book_id) unique constraint rejects duplicates
+        try:
+            with transaction.atomic():
+                favorite = FavoritePages.objects.create(
+                    user_id=user_id,
+                    book_id=book_id,
+                    reading_status=reading_status
+                )
+                leaderboard.favorite_added(favorite.book_id, favorite.created_at)
+        except IntegrityError:
             return Response(
                 {'error': 'Book is already in favorites'}, 
                 status=status.HTTP_400_BAD_REQUEST
@@ -58,7 +76,7 @@ def add_favorite(request):
         serializer = FavoritePagesSerializer(favorite)
         return Response(serializer.data, status=status.HTTP_201_CREATED)
 
-    except IntegrityError:
+    except (TypeError, ValueError):
         return Response(
             {'error': 'Invalid user_id or book_id'}, 
             status=status.HTTP_400_BAD_REQUEST
@@ -70,6 +88,39 @@ def add_favorite(request):
             status=status.HTTP_500_INTERNAL_SERVER_ERROR
         )
 
+@api_view(['POST'])
+def batch_favorites(request):
+    """Apply a batch of add/update/remove shelf operations in one transaction"""
+    try:
+        user_id = request.data.get('user_id')
+        operations = request.data.get('operations')
+        if not isinstance(operations, list) or not operations:
+            return Response(
+                {'error': 'operations must be a non-empty list'}, 
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if len(operations) > shelf.MAX_OPERATIONS:
+            return Response(
+                {'error': f'At most {shelf.MAX_OPERATIONS} operations per request'}, 
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        user = get_object_or_404(User, pk=user_id)
+        report = shelf.apply_operations(user.pk, operations)
+        return Response({'user_id': user.pk, **report}, status=status.HTTP_200_OK)
+
+    except Http404:
+        return Response(
+            {'error': 'User not found'}, 
+            status=status.HTTP_404_NOT_FOUND
+        )
+    except Exception as e:
+        logger.error(f"Error applying favorite operations: {str(e)}")
+        return Response(
+            {'error': 'Failed to apply favorite operations'}, 
+            status=status.HTTP_500_INTERNAL_SERVER_ERROR
+        )
+
 @api_view(['PUT'])
 def update_reading_status(request):
     """Update reading status of a favorite book"""
@@ -84,8 +135,12 @@ def update_reading_status(request):
             book_id=book_id
         )
         
+        changed = favorite.reading_status != new_status
         favorite.reading_status = new_status
-        favorite.save()
+        with transaction.atomic():
+            favorite.save()
+            if changed:
+                recommendations.interactions_changed([favorite.book_id])
         
         serializer = FavoritePagesSerializer(favorite)
         return Response(serializer.data, status=status.HTTP_200_OK)
@@ -101,12 +156,15 @@ def update_reading_status(request):
 def remove_favorite(request, user_id, book_id):
     """Remove a book from favorites"""
     try:
-        favorite = get_object_or_404(
-            FavoritePages, 
-            user_id=user_id, 
-            book_id=book_id
-        )
-        favorite.delete()
+        with transaction.atomic():
+            favorite = get_object_or_404(
+                FavoritePages, 
+                user_id=user_id, 
+                book_id=book_id
+            )
+            favorite.delete()
+            leaderboard.favorite_removed(favorite.book_id, favorite.created_at)
+            recommendations.interactions_changed([favorite.book_id])
         
         return Response(
             {'message': 'Book removed from favorites'}, 
@@ -121,6 +179,7 @@ def remove_favorite(request, user_id, book_id):
         )
 
 @api_view(['GET'])
+@cached(FAVORITES, BOOKS)
 def get_reading_status_books(request, user_id, reading_status):
     """Get all books with a specific reading status"""
     try:
@@ -128,12 +187,42 @@ def get_reading_status_books(request, user_id, reading_status):
             user_id=user_id,
             reading_status=reading_status
         )
-        serializer = FavoritePagesSerializer(favorites, many=True)
-        return Response(serializer.data, status=status.HTTP_200_OK)
+        paginator = FavoritePagination()
+        page = paginator.paginate_queryset(favorites, request)
+        serializer = FavoritePagesSerializer(page, many=True)
+        return paginator.get_paginated_response(serializer.data)
 
+    except InvalidCursor as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
     except Exception as e:
         logger.error(f"Error fetching reading status books: {str(e)}")
         return Response(
             {'error': 'Failed to fetch books'}, 
             status=status.HTTP_500_INTERNAL_SERVER_ERROR
-        )
\ No newline at end of file
+        )
+
+@api_view(['GET'])
+def get_shelf_summary(request, user_id):
+    """Count and most recent books for each reading status, for the shelf header"""
+    try:
+        recent = min(
+            int(request.GET.get('recent', SHELF_SUMMARY_DEFAULT_RECENT)),
+            shelf.SUMMARY_MAX_RECENT
+        )
+    except ValueError:
+        return Response(
+            {'error': 'recent must be an integer'}, 
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    try:
+        summary = shelf.get_summary(user_id, max(recent, 0))
+        return Response(
+            {'user_id': user_id, 'shelves': summary}, 
+            status=status.HTTP_200_OK
+        )
+    except Exception as e:
+        logger.error(f"Error fetching shelf summary for user {user_id}: {str(e)}")
+        return Response(
+            {'error': 'Failed to fetch shelf summary'}, 
+            status=status.HTTP_500_INTERNAL_SERVER_ERROR
+        )
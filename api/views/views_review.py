@@ -2,19 +2,48 @@ from rest_framework.decorators import api_view
 from rest_framework.response import Response
 from rest_framework import status
 from django.shortcuts import get_object_or_404
+from django.db import IntegrityError, transaction
+from django.db.models import Count, Max
 from ..models import Review, Book, User
 from ..serializers import ReviewSerializer
+from ..pagination import ReviewPagination, InvalidCursor
+from ..conditional import conditional
+from ..fieldsets import InvalidFields, requested_fields
+from ..row_serializers import get_row_serializer
+from .. import leaderboard, ratings, recommendations
+from ..caching import cached, cached_value, REVIEWS
 import logging
 
 logger = logging.getLogger(__name__)
 
+def book_reviews_validators(request, book_id):
+    """Latest review change and review count for a book, for conditional GET"""
+    def compute():
+        result = Review.objects.filter(book_id=book_id).aggregate(
+            last_modified=Max('updated_at'), count=Count('review_id')
+        )
+        return result['last_modified'], result['count']
+    return cached_value((REVIEWS,), f'book_reviews_validators:{book_id}', compute)
+
 @api_view(['GET'])
+@conditional(book_reviews_validators, send_last_modified=False)
+@cached(REVIEWS)
 def get_book_reviews(request, book_id):
-    """Get all reviews for a specific book"""
+    """Get a page of reviews for a specific book (newest first)"""
     try:
-        reviews = Review.objects.filter(book_id=book_id)
-        serializer = ReviewSerializer(reviews, many=True)
-        return Response(serializer.data, status=status.HTTP_200_OK)
+        fields = requested_fields(request, ReviewSerializer)
+    except InvalidFields as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    try:
+        # Fast path: values_list() rows -> dicts, same output as ReviewSerializer
+        rows = get_row_serializer(ReviewSerializer, fields)
+        paginator = ReviewPagination()
+        reviews = paginator.paginate_queryset(
+            rows.values_list(Review.objects.filter(book_id=book_id)), request
+        )
+        return paginator.get_paginated_response(rows.serialize(reviews))
+    except InvalidCursor as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
     except Exception as e:
         logger.error(f"Error fetching reviews for book {book_id}: {str(e)}")
         return Response(
@@ -23,12 +52,23 @@ def get_book_reviews(request, book_id):
         )
 
 @api_view(['GET'])
+@cached(REVIEWS)
 def get_user_reviews(request, user_id):
-    """Get all reviews by a specific user"""
+    """Get a page of reviews by a specific user (newest first)"""
     try:
-        reviews = Review.objects.filter(user_id=user_id)
-        serializer = ReviewSerializer(reviews, many=True)
-        return Response(serializer.data, status=status.HTTP_200_OK)
+        fields = requested_fields(request, ReviewSerializer)
+    except InvalidFields as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    try:
+        # Fast path: values_list() rows -> dicts, same output as ReviewSerializer
+        rows = get_row_serializer(ReviewSerializer, fields)
+        paginator = ReviewPagination()
+        reviews = paginator.paginate_queryset(
+            rows.values_list(Review.objects.filter(user_id=user_id)), request
+        )
+        return paginator.get_paginated_response(rows.serialize(reviews))
+    except InvalidCursor as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
     except Exception as e:
         logger.error(f"Error fetching reviews for user {user_id}: {str(e)}")
         return Response(
@@ -43,24 +83,30 @@ def create_review(request):
         data = {
             'user_id': request.data.get('user_id'),
             'book_id': request.data.get('book_id'),
-            'rating': request.data.get('rating'),
+            'rating': ratings.parse_rating(request.data.get('rating')),
             'review_text': request.data.get('review_text'),
         }
         
-        # Check if user has already reviewed this book
-        existing_review = Review.objects.filter(
-            user_id=data['user_id'],
-            book_id=data['book_id']
-        ).exists()
-        
-        if existing_review:
+        if data['rating'] is None:
             return Response(
-                {'error': 'You have already reviewed this book'}, 
+                {'error': 'Rating must be an integer from 1 to 5'}, 
                 status=status.HTTP_400_BAD_REQUEST
             )
         
-        # Create the review
-        review = Review.objects.create(**data)
+        # One INSERT; the (user, book) unique constraint rejects a second review
+        try:
+            with transaction.atomic():
+                review = Review.objects.create(**data)
+                ratings.review_added(review.book_id, review.rating)
+                leaderboard.review_added(review.book_id, review.created_at)
+        except IntegrityError:
+            # Only the failure path pays for telling a duplicate from a bad id
+            if Review.objects.filter(user_id=data['user_id'], book_id=data['book_id']).exists():
+                return Response(
+                    {'error': 'You have already reviewed this book'}, 
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+            raise
         serializer = ReviewSerializer(review)
         return Response(serializer.data, status=status.HTTP_201_CREATED)
         
@@ -74,20 +120,32 @@ def create_review(request):
 def update_review(request, review_id):
     """Update an existing review"""
     try:
-        review = get_object_or_404(Review, pk=review_id)
-        
-        # Verify the user owns this review
-        if review.user_id != request.data.get('user_id'):
-            return Response(
-                {'error': 'You can only edit your own reviews'}, 
-                status=status.HTTP_403_FORBIDDEN
+        with transaction.atomic():
+            # Lock the row so concurrent edits cannot double-count a rating
+            review = get_object_or_404(
+                Review.objects.select_for_update(), pk=review_id
             )
-        
-        serializer = ReviewSerializer(review, data=request.data, partial=True)
-        if serializer.is_valid():
-            serializer.save()
-            return Response(serializer.data, status=status.HTTP_200_OK)
-        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+            
+            # Verify the user owns this review
+            if review.user_id != request.data.get('user_id'):
+                return Response(
+                    {'error': 'You can only edit your own reviews'}, 
+                    status=status.HTTP_403_FORBIDDEN
+                )
+            
+            old_book_id, old_rating = review.book_id, review.rating
+            serializer = ReviewSerializer(review, data=request.data, partial=True)
+            if not serializer.is_valid():
+                return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+            review = serializer.save()
+            ratings.review_changed(
+                old_book_id, old_rating, review.book_id, review.rating
+            )
+            if review.book_id != old_book_id:
+                leaderboard.review_removed(old_book_id, review.created_at)
+                leaderboard.review_added(review.book_id, review.created_at)
+                recommendations.interactions_changed([old_book_id])
+        return Response(serializer.data, status=status.HTTP_200_OK)
         
     except Exception as e:
         logger.error(f"Error updating review {review_id}: {str(e)}")
@@ -100,16 +158,22 @@ def update_review(request, review_id):
 def delete_review(request, review_id):
     """Delete a review"""
     try:
-        review = get_object_or_404(Review, pk=review_id)
-        
-        # Verify the user owns this review
-        if review.user_id != request.data.get('user_id'):
-            return Response(
-                {'error': 'You can only delete your own reviews'}, 
-                status=status.HTTP_403_FORBIDDEN
+        with transaction.atomic():
+            review = get_object_or_404(
+                Review.objects.select_for_update(), pk=review_id
             )
-        
-        review.delete()
+            
+            # Verify the user owns this review
+            if review.user_id != request.data.get('user_id'):
+                return Response(
+                    {'error': 'You can only delete your own reviews'}, 
+                    status=status.HTTP_403_FORBIDDEN
+                )
+            
+            review.delete()
+            ratings.review_removed(review.book_id, review.rating)
+            leaderboard.review_removed(review.book_id, review.created_at)
+            recommendations.interactions_changed([review.book_id])
         return Response(
             {'message': 'Review deleted successfully'}, 
             status=status.HTTP_200_OK
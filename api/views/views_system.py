@@ -0,0 +1,35 @@
+from rest_framework.decorators import api_view
+from rest_framework.response import Response
+from rest_framework import status
+from django.conf import settings
+from .. import caching, db_pool
+import logging
+
+logger = logging.getLogger(__name__)
+
+@api_view(['GET'])
+def cache_stats(request):
+    """Response cache hit/miss counts for this worker process"""
+    try:
+        return Response({
+            'backend': settings.CACHES['default']['BACKEND'].rsplit('.', 1)[-1],
+            **caching.stats()
+        }, status=status.HTTP_200_OK)
+    except Exception as e:
+        logger.error(f"Error fetching cache stats: {str(e)}")
+        return Response(
+            {'error': 'Failed to fetch cache stats'}, 
+            status=status.HTTP_500_INTERNAL_SERVER_ERROR
+        )
+
+@api_view(['GET'])
+def db_pool_stats(request):
+    """Database connection pool use and saturation for this worker process"""
+    try:
+        return Response({'pools': db_pool.stats()}, status=status.HTTP_200_OK)
+    except Exception as e:
+        logger.error(f"Error fetching connection pool stats: {str(e)}")
+        return Response(
+            {'error': 'Failed to fetch connection pool stats'},
+            status=status.HTTP_500_INTERNAL_SERVER_ERROR
+        )
@@ -2,12 +2,20 @@ from rest_framework.decorators import api_view
 from rest_framework.response import Response
 from rest_framework import status
 from django.shortcuts import get_object_or_404
-from ..models import User
+from django.db import transaction
+from ..models import User, Review
 from ..serializers import UserSerializer
+from ..pagination import UserPagination, InvalidCursor
+from ..fieldsets import InvalidFields, requested_fields, project
+from ..caching import cached, USERS
+from .. import leaderboard, ratings, recommendations
 import logging
 
 logger = logging.getLogger(__name__)
 
+USER_LIST_DEFAULT_FIELDS = ('user_id', 'username', 'is_librarian')
+USER_LIST_HIDDEN_FIELDS = ('password', 'email')
+
 @api_view(['GET'])
 def api_root(request):
     """Root endpoint showing all available API endpoints"""
@@ -35,18 +43,26 @@ def api_root(request):
     })
 
 @api_view(['GET'])
+@cached(USERS)
 def get_all_users(request):
-    """Get all users in the database"""
+    """Get a page of users in the database"""
+    try:
+        # Credentials and contact details are never exposed here
+        fields = requested_fields(
+            request, UserSerializer,
+            default=USER_LIST_DEFAULT_FIELDS, hidden=USER_LIST_HIDDEN_FIELDS
+        )
+    except InvalidFields as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
     try:
-        users = User.objects.all()
-        serializer = UserSerializer(users, many=True)
-        # Only return necessary user information for security
-        safe_data = [{
-            'user_id': user['user_id'],
-            'username': user['username'],
-            'is_librarian': user['is_librarian']
-        } for user in serializer.data]
-        return Response(safe_data, status=status.HTTP_200_OK)
+        paginator = UserPagination()
+        users = paginator.paginate_queryset(
+            project(User.objects.all(), fields), request
+        )
+        serializer = UserSerializer(users, many=True, fields=fields)
+        return paginator.get_paginated_response(serializer.data)
+    except InvalidCursor as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
     except Exception as e:
         logger.error(f"Error fetching users: {str(e)}")
         return Response(
@@ -125,7 +141,19 @@ def delete_account(request):
         
         # Verify password before deletion
         if user.password == password:  # Replace with proper password verification
-            user.delete()
+            with transaction.atomic():
+                # The delete cascades to the user's reviews without going
+                # through the review views, so uncount them here
+                reviews = list(
+                    Review.objects.select_for_update().filter(user=user)
+                    .values_list('book_id', 'rating', 'created_at')
+                )
+                ratings.reviews_removed((book_id, rating) for book_id, rating, _ in reviews)
+                leaderboard.reviews_removed(
+                    (book_id, created_at) for book_id, _, created_at in reviews
+                )
+                recommendations.interactions_changed(book_id for book_id, _, _ in reviews)
+                user.delete()
             return Response(
                 {'message': 'Account deleted successfully'}, 
                 status=status.HTTP_200_OK
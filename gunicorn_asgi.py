@@ -0,0 +1,21 @@
+# Gunicorn settings for the ASGI deployment profile: uvicorn workers serving
+# CST438.asgi, so async views (/api/async/...) do not block a worker while
+# they wait on the database. Use it with:
+#
+#   web: gunicorn CST438.asgi:application -c gunicorn_asgi.py
+#
+import os
+
+bind = f"0.0.0.0:{os.environ.get('PORT', '8000')}"
+worker_class = 'uvicorn_worker.UvicornWorker'
+workers = int(os.environ.get('WEB_CONCURRENCY', 2))
+
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 30))
+graceful_timeout = 30
+keepalive = 5
+
+# Recycle workers now and then to bound memory growth
+max_requests = 1000
+max_requests_jitter = 100
+
+accesslog = '-'
@@ -1,190 +1,126 @@
+"""
+Fill the database with a synthetic, reproducible dataset (see api/dataset.py).
+
+    python populate_db.py                                   # 10k users, 5k books
+    python populate_db.py --users 1000000 --books 200000 --workers 8
+
+Existing users, books, reviews and shelves are deleted first. The same
+--seed, --chunk-size and --end-date always produce the same rows.
+"""
+import argparse
 import os
+import time
+from datetime import datetime, timezone
+
 import django
-from datetime import datetime
 from django.db import connection
+from django.db.models import Count
 
 # Setup Django
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'CST438.settings')
 django.setup()
 
-def execute_sql(query, params=None):
-    with connection.cursor() as cursor:
-        try:
-            cursor.execute(query, params)
-            print(f"Successfully executed: {query[:100]}...")
-        except Exception as e:
-            print(f"Error executing query: {query[:100]}...")
-            print(f"Error message: {str(e)}")
-
-def populate_database():
-    # Clear existing data (optional)
-    clear_queries = [
-        "DELETE FROM favorite_page;",
-        "DELETE FROM review;",
-        "DELETE FROM book;",
-        "DELETE FROM user;"
-    ]
-
-    print("Clearing existing data...")
-    for query in clear_queries:
-        execute_sql(query)
-
-    # Add users (including librarian)
-    user_queries = [
-        """
-        INSERT INTO user (username, email, password, is_librarian, created_at)
-        VALUES ('john_doe', 'john@example.com', 'password123', 0, NOW());
-        """,
-        """
-        INSERT INTO user (username, email, password, is_librarian, created_at)
-        VALUES ('jane_smith', 'jane@example.com', 'password123', 0, NOW());
-        """,
-        """
-        INSERT INTO user (username, email, password, is_librarian, created_at)
-        VALUES ('admin_lib', 'admin@library.com', 'admin123', 1, NOW());
-        """
-    ]
+from api import dataset  # noqa: E402
+from api.models import Review  # noqa: E402
 
-    # Add books
-    book_queries = [
-        """
-        INSERT INTO book (title, author, description, genre, published_date, available_copies, created_at, updated_at)
-        VALUES (
-            'The Great Gatsby',
-            'F. Scott Fitzgerald',
-            'A story of decadence and excess.',
-            'FICTION',
-            '1925-04-10',
-            3,
-            NOW(),
-            NOW()
-        );
-        """,
-        """
-        INSERT INTO book (title, author, description, genre, published_date, available_copies, created_at, updated_at)
-        VALUES (
-            '1984',
-            'George Orwell',
-            'A dystopian novel.',
-            'FICTION',
-            '1949-06-08',
-            2,
-            NOW(),
-            NOW()
-        );
-        """,
-        """
-        INSERT INTO book (title, author, description, genre, published_date, available_copies, created_at, updated_at)
-        VALUES (
-            'Pride and Prejudice',
-            'Jane Austen',
-            'A romantic novel of manners.',
-            'FICTION',
-            '1813-01-28',
-            5,
-            NOW(),
-            NOW()
-        );
-        """
-    ]
 
-    # Add reviews
-    review_queries = [
-        """
-        INSERT INTO review (user_id, book_id, rating, review_text, created_at, updated_at)
-        SELECT 
-            (SELECT user_id FROM user WHERE username = 'john_doe'),
-            (SELECT book_id FROM book WHERE title = 'The Great Gatsby'),
-            5,
-            'A masterpiece of American literature!',
-            NOW(),
-            NOW();
-        """,
-        """
-        INSERT INTO review (user_id, book_id, rating, review_text, created_at, updated_at)
-        SELECT 
-            (SELECT user_id FROM user WHERE username = 'jane_smith'),
-            (SELECT book_id FROM book WHERE title = '1984'),
-            4,
-            'A chilling and thought-provoking read.',
-            NOW(),
-            NOW();
-        """
-    ]
+def parse_args():
+    parser = argparse.ArgumentParser(description='Replace the database contents with a synthetic dataset')
+    parser.add_argument('--users', type=int, default=dataset.DEFAULT_USERS, help='Number of users (default: %(default)s)')
+    parser.add_argument('--books', type=int, default=dataset.DEFAULT_BOOKS, help='Number of books (default: %(default)s)')
+    parser.add_argument('--seed', type=int, default=dataset.DEFAULT_SEED, help='Random seed (default: %(default)s)')
+    parser.add_argument(
+        '--end-date', type=lambda value: datetime.strptime(value, '%Y-%m-%d').replace(tzinfo=timezone.utc),
+        help='Last day of review and shelf activity, YYYY-MM-DD (default: today)'
+    )
+    parser.add_argument('--days', type=int, default=dataset.DEFAULT_DAYS, help='Days of activity (default: %(default)s)')
+    parser.add_argument(
+        '--zipf-exponent', type=float, default=dataset.DEFAULT_ZIPF_EXPONENT,
+        help='Skew of book popularity (default: %(default)s)'
+    )
+    parser.add_argument(
+        '--review-exponent', type=float, default=dataset.DEFAULT_REVIEW_EXPONENT,
+        help='Power-law exponent of reviews per user; lower means heavier reviewers (default: %(default)s)'
+    )
+    parser.add_argument(
+        '--favorite-exponent', type=float, default=dataset.DEFAULT_FAVORITE_EXPONENT,
+        help='Power-law exponent of shelved books per user (default: %(default)s)'
+    )
+    parser.add_argument(
+        '--max-per-user', type=int, default=dataset.DEFAULT_MAX_PER_USER,
+        help='Most reviews or shelved books one user can have (default: %(default)s)'
+    )
+    parser.add_argument(
+        '--workers', type=int, default=min(os.cpu_count() or 1, 8),
+        help='Parallel writer processes; always 1 on SQLite (default: %(default)s)'
+    )
+    parser.add_argument(
+        '--chunk-size', type=int, default=dataset.DEFAULT_CHUNK_SIZE,
+        help='Users or books per chunk (default: %(default)s)'
+    )
+    parser.add_argument(
+        '--skip-recommendations', action='store_true',
+        help='Do not rebuild similar books; run build_recommendations later'
+    )
+    parser.add_argument('--noinput', action='store_true', help='Do not ask before deleting existing data')
+    return parser.parse_args()
 
-    # Add favorite pages with different reading statuses
-    favorite_queries = [
-        """
-        INSERT INTO favorite_pages (user_id, book_id, reading_status, created_at)
-        SELECT 
-            (SELECT user_id FROM user WHERE username = 'john_doe'),
-            (SELECT book_id FROM book WHERE title = 'The Great Gatsby'),
-            'CURRENTLY_READING',
-            NOW();
-        """,
-        """
-        INSERT INTO favorite_pages (user_id, book_id, reading_status, created_at)
-        SELECT 
-            (SELECT user_id FROM user WHERE username = 'john_doe'),
-            (SELECT book_id FROM book WHERE title = '1984'),
-            'WANT_TO_READ',
-            NOW();
-        """,
-        """
-        INSERT INTO favorite_pages (user_id, book_id, reading_status, created_at)
-        SELECT 
-            (SELECT user_id FROM user WHERE username = 'jane_smith'),
-            (SELECT book_id FROM book WHERE title = 'Pride and Prejudice'),
-            'ALREADY_READ',
-            NOW();
-        """
-    ]
 
-    print("\nAdding users...")
-    for query in user_queries:
-        execute_sql(query)
+def print_skew():
+    """How concentrated the generated reviews are"""
+    per_book = sorted(
+        Review.objects.values('book').annotate(n=Count('pk')).values_list('n', flat=True),
+        reverse=True
+    )
+    per_user = sorted(Review.objects.values('user').annotate(n=Count('pk')).values_list('n', flat=True))
+    if not per_book:
+        return
+    top = max(1, len(per_book) // 100)
+    print(f'Top 1% of reviewed books hold {100 * sum(per_book[:top]) / sum(per_book):.1f}% of reviews')
+    print(
+        f'Reviews per reviewing user: median {per_user[len(per_user) // 2]}, '
+        f'p99 {per_user[int(len(per_user) * 0.99)]}, max {per_user[-1]}'
+    )
 
-    print("\nAdding books...")
-    for query in book_queries:
-        execute_sql(query)
 
-    print("\nAdding reviews...")
-    for query in review_queries:
-        execute_sql(query)
+def main():
+    args = parse_args()
+    database = connection.settings_dict['NAME']
+    if not args.noinput:
+        answer = input(f'This deletes all users, books, reviews and shelves in {database}. Continue? [y/N] ')
+        if answer.lower() != 'y':
+            print('Cancelled')
+            return
 
-    print("\nAdding favorites...")
-    for query in favorite_queries:
-        execute_sql(query)
+    plan = dataset.Plan(
+        users=args.users, books=args.books, seed=args.seed,
+        zipf_exponent=args.zipf_exponent, review_exponent=args.review_exponent,
+        favorite_exponent=args.favorite_exponent, max_per_user=args.max_per_user,
+        days=args.days, end=args.end_date,
+    )
+    totals = plan.totals()
+    print(
+        f"Generating {totals['users']} users, {totals['books']} books, up to {totals['reviews']} "
+        f"reviews and {totals['favorites']} shelved books (seed {args.seed})..."
+    )
+    started = time.perf_counter()
+    written = dataset.generate(
+        plan, workers=args.workers, chunk_size=args.chunk_size, rebuild=False
+    )
+    elapsed = time.perf_counter() - started
+    rows = sum(written.values())
+    print(f"{'table':<11}{'rows':>12}")
+    for table in (dataset.USERS, dataset.BOOKS, dataset.REVIEWS, dataset.FAVORITES):
+        print(f'{table:<11}{written[table]:>12}')
+    print(f'Inserted {rows} rows in {elapsed:.1f}s ({rows / max(elapsed, 1e-9):,.0f} rows/s)')
 
-def verify_data():
-    verification_queries = {
-        "Users": "SELECT user_id, username, is_librarian FROM user",
-        "Books": "SELECT book_id, title, author FROM book",
-        "Reviews": """
-            SELECT r.review_id, u.username, b.title, r.rating, r.comment 
-            FROM review r 
-            JOIN user u ON r.user_id = u.user_id 
-            JOIN book b ON r.book_id = b.book_id
-        """,
-        "Favorites": """
-            SELECT f.favorite_id, u.username, b.title, f.reading_status 
-            FROM favorite_page f 
-            JOIN user u ON f.user_id = u.user_id 
-            JOIN book b ON f.book_id = b.book_id
-        """
-    }
+    print('Rebuilding ratings, facets, leaderboard, search index'
+          + ('' if args.skip_recommendations else ' and similar books') + '...')
+    started = time.perf_counter()
+    dataset.rebuild_derived(recommendations_too=not args.skip_recommendations)
+    print(f'Rebuilt in {time.perf_counter() - started:.1f}s')
+    print_skew()
 
-    print("\nVerifying data:")
-    for table_name, query in verification_queries.items():
-        print(f"\n{table_name}:")
-        with connection.cursor() as cursor:
-            cursor.execute(query)
-            results = cursor.fetchall()
-            for row in results:
-                print(row)
 
 if __name__ == "__main__":
-    print("Starting database population...")
-    populate_database()
-    print("\nVerifying populated data...")
-    verify_data()
\ No newline at end of file
+    main()